@@ -0,0 +1,67 @@
+"""
+Route matching cost of the starlette linear scan against the nuxt compiled router.
+
+    python benchmarks/bench_router.py [--rounds 20000]
+
+Every table holds ``count`` endpoints shaped like a typical nuxt app, the
+matched paths are the last registered route (worst case hit) and an unknown
+path (which scans everything before not_found).
+"""
+from nuxt.routing import Router, CompiledRouter, Route, Match
+from nuxt.utils import format_pattern
+import argparse
+import timeit
+
+
+async def endpoint(scope, receive, send):
+    pass
+
+
+def make_routes(count: int):
+    routes = []
+    for i in range(count // 2):
+        routes.append(Route(format_pattern("/api/v1/resource%d" % i), endpoint, methods=["GET"]))
+        routes.append(Route(format_pattern("/api/v1/resource%d/<int:item_id>/<string:name>" % i), endpoint, methods=["GET", "POST"]))
+    return routes
+
+
+def linear_lookup(router: Router, scope: dict):
+    partial = None
+    for route in router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            return match, route, child_scope
+        if match == Match.PARTIAL and partial is None:
+            partial = (match, route, child_scope)
+    return partial or (Match.NONE, None, {})
+
+
+def make_scope(path: str) -> dict:
+    return {"type": "http", "method": "GET", "path": path, "root_path": "", "path_params": {}}
+
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--rounds", type=int, default=20000)
+    args = cli.parse_args()
+
+    print("%8s %12s %14s %14s %14s %14s" % ("routes", "path", "linear(us)", "compiled(us)", "speedup", "same result"))
+    for count in (10, 100, 500, 1000, 2000):
+        routes = make_routes(count)
+        linear, compiled = Router(routes=routes), CompiledRouter(routes=routes)
+        compiled.freeze()
+        paths = {
+            "hit": "/api/v1/resource%d/42/demo" % (count // 2 - 1),
+            "miss": "/api/v2/unknown",
+        }
+        for label, path in paths.items():
+            scope = make_scope(path)
+            expect, got = linear_lookup(linear, make_scope(path)), compiled.lookup(make_scope(path))
+            same = expect[0] == got[0] and expect[1] is got[1] and expect[2] == got[2]
+            linear_cost = timeit.timeit(lambda: linear_lookup(linear, scope), number=args.rounds) / args.rounds * 1e6
+            compiled_cost = timeit.timeit(lambda: compiled.lookup(scope), number=args.rounds) / args.rounds * 1e6
+            print("%8d %12s %14.2f %14.2f %13.1fx %14s" % (count, label, linear_cost, compiled_cost, linear_cost / compiled_cost, same))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+JSON encoding cost of a typical list endpoint with every available backend of
+the nuxt serializer.
+
+    python benchmarks/bench_serializer.py [--rounds 200] [--items 1000]
+"""
+from nuxt.serializers import JSONSerializer, JSON_BACKENDS
+import argparse
+import dataclasses
+import datetime
+import timeit
+
+
+@dataclasses.dataclass
+class Item:
+    id: int
+    name: str
+    price: float
+    tags: list
+    created: datetime.datetime
+
+
+def make_payload(count: int) -> dict:
+    now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    return {"code": 200, "result": [Item(i, "item-%d" % i, i * 1.5, ["a", "b"], now) for i in range(count)]}
+
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--rounds", type=int, default=200)
+    cli.add_argument("--items", type=int, default=1000)
+    args = cli.parse_args()
+
+    payload = make_payload(args.items)
+    print("%10s %14s %12s" % ("backend", "dumps(ms)", "bytes"))
+    for backend in JSON_BACKENDS:
+        try:
+            serializer = JSONSerializer(backend)
+        except ImportError:
+            print("%10s %14s" % (backend, "not installed"))
+            continue
+        size = len(serializer.dumps(payload))
+        cost = timeit.timeit(lambda: serializer.dumps(payload), number=args.rounds) / args.rounds * 1e3
+        print("%10s %14.3f %12d" % (backend, cost, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Per-request cost of a ``@nuxt.route`` view through the a2wsgi responder
+against the native sync dispatch.
+
+    python benchmarks/bench_sync_dispatch.py [--requests 5000]
+
+Requests are driven straight through the ASGI interface so the numbers only
+contain nuxt/starlette work, not a server or a test client.
+"""
+from nuxt.app import NuxtApplication
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+
+def make_app(mode: str) -> NuxtApplication:
+    app = NuxtApplication({"sync_dispatch": mode})
+
+    def user_info(request, uid):
+        return {"code": 200, "uid": uid, "page": request.args.get("page")}
+
+    app.wsgi_app.add_url_rule("/user/<int:uid>", "user_info", user_info, methods=["GET"])
+    return app
+
+
+async def request(app: NuxtApplication, path: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"page=2",
+        "headers": [(b"host", b"bench"), (b"accept", b"*/*")], "client": ("127.0.0.1", 5000), "server": ("127.0.0.1", 80),
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def run(mode: str, count: int):
+    app = make_app(mode)
+    assert await request(app, "/user/1") == 200
+    started = time.perf_counter()
+    for i in range(count):
+        await request(app, "/user/%d" % i)
+    elapsed = time.perf_counter() - started
+
+    peaks = 0
+    tracemalloc.start()
+    for i in range(200):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await request(app, "/user/%d" % i)
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return elapsed / count * 1e6, peaks / 200 / 1024
+
+
+def main():
+    cli = argparse.ArgumentParser()
+    cli.add_argument("--requests", type=int, default=5000)
+    args = cli.parse_args()
+
+    print("%10s %14s %18s" % ("mode", "latency(us)", "peak KiB/req"))
+    for mode in ("a2wsgi", "native"):
+        latency, peak = asyncio.run(run(mode, args.requests))
+        print("%10s %14.1f %18.1f" % (mode, latency, peak))
+
+
+if __name__ == "__main__":
+    main()
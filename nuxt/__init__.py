@@ -1,6 +1,7 @@
 from nuxt.requests import SyncRequest as Request
 from nuxt.responses import SyncResponse as Response
-from nuxt.templating import render_template, render_html
+from nuxt.sendfile import send_file
+from nuxt.templating import render_template, render_html, stream_template, stream_html
 from nuxt.app import WSGIBlueprint as Blueprint
 from nuxt.app import entry_app as __entry_app
 from nuxt.utils import LocalProxy as __LocalProxy
@@ -1,7 +1,12 @@
+import sys
 import os
 
 
 def run():
+    if len(sys.argv) > 1:
+        from nuxt.commands import cli
+        if sys.argv[1] in cli.commands:
+            return cli()
     if os.name == "nt":  # windows platform
         from nuxt.__main_uvicorn import run as nt_run
         return nt_run()
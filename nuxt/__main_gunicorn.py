@@ -2,7 +2,9 @@ from nuxt.app import NuxtApplication, entry_app
 from nuxt.utils import getcwd, remove_suffix
 from nuxt.reloader import reloader_engines
 from nuxt.staticfiles import StaticFiles
+from nuxt.bundles import BundleFiles
 from nuxt.openapi import SchemaGenerator
+from nuxt.templating import warm_templates
 from nuxt.routing import Mount
 from gunicorn.app.base import BaseApplication
 from gunicorn.workers.base import Worker
@@ -54,6 +56,7 @@ class WebApplication(BaseApplication):
             # realod entry module
             importlib.reload(self.module)
             self.application.routes.extend(static_routes)
+            self.application.freeze_routes()
             self.application.logger.info("Worker reloading: %s modified", fname)
             for route in self.application.routes:
                 entry_app.logger.debug(route)
@@ -119,14 +122,15 @@ def settings(cfg: dict) -> dict:
 @click.option("--config", default="", type=str, help="Your nuxt app config json file path.")
 @click.option("--openapi", default=False, type=bool, help="Enable openapi schema and swagger ui.")
 @click.option("--openapi-url-path", default="/docs", type=str, help="Openapi schema and ui path, default is /docs")
-@click.option("--static", default="", type=str, help="Your static file directory path.")
+@click.option("--openapi-schema", default="", type=str, help="Serve this schema file from `nuxt openapi export`.")
+@click.option("--static", default="", type=str, help="Your static file directory or bundle path.")
 @click.option("--static-index", default=False, type=bool, help="Display the index page if path in static is dir.")
 @click.option("--static-url-path", default="", type=str, help="Your static url path, default is static directory path basename.")
 @click.option("--debug", default=False, type=bool, help="Enable nuxt app debug mode.")
 @click.option("--address", default="0.0.0.0", type=str, help="Listen and serve address.")
 @click.option("--port", default=5000, type=int, help="Listen and serve port.")
 @click.option("--workers", default=os.cpu_count(), type=int, help="Prefork work count, default is cpu core count.")
-def run(module: str, config: str, openapi: bool, openapi_url_path: str, static: str, static_index: bool, static_url_path,
+def run(module: str, config: str, openapi: bool, openapi_url_path: str, openapi_schema: str, static: str, static_index: bool, static_url_path,
         debug: bool, address: str, port: int, workers: int):
     chdir = getcwd()
     os.chdir(chdir)
@@ -148,6 +152,9 @@ def run(module: str, config: str, openapi: bool, openapi_url_path: str, static:
         with open(config, "r", encoding="utf-8") as fd:
             json_cfg: dict = settings(json.loads(fd.read()))
             cfg.update(json_cfg)
+    if openapi_schema:
+        openapi = True
+        cfg.setdefault("openapi", {}).update({"enable": True, "schema_file": openapi_schema})
     # 1.1 reinit app with cfg
     entry_app.__init__(cfg)
     # 2. import user's module
@@ -155,15 +162,31 @@ def run(module: str, config: str, openapi: bool, openapi_url_path: str, static:
     if module:
         _module = remove_suffix(module, ".py")
         module_type = importlib.import_module(_module)
+    if cfg.get("template", {}).get("warm"):
+        count, errors = warm_templates()
+        for name, error in errors.items():
+            entry_app.logger.warning("Template %s failed to compile: %s", name, error)
+        entry_app.logger.debug("%d templates compiled", count)
     # 3. setup internel route
     if openapi:
         openapi_cfg: dict = cfg.get("openapi")
-        schemas = SchemaGenerator(openapi_cfg.get("base_schema"), url_prefx=openapi_url_path)
+        schemas = SchemaGenerator(openapi_cfg.get("base_schema"), url_prefx=openapi_url_path,
+                                      schema_file=openapi_cfg.get("schema_file"))
         entry_app.routes.extend(schemas.routes())
     if static:
         if not static_url_path:
             static_url_path = "/"+os.path.basename(os.path.realpath(static))
-        entry_app.routes.append(Mount(static_url_path, app=StaticFiles(directory=static, list_directory=static_index, html=True), name="async.nuxt.static"))
+            if os.path.isfile(static):
+                static_url_path = os.path.splitext(static_url_path)[0]
+        if os.path.isfile(static):
+            # a bundle built by `nuxt bundle`
+            static_app = BundleFiles(path=static, html=True)
+        else:
+            static_app = StaticFiles(directory=static, list_directory=static_index, html=True,
+                                     cache=cfg.get("static_cache", False), compress=cfg.get("static_compress", False),
+                                     precompressed=cfg.get("static_precompressed", False))
+        entry_app.routes.append(Mount(static_url_path, app=static_app, name="async.nuxt.static"))
+    entry_app.freeze_routes()
     if cfg["debug"]:
         for route in entry_app.routes:
             entry_app.logger.debug(route)
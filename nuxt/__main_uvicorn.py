@@ -1,7 +1,9 @@
 from nuxt.app import NuxtApplication
 from nuxt.utils import getcwd, remove_suffix
 from nuxt.staticfiles import StaticFiles
+from nuxt.bundles import BundleFiles
 from nuxt.openapi import SchemaGenerator
+from nuxt.templating import warm_templates
 from nuxt.routing import Mount
 from uvicorn import Config as UVConfig, Server
 from uvicorn.supervisors import ChangeReload, Multiprocess
@@ -47,16 +49,31 @@ class Config(UVConfig):
         if self.module:
             _module = remove_suffix(self.module, ".py")
             importlib.import_module(_module)
+        if self.cfg.get("template", {}).get("warm"):
+            count, errors = warm_templates()
+            for name, error in errors.items():
+                entry_app.logger.warning("Template %s failed to compile: %s", name, error)
+            entry_app.logger.debug("%d templates compiled", count)
         # 3. setup internel route
         if self.openapi:
             openapi_cfg: dict = self.cfg.get("openapi")
-            schemas = SchemaGenerator(openapi_cfg.get("base_schema"), url_prefx=self.openapi_url_path)
+            schemas = SchemaGenerator(openapi_cfg.get("base_schema"), url_prefx=self.openapi_url_path,
+                                          schema_file=openapi_cfg.get("schema_file"))
             entry_app.routes.extend(schemas.routes())
         if self.static:
             if not self.static_url_path:
                 self.static_url_path = "/"+os.path.basename(os.path.realpath(self.static))
-            entry_app.routes.append(Mount(self.static_url_path, app=StaticFiles(directory=self.static,
-                                    list_directory=self.static_index, html=True), name="async.nuxt.static"))
+                if os.path.isfile(self.static):
+                    self.static_url_path = os.path.splitext(self.static_url_path)[0]
+            if os.path.isfile(self.static):
+                # a bundle built by `nuxt bundle`
+                static_app = BundleFiles(path=self.static, html=True)
+            else:
+                static_app = StaticFiles(directory=self.static, list_directory=self.static_index, html=True,
+                                         cache=self.cfg.get("static_cache", False), compress=self.cfg.get("static_compress", False),
+                                         precompressed=self.cfg.get("static_precompressed", False))
+            entry_app.routes.append(Mount(self.static_url_path, app=static_app, name="async.nuxt.static"))
+        entry_app.freeze_routes()
         if self.cfg["debug"]:
             for route in entry_app.routes:
                 entry_app.logger.debug(route)
@@ -81,14 +98,15 @@ def settings(cfg: dict) -> dict:
 @click.option("--config", default="", type=str, help="Your nuxt app config json file path.")
 @click.option("--openapi", default=False, type=bool, help="Enable openapi schema and swagger ui.")
 @click.option("--openapi-url-path", default="/docs", type=str, help="Openapi schema and ui path, default is /docs")
-@click.option("--static", default="", type=str, help="Your static file directory path.")
+@click.option("--openapi-schema", default="", type=str, help="Serve this schema file from `nuxt openapi export`.")
+@click.option("--static", default="", type=str, help="Your static file directory or bundle path.")
 @click.option("--static-index", default=False, type=bool, help="Display the index page if path in static is dir.")
 @click.option("--static-url-path", default="", type=str, help="Your static url path, default is static directory path basename.")
 @click.option("--debug", default=False, type=bool, help="Enable nuxt app debug mode.")
 @click.option("--address", default="0.0.0.0", type=str, help="Listen and serve address.")
 @click.option("--port", default=5000, type=int, help="Listen and serve port.")
 @click.option("--workers", default=os.cpu_count(), type=int, help="Prefork work count, default is cpu core count.")
-def run(module: str, config: str, openapi: bool, openapi_url_path: str, static: str, static_index: bool, static_url_path,
+def run(module: str, config: str, openapi: bool, openapi_url_path: str, openapi_schema: str, static: str, static_index: bool, static_url_path,
         debug: bool, address: str, port: int, workers: int):
     chdir = getcwd()
     os.chdir(chdir)
@@ -110,6 +128,9 @@ def run(module: str, config: str, openapi: bool, openapi_url_path: str, static:
         with open(config, "r", encoding="utf-8") as fd:
             json_cfg: dict = settings(json.loads(fd.read()))
             cfg.update(json_cfg)
+    if openapi_schema:
+        openapi = True
+        cfg.setdefault("openapi", {}).update({"enable": True, "schema_file": openapi_schema})
     config = Config(cfg, module, openapi, openapi_url_path, static, static_index, static_url_path,
                     debug, address, port, workers)
     server = Server(config=config)
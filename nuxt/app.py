@@ -1,30 +1,60 @@
 from madara.blueprints import Blueprint as MadaraBlueprint
+from madara.blueprints import BlueprintSetupState as MadaraBlueprintSetupState
 from madara.app import Madara
 from starlette.applications import Starlette
-from nuxt.routing import BaseRoute, Route
+from starlette.requests import ClientDisconnect
+from nuxt.routing import BaseRoute, Route, CompiledRouter, RouteList
 from nuxt.datastructures import ImmutableDict
-from nuxt.requests import SyncRequest, AsyncRequest, WebSocket
-from nuxt.exceptions import SyncHTTPException, SyncNotFound, SyncInternalServerError
+from nuxt.requests import SyncRequest, NativeSyncRequest, AsyncRequest, WebSocket, BodyLimit
+from nuxt.responses import SyncResponse, BaseSyncResponse, SyncFileResponse
+from nuxt.exceptions import SyncHTTPException, SyncNotFound, SyncInternalServerError, SyncRequestEntityTooLarge, AsyncHTTPException
 from nuxt.utils import format_pattern, endpoint_from_view_func, load_config, import_string, make_sync_response, make_async_response
+from nuxt.serializers import serializer
+from nuxt.caching import ResponseCache, ResponseCacheRegistry, conditional_view, cached_view
+from nuxt.concurrency import Bulkhead, BulkheadRegistry, AdaptiveThreadPoolExecutor, inherit_bulkhead_options
 from concurrent.futures import ThreadPoolExecutor
 from a2wsgi.asgi_typing import Receive, Scope, Send, ASGIApp
 from a2wsgi.wsgi_typing import WSGIApp
-from a2wsgi.wsgi import WSGIResponder
+from nuxt.streaming import SyncResponseStream, StreamingWSGIResponder, DEFAULT_BUFFER_SIZE
+import contextvars
+import contextlib
+import functools
 import traceback
+import inspect
+import tempfile
+import asyncio
 import typing
 
 
+DEFAULT_SPOOL_SIZE = 1024 * 1024
+# set on an exception whose process_exception hooks already ran in a middleware scope
+HANDLED_BY = "__nuxt_handled_by__"
+
+
 class WSGIApplicationResponder:
 
-    def __init__(self, app: WSGIApp, executor: ThreadPoolExecutor, endpoint: str, func: typing.Callable) -> None:
-        self.app, self.executor, self.endpoint = app, executor, endpoint
+    def __init__(self, app: WSGIApp, executor: ThreadPoolExecutor, endpoint: str, func: typing.Callable,
+                 bulkhead: typing.Optional[Bulkhead] = None, max_body_size: typing.Optional[int] = None,
+                 cache: typing.Optional[ResponseCache] = None) -> None:
+        self.app, self.executor, self.endpoint, self.bulkhead, self.cache = app, executor, endpoint, bulkhead, cache
+        self.native_dispatch = app.config.get("sync_dispatch") == "native"
+        self.buffer_size = app.config.get("streaming", {}).get("buffer_size", DEFAULT_BUFFER_SIZE)
+        self.spool_size = app.config.get("request_body", {}).get("spool_size", DEFAULT_SPOOL_SIZE)
+        self.body_limit = None if max_body_size is None else BodyLimit(max_body_size, SyncRequestEntityTooLarge)
         self.__doc__ = func.__doc__
+        self.__apispec__ = getattr(func, "__apispec__", ())
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         scope.update({"nuxt_endpoint": self.endpoint})
         if scope["type"] == "http":
-            responder = WSGIResponder(self.app, self.executor)
-            return await responder(scope, receive, send)
+            if self.body_limit is not None:
+                if self.body_limit.exceeds(scope):
+                    return await self.body_limit.reject(scope, receive, send)
+                receive = self.body_limit.wrap(receive)
+            if self.cache is not None:
+                # concurrent misses wait on the event loop, not in the executor
+                return await self.cache.coalesce_sync(scope, lambda: self.isolate(scope, receive, send))
+            return await self.isolate(scope, receive, send)
 
         if scope["type"] == "websocket":
             await send({"type": "websocket.close", "code": 1000})
@@ -39,17 +69,221 @@ class WSGIApplicationResponder:
             await send({"type": "lifespan.shutdown.complete"})
             return
 
+    async def isolate(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.bulkhead is None:
+            return await self.handle(scope, receive, send)
+        if not await self.bulkhead.acquire():
+            return await self.bulkhead.shed_response(scope, receive, send)
+        try:
+            return await self.handle(scope, receive, send)
+        finally:
+            self.bulkhead.release()
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.native_dispatch:
+            return await self.dispatch(scope, receive, send)
+        responder = StreamingWSGIResponder(self.app, self.executor, self.buffer_size)
+        return await responder(scope, receive, send)
+
+    async def dispatch(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Run the sync view in the executor with a NativeSyncRequest and send the
+        response as ASGI messages, without the WSGI environ/start_response round-trip.
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            body = await self.read_body(receive)
+        except SyncRequestEntityTooLarge:
+            return await self.body_limit.reject(scope, receive, send)
+        except ClientDisconnect:
+            # the view never sees a truncated body
+            return
+        request = NativeSyncRequest(scope, body)
+        request.endpoint, request.view_args = self.endpoint, scope.get("path_params", {})
+        context = contextvars.copy_context()
+        try:
+            response = await loop.run_in_executor(self.executor, context.run, self.app.handle_request, request)
+            if isinstance(response, SyncHTTPException):
+                response = response.get_response()
+            elif not isinstance(response, BaseSyncResponse):
+                # a plain WSGI callable returned by middleware
+                response = SyncResponse.force_type(response, request.environ)
+            try:
+                await self.send_response(scope, receive, send, request, response)
+            finally:
+                if response.is_sequence:
+                    response.close()
+                else:
+                    await loop.run_in_executor(self.executor, context.run, response.close)
+        finally:
+            # uploaded and spooled files
+            request.close()
+
+    async def read_body(self, receive: Receive) -> typing.Union[bytes, typing.BinaryIO]:
+        """
+        Receive the whole request body, a body bigger than ``spool_size`` is written
+        to a temporary file instead of being held in memory.
+        """
+        chunks, size, spool, more_body = [], 0, None, True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                if spool is not None:
+                    spool.close()
+                raise ClientDisconnect()
+            chunk = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            size += len(chunk)
+            if spool is None and size > self.spool_size:
+                spool = tempfile.TemporaryFile()
+                spool.writelines(chunks)
+                chunks = None
+            if spool is not None:
+                spool.write(chunk)
+            else:
+                chunks.append(chunk)
+        if spool is not None:
+            spool.seek(0)
+            return spool
+        return chunks[0] if len(chunks) == 1 else b"".join(chunks)
+
+    async def send_response(self, scope: Scope, receive: Receive, send: Send, request: NativeSyncRequest,
+                            response: SyncResponse) -> None:
+        status = response.status_code
+        if isinstance(response, SyncFileResponse):
+            # ranges and zero-copy sends, from the event loop
+            raw_headers = [(key.lower().encode("latin1"), value.encode("latin1")) for key, value in response.headers.items()]
+            return await response.file_send.send(scope, send, raw_headers)
+        no_content = status in (204, 304) or 100 <= status < 200
+        bodyless = no_content or scope["method"] == "HEAD"
+        body = None
+        if response.is_sequence and not no_content:
+            # encoded once, for the Content-Length (a HEAD gets it too) and the body
+            body = b"".join(response.iter_encoded())
+            if "content-length" not in response.headers:
+                response.headers["Content-Length"] = str(len(body))
+        headers = response.headers
+        if no_content or "location" in headers or "content-location" in headers:
+            # werkzeug's fixups (entity headers of a 304, absolute Location), only these need the environ
+            headers = response.get_wsgi_headers(request.environ)
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(key.lower().encode("latin1"), value.encode("latin1")) for key, value in headers.items()],
+        })
+        if bodyless:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if body is not None:
+            await send({"type": "http.response.body", "body": body})
+            return
+        # streamed response, chunks are produced in the executor as the client reads them.
+        await SyncResponseStream(response.iter_encoded(), self.executor, self.buffer_size)(receive, send)
+
+
+class SyncMiddlewareScope:
+    """
+    Sync middlewares scoped to a blueprint or a route. The middleware chain is built
+    once around ``dispatch_view`` and the process_view/process_exception hooks that
+    exist are collected, the scope is called like a view: ``scope(request, **view_args)``.
+    """
+
+    def __init__(self, app, middlewares: typing.List) -> None:
+        self.handlers: typing.Dict[str, typing.Callable] = {}
+        self.view_funcs: typing.Dict[str, typing.Callable] = {}
+        self.view_middleware, self.exception_middleware = [], []
+        handler = self.dispatch_view
+        for md in reversed(middlewares):
+            mw = md
+            if isinstance(md, str):
+                mw = import_string(md)
+            mw_instance = mw(handler, app)
+            if hasattr(mw_instance, "process_view"):
+                self.view_middleware.insert(0, mw_instance.process_view)
+            if hasattr(mw_instance, "process_exception"):
+                self.exception_middleware.append(mw_instance.process_exception)
+            handler = mw_instance
+        self._middleware_chain = handler
+
+    def add(self, endpoint: str, view_func: typing.Callable, handler: typing.Callable) -> None:
+        self.view_funcs[endpoint], self.handlers[endpoint] = view_func, handler
+
+    def dispatch_view(self, request: SyncRequest):
+        endpoint, view_kwargs = request.endpoint, request.view_args
+        try:
+            for middleware_method in self.view_middleware:
+                rv = middleware_method(request, self.view_funcs[endpoint], view_kwargs)
+                if rv:
+                    return rv
+            return self.handlers[endpoint](request, **view_kwargs)
+        except SyncHTTPException as e:
+            return e
+        except Exception as e:
+            rv = self.process_exception(request, e)
+            if rv is None:
+                # the hooks ran, __call__ re-raises it as is
+                e.__dict__[HANDLED_BY] = self
+                raise
+            return rv
+
+    def process_exception(self, request: SyncRequest, exception: Exception):
+        for middleware_method in self.exception_middleware:
+            rv = middleware_method(request, exception)
+            if rv:
+                return rv
+        return None
+
+    def __call__(self, request: SyncRequest, **view_args):
+        try:
+            return self._middleware_chain(request)
+        except Exception as e:
+            handled = e.__dict__.pop(HANDLED_BY, None) is self
+            # a middleware may have raised another exception from the marked one
+            context = e.__context__
+            while context is not None:
+                context.__dict__.pop(HANDLED_BY, None)
+                context = context.__context__
+            if handled:
+                raise
+            rv = self.process_exception(request, e)
+            if rv is None:
+                raise
+            return rv
+
+
+class WSGIBlueprintSetupState(MadaraBlueprintSetupState):
+
+    def add_url_rule(self, pattern, endpoint=None, view_func=None, **options):
+        options = inherit_bulkhead_options(options, self.options, self.blueprint.name)
+        if "max_body_size" in self.options and "max_body_size" not in options:
+            options["max_body_size"] = self.options["max_body_size"]
+        if self.blueprint.middleware_scope is not None:
+            options["scopes"] = [self.blueprint.middleware_scope] + list(options.get("scopes", []))
+        super().add_url_rule(pattern, endpoint, view_func, **options)
+
 
 class WSGIBlueprint(MadaraBlueprint):
 
+    middleware_scope: typing.Optional[SyncMiddlewareScope] = None
+
+    def make_setup_state(self, app, options):
+        return WSGIBlueprintSetupState(self, app, options)
+
+    def register(self, app, options: dict):
+        self.app = app
+        # blueprint middlewares are built once and compiled into each endpoint's pipeline
+        middlewares = options.get("middlewares", [])
+        self.middleware_scope = SyncMiddlewareScope(app, middlewares) if middlewares else None
+        state = self.make_setup_state(app, options)
+        for deferred in self.deferred_functions:
+            deferred(state)
+
     def route(self, pattern, **options):
 
         def decorator(func):
             endpoint = options.pop("endpoint", func.__name__)
             self.endpoint_map["sync.%s.%s" % (self.name, endpoint)] = func
-            _view_entry = lambda req, **view_args: self.view_entry(req, **view_args)
-            _view_entry.__doc__ = func.__doc__
-            self.add_url_rule(pattern, endpoint, _view_entry, **options)
+            self.add_url_rule(pattern, endpoint, func, **options)
             return func
 
         return decorator
@@ -60,43 +294,83 @@ class WSGIApplication(Madara):
     def __init__(self, app: Starlette, config: dict = None):
         super().__init__(config)
         self.base_app = app
-        self.executor = ThreadPoolExecutor(
-            thread_name_prefix="WSGI", max_workers=self.config.get("workers", 10)
-        )
+        executor_config: dict = self.config.get("executor", {})
+        if executor_config.get("adaptive"):
+            self.executor = AdaptiveThreadPoolExecutor(
+                thread_name_prefix="WSGI",
+                min_workers=executor_config.get("min_workers", 2),
+                max_workers=executor_config.get("max_workers", self.config.get("workers", 10)),
+                target_wait=executor_config.get("target_wait", 0.01),
+                interval=executor_config.get("interval", 1.0),
+            )
+        else:
+            self.executor = ThreadPoolExecutor(
+                thread_name_prefix="WSGI", max_workers=self.config.get("workers", 10)
+            )
+        self.bulkheads = BulkheadRegistry(self.config.get("pools"), thread_pool=True)
+        self.caches = ResponseCacheRegistry(self.config.get("cache"))
+        self.pipelines: typing.Dict[str, typing.Callable] = {}
 
     def dispatch_request(self, request: SyncRequest):
+        pipeline = self.pipelines.get(request.endpoint, None)
+        if not pipeline:
+            return SyncNotFound()
+        return pipeline(request)
+
+    def compile_pipeline(self, view_func: typing.Callable, handler: typing.Callable) -> typing.Callable:
+        """
+        Build the dispatch function of an endpoint, only the view middleware hooks that
+        exist are compiled in and a handler without scoped middlewares is the view itself.
+        """
+        view_middleware = tuple(self._view_middleware)
+        make_response = self.make_response
+
+        if view_middleware:
+            def call_view(request: SyncRequest):
+                view_kwargs = request.view_args
+                for middleware_method in view_middleware:
+                    rv = middleware_method(request, view_func, view_kwargs)
+                    if rv:
+                        return rv
+                return handler(request, **view_kwargs)
+        else:
+            def call_view(request: SyncRequest):
+                return handler(request, **request.view_args)
+
+        def pipeline(request: SyncRequest):
+            try:
+                return make_response(request, call_view(request))
+            except SyncHTTPException as e:
+                return e
+            except Exception as e:
+                return self.handle_exception(request, e)
+
+        return pipeline
+
+    def handle_exception(self, request: SyncRequest, e: Exception):
+        if not self._exception_middleware:
+            # if no exception process middleware log the traceback.
+            self.logger.error(traceback.format_exc())
         try:
-            endpoint, view_kwargs = request.endpoint, request.view_args
-            endpoint_func = self.endpoint_map.get(endpoint, None)
-            if not endpoint_func:
-                raise SyncNotFound()
-            rv = self.process_view_by_middleware(request, endpoint_func, view_kwargs)
+            rv = self.process_exception_by_middleware(request, e)
             if rv is None:
-                rv = endpoint_func(request, **view_kwargs)
-            return self.make_response(request, rv)
-        except SyncHTTPException as e:
-            return e
-        except Exception as e:
-            if not self._exception_middleware:
-                # if no exception process middleware log the traceback.
-                self.logger.error(traceback.format_exc())
-            try:
-                rv = self.process_exception_by_middleware(request, e)
-                if rv is None:
-                    return SyncInternalServerError(original_exception=e)
-                return self.make_response(request, rv)
-            except Exception as re:
-                # if exception process middleware raise a exception, log the traceback and return an InternalServerError.
-                self.logger.error(traceback.format_exc())
                 return SyncInternalServerError(original_exception=e)
+            return self.make_response(request, rv)
+        except Exception as re:
+            # if exception process middleware raise a exception, log the traceback and return an InternalServerError.
+            self.logger.error(traceback.format_exc())
+            return SyncInternalServerError(original_exception=e)
 
     def wsgi_app(self, environ: dict, start_response):
         asgi_scope: dict = environ.get("asgi.scope")
         request = SyncRequest(environ)
+        request.endpoint, request.view_args = asgi_scope.get("nuxt_endpoint"), asgi_scope.get("path_params", {})
+        response = self.handle_request(request)
+        return response(environ, start_response)
+
+    def handle_request(self, request: SyncRequest):
         try:
-            request.endpoint, request.view_args = asgi_scope.get("nuxt_endpoint"), asgi_scope.get("path_params", {})
-            response = self._middleware_chain(request)
-            return response(environ, start_response)
+            return self._middleware_chain(request)
         except Exception as e:
             # process middleware chain __call__ error
             response = self.make_response(request, SyncInternalServerError(original_exception=e))
@@ -110,30 +384,90 @@ class WSGIApplication(Madara):
                         response = self.make_response(request, rv)
                 except Exception as re:
                     response = self.make_response(request, SyncInternalServerError(original_exception=e))
-            return response(environ, start_response)
+            return response
 
     def make_response(self, request, rv):
         return make_sync_response(request, rv)
 
-    def get_responder(self, endpoint: str, func):
+    def get_responder(self, endpoint: str, func, bulkhead: typing.Optional[Bulkhead] = None,
+                      max_body_size: typing.Optional[int] = None, cache: typing.Optional[ResponseCache] = None):
         self.endpoint_map[endpoint] = func
-        return WSGIApplicationResponder(self, self.executor, endpoint, func)
+        executor = bulkhead.executor if bulkhead else self.executor
+        return WSGIApplicationResponder(self, executor, endpoint, func, bulkhead=bulkhead, max_body_size=max_body_size,
+                                        cache=cache)
 
     def add_url_rule(self, pattern: str, endpoint=None, view_func=None, provide_automatic_options=None, **options):
         endpoint = "sync.%s" % (endpoint if endpoint else endpoint_from_view_func(view_func))
-        self.base_app.router.routes.append(Route(format_pattern(pattern), self.get_responder(endpoint, view_func),
-                                                 methods=options.get("methods"), name=endpoint))
+        bulkhead = self.bulkheads.get(endpoint, options)
+        # route middlewares wrap the view, blueprint scopes wrap the route ones.
+        handler = view_func
+        etag = options.get("etag", self.config.get("etag"))
+        if etag:
+            handler = conditional_view(view_func, etag)
+        # the cache is the innermost wrapper, a hit still goes through every middleware
+        cache = self.caches.get(endpoint, options)
+        if cache is not None:
+            handler = cached_view(handler, cache)
+        scopes = list(options.get("scopes", []))
+        if options.get("middlewares"):
+            scopes.append(SyncMiddlewareScope(self, options["middlewares"]))
+        for scope in reversed(scopes):
+            scope.add(endpoint, view_func, handler)
+            handler = scope
+        self.pipelines[endpoint] = self.compile_pipeline(view_func, handler)
+        max_body_size = options.get("max_body_size", self.config.get("request_body", {}).get("max_size"))
+        responder = self.get_responder(endpoint, view_func, bulkhead, max_body_size, cache)
+        self.base_app.router.routes.append(Route(format_pattern(pattern), responder, methods=options.get("methods"), name=endpoint))
 
 
 class ASGIApplicationResponder:
 
-    def __init__(self, app: ASGIApp, endpoint: str, func: typing.Callable, sub_app=False) -> None:
-        self.app, self.endpoint, self.sub_app = app, endpoint, sub_app
+    def __init__(self, app: ASGIApp, endpoint: str, func: typing.Callable, sub_app=False,
+                 bulkhead: typing.Optional[Bulkhead] = None, max_body_size: typing.Optional[int] = None) -> None:
+        self.app, self.endpoint, self.sub_app, self.bulkhead = app, endpoint, sub_app, bulkhead
+        self.body_limit = None if max_body_size is None else BodyLimit(max_body_size, lambda: AsyncHTTPException(413))
         self.__doc__ = func.__doc__
+        self.__apispec__ = getattr(func, "__apispec__", ())
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         scope.update({"nuxt_endpoint": self.endpoint, "nuxt_sub_app": self.sub_app})
-        await self.app(scope, receive, send)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.body_limit is not None:
+            if self.body_limit.exceeds(scope):
+                await self.body_limit.reject(scope, receive, send)
+                return
+            receive = self.body_limit.wrap(receive)
+        await self.isolate(scope, receive, send)
+
+    async def isolate(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.bulkhead is None:
+            await self.app(scope, receive, send)
+            return
+        if not await self.bulkhead.acquire():
+            await self.bulkhead.shed_response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.bulkhead.release()
+
+
+async def call_endpoint(endpoint_func: typing.Callable, scope: Scope, receive: Receive, send: Send) -> None:
+    is_websocket = scope["type"] == "websocket"
+    if is_websocket:
+        request = WebSocket(scope, receive, send)
+    else:
+        request = AsyncRequest(scope, receive, send)
+
+    rv = await endpoint_func(request, **request.path_params)
+
+    if is_websocket:
+        return
+
+    response = make_async_response(rv)
+    await response(scope, receive, send)
 
 
 class ASGIBlueprintSetupState:
@@ -148,6 +482,18 @@ class ASGIBlueprintSetupState:
             url_prefix = self.blueprint.url_prefix
         self.url_prefix: str = url_prefix
 
+    def get_bulkhead(self, endpoint: str, options: dict) -> typing.Optional[Bulkhead]:
+        return self.app.bulkheads.get(endpoint, inherit_bulkhead_options(options, self.options, self.blueprint.name))
+
+    def get_view(self, func: typing.Callable, options: dict) -> typing.Callable:
+        etag = options.get("etag", self.app.config.get("etag"))
+        return conditional_view(func, etag, is_async=True) if etag else func
+
+    def get_max_body_size(self, options: dict) -> typing.Optional[int]:
+        if "max_body_size" in options:
+            return options["max_body_size"]
+        return self.options.get("max_body_size", self.app.config.get("request_body", {}).get("max_size"))
+
     def add_route(
         self,
         path: str,
@@ -155,11 +501,12 @@ class ASGIBlueprintSetupState:
         methods: typing.Optional[typing.List[str]] = None,
         name: typing.Optional[str] = None,
         include_in_schema: bool = True,
+        max_body_size: typing.Optional[int] = None,
     ) -> None:
         if self.url_prefix is not None:
             path = "/".join((self.url_prefix.rstrip("/"), path.lstrip("/"))) if path else self.url_prefix
         self.app.add_route(
-            path, route, methods=methods, name=name, include_in_schema=include_in_schema
+            path, route, methods=methods, name=name, include_in_schema=include_in_schema, max_body_size=max_body_size
         )
 
     def add_websocket_route(
@@ -177,6 +524,7 @@ class ASGIBlueprint:
         self.url_prefix = url_prefix
         self.deferred_functions = []
         self.endpoint_map = {}
+        self.endpoint_caches: typing.Dict[str, ResponseCache] = {}
         self.base_app: Starlette = None
         self._middleware_chain = None
 
@@ -209,26 +557,22 @@ class ASGIBlueprint:
             await self.base_app.router.not_found(scope, receive, send)
             return
 
-        is_websocket = scope["type"] == "websocket"
-        if is_websocket:
-            request = WebSocket(scope, receive, send)
-        else:
-            request = AsyncRequest(scope, receive, send)
-
-        rv = await endpoint_func(request, **request.path_params)
-
-        if is_websocket:
+        # the cache runs after the middlewares, a hit is replayed to the requests they let through
+        cache = self.endpoint_caches.get(endpoint)
+        if cache is not None and scope["type"] == "http":
+            await cache(scope, receive, send, functools.partial(call_endpoint, endpoint_func))
             return
-
-        response = make_async_response(rv)
-        await response(scope, receive, send)
+        await call_endpoint(endpoint_func, scope, receive, send)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         await self._middleware_chain(scope, receive, send)
 
-    def get_responder(self, endpoint: str, func):
+    def get_responder(self, endpoint: str, func, bulkhead: typing.Optional[Bulkhead] = None,
+                      cache: typing.Optional[ResponseCache] = None):
         self.endpoint_map[endpoint] = func
-        return ASGIApplicationResponder(self, endpoint, func)
+        if cache is not None:
+            self.endpoint_caches[endpoint] = cache
+        return ASGIApplicationResponder(self, endpoint, func, bulkhead=bulkhead)
 
     def route(self, pattern: str, **options) -> typing.Callable:
         endpoint = options.get("endpoint")
@@ -239,10 +583,11 @@ class ASGIBlueprint:
             name = "async.%s.%s" % (self.name, endpoint if endpoint else endpoint_from_view_func(func))
             self.record(lambda state: state.add_route(
                 format_pattern(pattern),
-                self.get_responder(name, func),
+                self.get_responder(name, state.get_view(func, options), state.get_bulkhead(name, options), state.app.caches.get(name, options)),
                 methods=options.get("methods"),
                 name=name,
                 include_in_schema=options.get("include_in_schema", True),
+                max_body_size=state.get_max_body_size(options),
             ))
             return func
 
@@ -266,7 +611,10 @@ class ASGIApplication:
     def __init__(self, app: Starlette, config: dict = None) -> None:
         self.base_app, self.config = app, config
         self.endpoint_map = {}
+        self.endpoint_caches: typing.Dict[str, ResponseCache] = {}
         self.blueprints = {}
+        self.bulkheads = BulkheadRegistry(self.config.get("pools"))
+        self.caches = ResponseCacheRegistry(self.config.get("cache"))
         self._middleware_chain = None
         self.load_middleware()
 
@@ -292,26 +640,21 @@ class ASGIApplication:
             await endpoint_func(scope, receive, send)
             return
 
-        is_websocket = scope["type"] == "websocket"
-        if is_websocket:
-            request = WebSocket(scope, receive, send)
-        else:
-            request = AsyncRequest(scope, receive, send)
-
-        rv = await endpoint_func(request, **request.path_params)
-
-        if is_websocket:
+        cache = self.endpoint_caches.get(endpoint)
+        if cache is not None and scope["type"] == "http":
+            await cache(scope, receive, send, functools.partial(call_endpoint, endpoint_func))
             return
-
-        response = make_async_response(rv)
-        await response(scope, receive, send)
+        await call_endpoint(endpoint_func, scope, receive, send)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         await self._middleware_chain(scope, receive, send)
 
-    def get_responder(self, endpoint: str, func, sub_app=False):
+    def get_responder(self, endpoint: str, func, sub_app=False, bulkhead: typing.Optional[Bulkhead] = None,
+                      max_body_size: typing.Optional[int] = None, cache: typing.Optional[ResponseCache] = None):
         self.endpoint_map[endpoint] = func
-        return ASGIApplicationResponder(self, endpoint, func, sub_app=sub_app)
+        if cache is not None:
+            self.endpoint_caches[endpoint] = cache
+        return ASGIApplicationResponder(self, endpoint, func, sub_app=sub_app, bulkhead=bulkhead, max_body_size=max_body_size)
 
     def register_blueprint(self, blueprint: ASGIBlueprint, **options) -> None:
         if blueprint.name in self.blueprints:
@@ -328,9 +671,13 @@ class ASGIApplication:
         methods: typing.Optional[typing.List[str]] = None,
         name: typing.Optional[str] = None,
         include_in_schema: bool = True,
+        bulkhead: typing.Optional[Bulkhead] = None,
+        max_body_size: typing.Optional[int] = None,
+        cache: typing.Optional[ResponseCache] = None,
     ) -> None:
         self.base_app.add_route(
-            path, self.get_responder(name, route), methods=methods, name=name, include_in_schema=include_in_schema
+            path, self.get_responder(name, route, bulkhead=bulkhead, max_body_size=max_body_size, cache=cache),
+            methods=methods, name=name, include_in_schema=include_in_schema
         )
 
     def add_websocket_route(
@@ -347,12 +694,16 @@ class ASGIApplication:
 
         def decorator(func: typing.Callable) -> typing.Callable:
             endpoint = "async.%s" % (options.get("endpoint") if options.get("endpoint") else endpoint_from_view_func(func))
+            etag = options.get("etag", self.config.get("etag"))
             self.add_route(
                 format_pattern(pattern),
-                func,
+                conditional_view(func, etag, is_async=True) if etag else func,
                 methods=options.get("methods"),
                 name=endpoint,
                 include_in_schema=options.get("include_in_schema", True),
+                bulkhead=self.bulkheads.get(endpoint, options),
+                max_body_size=options.get("max_body_size", self.config.get("request_body", {}).get("max_size")),
+                cache=self.caches.get(endpoint, options),
             )
             return func
 
@@ -382,6 +733,21 @@ class NuxtApplication:
                 "async": [],
             },
             "logger_handler": None,
+            "router": {
+                "compiled": False,
+            },
+            "sync_dispatch": "a2wsgi",
+            "serializer": {
+                "backend": "auto",
+            },
+            "streaming": {
+                "buffer_size": 64 * 1024,
+            },
+            "request_body": {
+                "max_size": None,
+                "spool_size": 1024 * 1024,
+            },
+            "etag": False,
         }
     )
 
@@ -396,7 +762,13 @@ class NuxtApplication:
             if key == "middlewares":
                 wsgi_config[key], asgi_config[key] = val["sync"], val["async"]
 
-        self.base_app = Starlette(debug=self.config.get("debug"), routes=[])
+        serializer.use(self.config.get("serializer", {}).get("backend", "auto"))
+        self.startup_hooks: typing.List[typing.Callable] = []
+        self.shutdown_hooks: typing.List[typing.Callable] = []
+        self.base_app = Starlette(debug=self.config.get("debug"), routes=[], lifespan=self.lifespan)
+        if self.config.get("router", {}).get("compiled"):
+            self.base_app.router = CompiledRouter(routes=[], lifespan=self.lifespan)
+        self.base_app.router.routes = RouteList()
         self.wsgi_app = WSGIApplication(self.base_app, wsgi_config)
         self.asgi_app = ASGIApplication(self.base_app, asgi_config)
 
@@ -404,10 +776,54 @@ class NuxtApplication:
     def routes(self) -> typing.List[BaseRoute]:
         return self.base_app.router.routes
 
+    def freeze_routes(self) -> None:
+        router = self.base_app.router
+        if isinstance(router.routes, RouteList):
+            router.routes.changed()
+        if isinstance(router, CompiledRouter):
+            router.freeze()
+
     @property
     def logger(self):
         return self.wsgi_app.logger
 
+    def on_startup(self, func: typing.Callable) -> typing.Callable:
+        """
+        Register a sync or async function run when the worker starts serving.
+        """
+        self.startup_hooks.append(func)
+        return func
+
+    def on_shutdown(self, func: typing.Callable) -> typing.Callable:
+        """
+        Register a sync or async function run when the worker stops, in the reverse
+        order of registration.
+        """
+        self.shutdown_hooks.append(func)
+        return func
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, app):
+        """
+        Run the hooks, inside the handlers added to the Starlette router with
+        ``add_event_handler``/``on_event``, which a lifespan would skip otherwise.
+        """
+        router = self.base_app.router
+        for hook in list(router.on_startup) + self.startup_hooks:
+            rv = hook()
+            if inspect.isawaitable(rv):
+                await rv
+        try:
+            yield
+        finally:
+            for hook in list(reversed(self.shutdown_hooks)) + router.on_shutdown:
+                try:
+                    rv = hook()
+                    if inspect.isawaitable(rv):
+                        await rv
+                except Exception:
+                    self.logger.error(traceback.format_exc())
+
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         await self.base_app(scope, receive, send)
 
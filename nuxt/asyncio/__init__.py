@@ -5,8 +5,13 @@ from nuxt.responses import AsyncResponse as Response
 from nuxt.responses import AsyncJSONResponse as JSONResponse
 from nuxt.responses import AsyncPlainTextResponse as PlainTextResponse
 from nuxt.responses import AsyncHTMLResponse as HTMLResponse
+from nuxt.responses import AsyncFileResponse as FileResponse
+from nuxt.sendfile import async_send_file as send_file
 from nuxt.templating import render_template
 from nuxt.templating import async_render_html as render_html
+from nuxt.templating import render_template_async, render_html_async, lazy_render_html
+from nuxt.templating import async_stream_template as stream_template
+from nuxt.templating import async_stream_html as stream_html
 from nuxt.app import ASGIBlueprint as Blueprint
 from nuxt.app import entry_app as __entry_app
 from nuxt.utils import LocalProxy as __LocalProxy
@@ -1,22 +1,37 @@
 from starlette.types import ASGIApp, Receive, Scope, Send
 from nuxt.asyncio.proxies.context import ProxyContext, ProxyConfig, BaseURLProxyConfigMixin
+from nuxt.app import entry_app
 from nuxt.asyncio.proxies.http import proxy_http
 from nuxt.asyncio.proxies.websocket import proxy_websocket
 from urllib.parse import urlparse
 import traceback
 import logging
+import typing
+import weakref
 
 
 log = logging.getLogger(__name__)
+# the proxies of the worker, closed by one shutdown hook of entry_app
+proxy_contexts: "weakref.WeakSet[ProxyContext]" = weakref.WeakSet()
 
 
-def make_proxy_response(upstream_base_url: str) -> ASGIApp:
+async def close_proxy_contexts() -> None:
+    for proxy_context in list(proxy_contexts):
+        await proxy_context.close()
+
+
+def make_proxy_response(upstream_base_url: str, max_concurrency: typing.Optional[int] = None, **connector_options) -> ASGIApp:
     """
     Given a upstream_base_url, return a simple ASGI application that can proxy
     HTTP and WebSocket connections.
 
     The handlers for the protocols can be overridden and/or removed with the
     respective parameters.
+
+    The upstream session and its connection pool live as long as the worker and are
+    closed on the application's lifespan shutdown. The pool is configured by the
+    aiohttp.TCPConnector ``connector_options`` (limit, limit_per_host,
+    keepalive_timeout, ttl_dns_cache...) over the ``proxy`` config.
     """
 
     proxy_http_handler = proxy_http
@@ -29,25 +44,39 @@ def make_proxy_response(upstream_base_url: str) -> ASGIApp:
             "rewrite_host_header": urlparse(upstream_base_url).netloc,
         },
     )()
-    proxy_context = ProxyContext(config)
+    options = dict(entry_app.config.get("proxy", {}))
+    options.update(connector_options)
+    if max_concurrency is None:
+        max_concurrency = options.pop("max_concurrency", 20)
+    else:
+        options.pop("max_concurrency", None)
+    proxy_context = ProxyContext(config, max_concurrency, options)
+    proxy_contexts.add(proxy_context)
+    if close_proxy_contexts not in entry_app.shutdown_hooks:
+        entry_app.on_shutdown(close_proxy_contexts)
 
     async def response(scope: Scope, receive: Receive, send: Send):  # noqa: ANN201
         try:
             if scope["type"] == "lifespan":
-                return await proxy_context.close()  # We explicitly do nothing here for this simple app.
+                # served as the application itself
+                message = await receive()
+                assert message["type"] == "lifespan.startup"
+                await send({"type": "lifespan.startup.complete"})
+                message = await receive()
+                assert message["type"] == "lifespan.shutdown"
+                await proxy_context.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
             if scope["type"] == "http" and proxy_http_handler:
-                await proxy_http_handler(
+                return await proxy_http_handler(
                     context=proxy_context, scope=scope, receive=receive, send=send
                 )
-                return await proxy_context.close()
             if scope["type"] == "websocket" and proxy_websocket_handler:
-                await proxy_websocket_handler(
+                return await proxy_websocket_handler(
                     context=proxy_context, scope=scope, receive=receive, send=send
                 )
-                return await proxy_context.close()
             raise NotImplementedError(f"Scope {scope} is not understood")
         except Exception as e:
             log.error(traceback.format_exc())
-            return await proxy_context.close()
 
     return response
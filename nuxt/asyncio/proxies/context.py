@@ -4,10 +4,20 @@ from starlette.datastructures import Headers
 from starlette.requests import Request
 from starlette.types import Scope
 from starlette.websockets import WebSocket
+import logging
 import aiohttp
 import asyncio
 
 Headerlike = Union[dict, Headers]
+log = logging.getLogger(__name__)
+
+# aiohttp.TCPConnector options of the upstream connection pool
+DEFAULT_CONNECTOR_OPTIONS = {
+    "limit": 100,
+    "limit_per_host": 0,
+    "keepalive_timeout": 15,
+    "ttl_dns_cache": 10,
+}
 
 
 class ProxyConfig:
@@ -102,17 +112,30 @@ class BaseURLProxyConfigMixin:
 
 
 class ProxyContext:
+    """
+    The upstream session of a proxy, opened on first use in the worker's event loop
+    and kept with its pool of keep-alive connections until ``close``.
+    """
     semaphore: asyncio.Semaphore
     _session: Optional[aiohttp.ClientSession] = None
+    _loop: Optional[asyncio.AbstractEventLoop] = None
 
-    def __init__(self, config: ProxyConfig, max_concurrency: int = 20,) -> None:
+    def __init__(self, config: ProxyConfig, max_concurrency: int = 20, connector_options: Optional[dict] = None) -> None:
         self.config = config
         self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.connector_options = dict(DEFAULT_CONNECTOR_OPTIONS)
+        self.connector_options.update(connector_options or {})
 
     @property
     def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and (self._session.closed or self._loop is not loop):
+            # a session can't outlive its loop (a restarted worker or a test client)
+            self.release()
         if not self._session:
-            self._session = aiohttp.ClientSession(cookie_jar=aiohttp.DummyCookieJar(), auto_decompress=False)
+            connector = aiohttp.TCPConnector(**self.connector_options)
+            self._session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(), auto_decompress=False)
+            self._loop = loop
         return self._session
 
     async def __aenter__(self) -> "ProxyContext":
@@ -122,6 +145,21 @@ class ProxyContext:
         await self.close()
 
     async def close(self) -> None:
-        if self._session:
-            await self._session.close()
-            self._session = None
+        if self._session is not None and self._loop is asyncio.get_running_loop():
+            session, self._session = self._session, None
+            await session.close()
+        else:
+            self.release()
+
+    def release(self) -> None:
+        """
+        Drop a session of another event loop, it is closed on that loop if the loop
+        still runs, its connections are abandoned otherwise.
+        """
+        session, loop, self._session = self._session, self._loop, None
+        if session is None or session.closed:
+            return
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            log.warning("Dropping an upstream session whose event loop is not running, its connections are left open")
@@ -1,13 +1,12 @@
-from nuxt import config
-from nuxt.utils import maschema_to_apisepc
+from nuxt.utils import ValidatedArgs
+from nuxt.validators import CompiledArgs, compile_argmap, resolve_unknown
 from starlette.requests import Request
 from webargs.core import ArgMap, ValidateArg, _UNKNOWN_DEFAULT_PARAM
 from webargs import fields as WebargsFields
 from webargs import core
-from collections.abc import Mapping
 import marshmallow as ma
+import functools
 import typing
-import yaml
 
 
 class ValidateException(Exception):
@@ -36,41 +35,48 @@ class AsyncParser(core.Parser):
                  validate: ValidateArg = None,
                  error_status_code: typing.Optional[int] = None,
                  error_headers: typing.Optional[typing.Mapping[str, str]] = None):
-        inner_decorator = super().use_args(argmap, req, location=location, unknown=unknown, as_kwargs=as_kwargs,
-                                           validate=validate, error_status_code=error_status_code, error_headers=error_headers)
+        compiled = None
+        if req is None and validate is None and type(self).pre_load is core.Parser.pre_load:
+            load_location = location or self.location
+            compiled = compile_argmap(self.schema_class, argmap, load_location, resolve_unknown(self, unknown, load_location))
+        if compiled is not None:
+            inner_decorator = self.use_compiled_args(compiled, load_location, as_kwargs=as_kwargs,
+                                                     error_status_code=error_status_code, error_headers=error_headers)
+        else:
+            inner_decorator = super().use_args(argmap, req, location=location, unknown=unknown, as_kwargs=as_kwargs,
+                                               validate=validate, error_status_code=error_status_code, error_headers=error_headers)
 
-        if isinstance(argmap, Mapping):
-            argmap = ma.Schema.from_dict(argmap)()
-        openapi_base_schema: dict = config["openapi"]["base_schema"]
-        spec = maschema_to_apisepc(argmap, openapi_base_schema["openapi"])
+        def decorator(func):
+            wrapper = inner_decorator(func)
+            # the schema generator makes the spec, only if it runs
+            wrapper.__apispec__ = getattr(func, "__apispec__", ()) + (ValidatedArgs(argmap, location),)
+            return wrapper
+        return decorator
 
+    def use_compiled_args(self, compiled: CompiledArgs, location: str, *, as_kwargs: bool,
+                          error_status_code: typing.Optional[int], error_headers: typing.Optional[typing.Mapping[str, str]]):
+        """
+        The use_args decorator of a compiled argmap, the view args or query params
+        are checked without a marshmallow schema load.
+        """
         def decorator(func):
-            parsed: dict = yaml.safe_load(func.__doc__) if func.__doc__ else None
-            if not isinstance(parsed, dict) or not parsed:
-                parsed = {"parameters": []}
-            parameters = parsed.get("parameters", [])
-            if location in ["view_args", "path", "querystring", "query"]:
-                requireds = spec.get("required", [])
-                param_in = "path" if location in ["view_args", "path"] else "query"
-                for key, schema in spec.get("properties", {}).items():
-                    parameters.append({
-                        "name": key,
-                        "in": param_in,
-                        "required": key in requireds,
-                        "schema": schema
-                    })
-                parsed["parameters"] = parameters
-            if location in ["json", "form"]:
-                content_type = "application/json" if location in ["json"] else "application/x-www-form-urlencoded"
-                parsed["requestBody"] = {
-                    "content": {
-                        content_type: {
-                            "schema": spec
-                        }
-                    }
-                }
-            func.__doc__ = yaml.dump(parsed)
-            return inner_decorator(func)
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                req = self.get_request_from_view_args(func, args, kwargs)
+                data = req.path_params if location in ["view_args", "path"] else req.query_params
+                try:
+                    parsed = compiled(data)
+                except ma.ValidationError as error:
+                    self._on_validation_error(error, req, compiled.schema, location,
+                                              error_status_code=error_status_code, error_headers=error_headers)
+                if as_kwargs:
+                    kwargs.update(parsed)
+                else:
+                    args += (parsed,)
+                return await func(*args, **kwargs)
+
+            wrapper.__wrapped__ = func
+            return wrapper
         return decorator
 
     async def load_json(self, req: Request, schema: ma.Schema) -> typing.Any:
@@ -0,0 +1,267 @@
+from starlette.staticfiles import StaticFiles as _StaticFiles
+from starlette.datastructures import URL, Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import RedirectResponse
+from starlette.types import Scope, Receive, Send
+from starlette.websockets import WebSocket
+from nuxt.staticfiles import ENCODING_SUFFIXES, accepted_encodings, get_content_type, is_compressible
+from nuxt.sendfile import RangeNotSatisfiable, parse_ranges
+from nuxt.caching import is_not_modified
+from collections import OrderedDict
+from email.utils import formatdate
+import threading
+import zipfile
+import anyio
+import typing
+import struct
+import mmap
+import time
+import zlib
+import os
+
+# gzip member header: deflate, no flags, no mtime, unknown OS
+GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"
+# bytes of inflated members kept for the clients without gzip
+DEFAULT_INFLATED_CACHE_SIZE = 16 * 1024 * 1024
+# members bigger than this are inflated in a thread, off the event loop
+INFLATE_IN_THREAD_SIZE = 64 * 1024
+
+
+class BundleMember:
+
+    __slots__ = ("name", "offset", "compressed_size", "size", "deflated", "crc", "last_modified", "etag", "content_type")
+
+    def __init__(self, name: str, offset: int, info: zipfile.ZipInfo) -> None:
+        self.name, self.offset = name, offset
+        self.compressed_size, self.size = info.compress_size, info.file_size
+        self.deflated = info.compress_type == zipfile.ZIP_DEFLATED
+        self.crc = info.CRC
+        self.last_modified = formatdate(time.mktime(info.date_time + (0, 0, -1)), usegmt=True)
+        self.etag = '"%08x-%x"' % (info.CRC, info.file_size)
+        self.content_type = get_content_type(name)
+
+
+class Bundle:
+    """
+    A zip file mapped in memory with an index of its members, the body of a member is
+    a memoryview slice of the mapping. Members are stored or deflated, a deflated
+    member is sent as is to gzip clients and its inflated bytes are kept in an LRU of
+    ``inflated_cache_size`` bytes for the others, shared by the event loop and the
+    threads inflating the big members.
+    """
+
+    def __init__(self, path: str, inflated_cache_size: int = DEFAULT_INFLATED_CACHE_SIZE) -> None:
+        self.path, self.inflated_cache_size = path, inflated_cache_size
+        self.inflated: typing.MutableMapping[str, bytes] = OrderedDict()
+        self.inflated_memory = 0
+        self.lock = threading.Lock()
+        self.fd = open(path, "rb")
+        self.mmap = mmap.mmap(self.fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mmap)
+        self.members: typing.Dict[str, BundleMember] = {}
+        with zipfile.ZipFile(self.fd) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or info.flag_bits & 0x1 or info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                    continue
+                # the data follows the local header, whose extra field can differ from the central one
+                name_length, extra_length = struct.unpack("<HH", self.mmap[info.header_offset + 26:info.header_offset + 30])
+                offset = info.header_offset + 30 + name_length + extra_length
+                self.members[info.filename] = BundleMember(info.filename, offset, info)
+
+    def get(self, name: str) -> typing.Optional[BundleMember]:
+        return self.members.get(name)
+
+    def data(self, member: BundleMember) -> memoryview:
+        return self.view[member.offset:member.offset + member.compressed_size]
+
+    def cached(self, member: BundleMember) -> typing.Optional[bytes]:
+        with self.lock:
+            body = self.inflated.get(member.name)
+            if body is not None:
+                self.inflated.move_to_end(member.name)
+            return body
+
+    def read(self, member: BundleMember) -> typing.Union[memoryview, bytes]:
+        if not member.deflated:
+            return self.data(member)
+        body = self.cached(member)
+        if body is not None:
+            return body
+        body = zlib.decompress(self.data(member), -zlib.MAX_WBITS)
+        if len(body) <= self.inflated_cache_size:
+            with self.lock:
+                if member.name not in self.inflated:
+                    self.inflated[member.name] = body
+                    self.inflated_memory += len(body)
+                while self.inflated_memory > self.inflated_cache_size:
+                    _, evicted = self.inflated.popitem(last=False)
+                    self.inflated_memory -= len(evicted)
+        return body
+
+    def close(self) -> None:
+        self.view.release()
+        self.mmap.close()
+        self.fd.close()
+
+
+class BundleFiles:
+    """
+    Serve static files from a bundle built by ``nuxt bundle``: one zip opened and
+    mapped once per worker process, so a request costs a dict lookup and no open,
+    stat or read. Like StaticFiles it serves the .br/.gz members next to a file and
+    index.html/404.html in ``html`` mode.
+    """
+
+    def __init__(self, *, path: str, html: bool = False, inflated_cache_size: int = DEFAULT_INFLATED_CACHE_SIZE) -> None:
+        self.path, self.html, self.inflated_cache_size = path, html, inflated_cache_size
+        self.bundle: typing.Optional[Bundle] = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def get_bundle(self) -> Bundle:
+        if self.bundle is None or self.pid != os.getpid():
+            # a forked worker maps the file again
+            with self.lock:
+                if self.bundle is None or self.pid != os.getpid():
+                    self.bundle, self.pid = Bundle(self.path, self.inflated_cache_size), os.getpid()
+        return self.bundle
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "websocket":
+            socket = WebSocket(scope=scope, receive=receive, send=send)
+            return await socket.close()
+
+        assert scope["type"] == "http"
+
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        bundle = self.get_bundle()
+        name = _StaticFiles.get_path(self, scope).replace(os.sep, "/")
+        if name == ".":
+            name = ""
+        elif name == ".." or name.startswith("../"):
+            name = None
+        member = bundle.get(name) if name else None
+        if member is not None:
+            return await self.send_member(bundle, name, member, scope, send)
+        if self.html and name is not None:
+            index_name = name + "/index.html" if name else "index.html"
+            index = bundle.get(index_name)
+            if index is not None:
+                if not scope["path"].endswith("/"):
+                    # Directory URLs should redirect to always end in "/".
+                    url = URL(scope=scope)
+                    response = RedirectResponse(url=url.replace(path=url.path + "/"))
+                    return await response(scope, receive, send)
+                return await self.send_member(bundle, index_name, index, scope, send)
+        if self.html:
+            not_found = bundle.get("404.html")
+            if not_found is not None:
+                return await self.send_member(bundle, "404.html", not_found, scope, send, status=404)
+        raise HTTPException(status_code=404)
+
+    async def send_member(self, bundle: Bundle, name: str, member: BundleMember, scope: Scope, send: Send, status: int = 200) -> None:
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        content_type = member.content_type
+        headers = {"last-modified": member.last_modified}
+        encoding, vary = None, member.deflated
+        for suffix_encoding, suffix in ENCODING_SUFFIXES:
+            sibling = bundle.get(name + suffix)
+            if sibling is None or sibling.deflated:
+                continue
+            vary = True
+            if encoding is None and suffix_encoding in accepted:
+                member, encoding = sibling, suffix_encoding
+        if encoding is not None:
+            body, etag = bundle.data(member), member.etag
+        elif member.deflated and "gzip" in accepted:
+            # the deflate stream of a zip member is a gzip body once framed
+            encoding, etag = "gzip", member.etag[:-1] + '-gzip"'
+            body = (GZIP_HEADER, bundle.data(member), struct.pack("<II", member.crc, member.size & 0xffffffff))
+        else:
+            # a deflated member is inflated once its body is sent, not for a HEAD
+            body, etag = None if member.deflated else bundle.data(member), member.etag
+        headers["etag"] = etag
+        if encoding is not None:
+            headers["content-encoding"] = encoding
+        if vary:
+            headers["vary"] = "Accept-Encoding"
+        if status == 200 and self.is_not_modified(request_headers, etag):
+            return await self.send(send, 304, headers, b"")
+        if content_type.startswith("text/"):
+            content_type += "; charset=utf-8"
+        headers["content-type"] = content_type
+        part = None
+        if isinstance(body, tuple):
+            length = sum(len(chunk) for chunk in body)
+        else:
+            length = member.size if body is None else len(body)
+            if status == 200 and encoding is None:
+                headers["accept-ranges"] = "bytes"
+                range_header = request_headers.get("range")
+                if range_header and length and request_headers.get("if-range", etag) == etag:
+                    try:
+                        ranges = parse_ranges(range_header, length)
+                    except RangeNotSatisfiable:
+                        headers.update({"content-range": "bytes */%d" % length, "content-length": "0"})
+                        return await self.send(send, 416, headers, b"")
+                    if ranges is not None and len(ranges) == 1:
+                        start, end = part = ranges[0]
+                        status = 206
+                        headers["content-range"] = "bytes %d-%d/%d" % (start, end - 1, length)
+                        length = end - start
+        headers["content-length"] = str(length)
+        if scope["method"] == "HEAD":
+            body = b""
+        else:
+            if body is None:
+                body = bundle.cached(member)
+            if body is None:
+                if member.size > INFLATE_IN_THREAD_SIZE:
+                    body = await anyio.to_thread.run_sync(bundle.read, member)
+                else:
+                    body = bundle.read(member)
+            if part is not None:
+                body = body[part[0]:part[1]]
+        await self.send(send, status, headers, body)
+
+    @staticmethod
+    def is_not_modified(request_headers: Headers, etag: str) -> bool:
+        return is_not_modified(request_headers.get("if-none-match"), etag)
+
+    @staticmethod
+    async def send(send: Send, status: int, headers: typing.Dict[str, str], body) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items()],
+        })
+        if isinstance(body, tuple):
+            for part in body[:-1]:
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+            body = body[-1]
+        await send({"type": "http.response.body", "body": body})
+
+
+def build_bundle(directory: str, output: str, min_size: int = 1024) -> int:
+    """
+    Pack a static directory into a bundle, compressible files of ``min_size`` bytes
+    or more are deflated, the others (and the .br/.gz files) are stored.
+    """
+    suffixes = tuple(suffix for _, suffix in ENCODING_SUFFIXES)
+    count = 0
+    tmp = output + ".tmp"
+    with zipfile.ZipFile(tmp, "w") as zf:
+        for root, dirs, names in os.walk(directory):
+            dirs.sort()
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                if os.path.abspath(path) in (os.path.abspath(output), os.path.abspath(tmp)):
+                    continue
+                arcname = os.path.relpath(path, directory).replace(os.sep, "/")
+                deflate = not name.endswith(suffixes) and is_compressible(get_content_type(name)) and os.path.getsize(path) >= min_size
+                zf.write(path, arcname, compress_type=zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED, compresslevel=9 if deflate else None)
+                count += 1
+    os.replace(tmp, output)
+    return count
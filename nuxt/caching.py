@@ -0,0 +1,471 @@
+from a2wsgi.asgi_typing import Receive, Scope, Send
+from nuxt.responses import SyncResponse, AsyncResponse
+from nuxt.utils import make_sync_response, make_async_response
+from werkzeug.http import parse_etags, quote_etag, unquote_etag
+from collections import OrderedDict
+from urllib.parse import parse_qsl
+import concurrent.futures
+import functools
+import threading
+import hashlib
+import inspect
+import asyncio
+import typing
+import time
+
+CACHEABLE_METHODS = ("GET", "HEAD")
+# entity headers dropped from a 304 response
+ENTITY_HEADERS = frozenset(("content-length", "content-type", "content-encoding", "content-range", "transfer-encoding"))
+# requests carrying credentials are not cached unless these headers are in ``vary``
+CREDENTIAL_HEADERS = (b"authorization", b"cookie")
+DEFAULT_CACHE_OPTIONS = {
+    "ttl": 60,
+    "max_entries": 1024,
+    "max_body_size": 1024 * 1024,
+    "query": None,
+    "vary": (),
+}
+# the scope key of a sync request coalesced on the event loop, the future it leads or None
+CACHE_CLAIM = "nuxt_cache_claim"
+
+
+class CachedResponse:
+
+    __slots__ = ("status", "headers", "body", "created", "expires")
+
+    def __init__(self, status: int, headers: typing.List[typing.Tuple[bytes, bytes]], body: bytes, ttl: float) -> None:
+        self.status, self.headers, self.body = status, headers, body
+        self.created = time.monotonic()
+        self.expires = self.created + ttl
+
+    def replay(self, scope: Scope) -> typing.Tuple[int, typing.List[typing.Tuple[bytes, bytes]], bytes]:
+        age = str(int(time.monotonic() - self.created)).encode("latin1")
+        status, headers, body = self.status, self.headers, self.body
+        etag = next((value for name, value in headers if name == b"etag"), None)
+        if etag is not None:
+            if_none_match = next((value for name, value in scope.get("headers", []) if name == b"if-none-match"), None)
+            if if_none_match and is_not_modified(if_none_match.decode("latin1"), etag.decode("latin1")):
+                status, body = 304, b""
+                headers = [(name, value) for name, value in headers if name.decode("latin1") not in ENTITY_HEADERS]
+        return status, headers + [(b"age", age)], body
+
+    async def send(self, scope: Scope, send: Send) -> None:
+        status, headers, body = self.replay(scope)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def sync_response(self, scope: Scope) -> SyncResponse:
+        status, headers, body = self.replay(scope)
+        headers = [(name.decode("latin1"), value.decode("latin1")) for name, value in headers]
+        if status == 304:
+            return not_modified_sync_response(headers)
+        return SyncResponse(body, status=status, headers=headers)
+
+
+class ResponseCache:
+    """
+    An in-process LRU of rendered responses with a TTL. The key is the method, the
+    host, the path, the ``query`` params (all of them by default) and the request
+    headers named by ``vary`` or by the Vary header of the cached response. Requests
+    with an Authorization or Cookie header that is not in ``vary`` skip the cache.
+
+    Concurrent misses of a key share one computation: the first request renders the
+    response while the others wait for it and replay it. Async endpoints go through
+    ``__call__`` after their middlewares, sync views through ``coalesce_sync`` on the
+    event loop, so the waiting requests hold no executor thread, then ``call_sync``
+    in the executor.
+    """
+
+    def __init__(self, name: str, ttl: float = 60, max_entries: int = 1024, max_body_size: int = 1024 * 1024,
+                 query: typing.Optional[typing.Iterable[str]] = None, vary: typing.Iterable[str] = ()) -> None:
+        self.name, self.ttl, self.max_entries, self.max_body_size = name, ttl, max_entries, max_body_size
+        self.query = None if query is None else frozenset(query)
+        self.vary = tuple(header.lower().encode("latin1") for header in vary)
+        self.entries: typing.MutableMapping[tuple, CachedResponse] = OrderedDict()
+        self.learned_vary: typing.Dict[tuple, typing.Tuple[bytes, ...]] = {}
+        self.bypass_headers = tuple(header for header in CREDENTIAL_HEADERS if header not in self.vary)
+        self.inflight: typing.Dict[tuple, typing.Union[asyncio.Future, concurrent.futures.Future]] = {}
+        # sync views fill the cache from the executor threads
+        self.lock = threading.Lock()
+        self.hits, self.misses, self.coalesced, self.evictions, self.expirations = 0, 0, 0, 0, 0
+
+    def bypass(self, scope: Scope) -> bool:
+        return any(name in self.bypass_headers for name, _ in scope.get("headers", []))
+
+    def base_key(self, scope: Scope) -> tuple:
+        query_string = scope.get("query_string", b"")
+        host = next((value for name, value in scope.get("headers", []) if name == b"host"), b"")
+        if self.query is None:
+            query = query_string
+        else:
+            query = tuple(sorted((k, v) for k, v in parse_qsl(query_string.decode("latin1"), keep_blank_values=True) if k in self.query))
+        return scope["method"], host, scope.get("root_path", "") + scope["path"], query
+
+    def key(self, scope: Scope, base: tuple) -> tuple:
+        names = self.vary + self.learned_vary.get(base, ())
+        if not names:
+            return base
+        headers = {}
+        for name, value in scope.get("headers", []):
+            if name in names:
+                headers[name] = headers[name] + b"," + value if name in headers else value
+        return base + tuple(headers.get(name, b"") for name in names)
+
+    def get(self, key: tuple) -> typing.Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self.entries[key]
+            self.expirations += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key: tuple, entry: CachedResponse) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def cacheable(self, status: int, headers: typing.List[typing.Tuple[bytes, bytes]]) -> bool:
+        if status != 200:
+            return False
+        for name, value in headers:
+            if name == b"set-cookie":
+                return False
+            if name == b"cache-control" and (b"no-store" in value or b"private" in value):
+                return False
+            if name == b"vary" and value.strip() == b"*":
+                return False
+        return True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send, app: typing.Callable) -> None:
+        if scope["method"] not in CACHEABLE_METHODS or self.bypass(scope):
+            return await app(scope, receive, send)
+        base = self.base_key(scope)
+        key = self.key(scope, base)
+        entry = self.get(key)
+        if entry is not None:
+            self.hits += 1
+            return await entry.send(scope, send)
+
+        inflight = self.inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            entry = await asyncio.shield(inflight)
+            if entry is not None:
+                return await entry.send(scope, send)
+            # the shared response could not be cached, render our own
+            return await app(scope, receive, send)
+
+        self.misses += 1
+        future = self.inflight[key] = asyncio.get_event_loop().create_future()
+        entry = None
+        try:
+            entry = await self.record(scope, receive, send, app, base)
+        finally:
+            del self.inflight[key]
+            future.set_result(entry)
+        if entry is not None:
+            # the Vary header of the response may have changed the key
+            self.set(self.key(scope, base), entry)
+
+    async def record(self, scope: Scope, receive: Receive, send: Send, app: typing.Callable, base: tuple) -> typing.Optional[CachedResponse]:
+        start, chunks, size, cacheable = None, [], 0, True
+
+        async def recording_send(message: dict) -> None:
+            nonlocal start, size, cacheable
+            if message["type"] == "http.response.start":
+                start = message
+                cacheable = self.cacheable(message["status"], message.get("headers", []))
+            elif message["type"] == "http.response.body" and cacheable:
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > self.max_body_size:
+                    cacheable, chunks[:] = False, []
+                else:
+                    chunks.append(chunk)
+            await send(message)
+
+        await app(scope, receive, recording_send)
+        if start is None or not cacheable:
+            return None
+        headers = [(name, value) for name, value in start.get("headers", []) if name != b"age"]
+        self.learn_vary(base, headers)
+        return CachedResponse(start["status"], headers, b"".join(chunks), self.ttl)
+
+    def learn_vary(self, base: tuple, headers: typing.List[typing.Tuple[bytes, bytes]]) -> None:
+        vary = []
+        for name, value in headers:
+            if name == b"vary":
+                vary.extend(header.strip().lower() for header in value.split(b","))
+        vary = tuple(header for header in vary if header and header not in self.vary)
+        if vary:
+            if len(self.learned_vary) >= self.max_entries:
+                self.learned_vary.clear()
+            self.learned_vary[base] = vary
+
+    async def coalesce_sync(self, scope: Scope, call: typing.Callable[[], typing.Awaitable]) -> None:
+        """
+        Claim a miss of a sync view on the event loop before ``call`` hops to the
+        executor, the concurrent misses of the key await the claimed future and only
+        take a thread to replay the response.
+        """
+        if scope["method"] not in CACHEABLE_METHODS or self.bypass(scope):
+            return await call()
+        base = self.base_key(scope)
+        with self.lock:
+            key = self.key(scope, base)
+            hit = self.get(key) is not None
+            inflight = None if hit else self.inflight.get(key)
+            if not hit and inflight is None:
+                self.misses += 1
+                future = self.inflight[key] = scope[CACHE_CLAIM] = concurrent.futures.Future()
+            elif inflight is not None:
+                self.coalesced += 1
+
+        if hit:
+            # replayed by call_sync
+            return await call()
+        if inflight is not None:
+            # shielded, a cancelled follower must not cancel the future of the others
+            if await asyncio.shield(asyncio.wrap_future(inflight)) is None:
+                # the shared response could not be cached, render our own
+                scope[CACHE_CLAIM] = None
+            return await call()
+
+        try:
+            return await call()
+        finally:
+            # a middleware may answer without calling the view
+            with self.lock:
+                if self.inflight.get(key) is future:
+                    del self.inflight[key]
+            if not future.done():
+                future.set_result(None)
+
+    def call_sync(self, request, view_func: typing.Callable, view_args: dict) -> SyncResponse:
+        """
+        Run a sync view through the cache from an executor thread. A request coalesced
+        by ``coalesce_sync`` renders or replays without waiting, any other miss blocks
+        on the future of the first one. Only sequence responses are cached.
+        """
+        scope = request_scope(request)
+        if scope["method"] not in CACHEABLE_METHODS or self.bypass(scope):
+            return make_sync_response(request, view_func(request, **view_args))
+        base = self.base_key(scope)
+        claim = scope.get(CACHE_CLAIM, False)
+        with self.lock:
+            key = self.key(scope, base)
+            entry = self.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.sync_response(scope)
+            inflight = self.inflight.get(key)
+            if inflight is None and claim is not None:
+                self.misses += 1
+                future = self.inflight[key] = concurrent.futures.Future()
+            elif inflight is not None and inflight is claim:
+                future, inflight = claim, None
+            elif inflight is not None and claim is False:
+                self.coalesced += 1
+
+        if inflight is not None and claim is False:
+            entry = inflight.result()
+            if entry is not None:
+                return entry.sync_response(scope)
+        if inflight is not None or claim is None:
+            # the shared response could not be cached or another request renders it
+            return make_sync_response(request, view_func(request, **view_args))
+
+        entry = None
+        try:
+            response = make_sync_response(request, view_func(request, **view_args))
+            headers = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in response.headers.items()]
+            if response.is_sequence and self.cacheable(response.status_code, headers):
+                body = response.get_data()
+                if len(body) <= self.max_body_size:
+                    headers = [(name, value) for name, value in headers if name != b"age"]
+                    with self.lock:
+                        self.learn_vary(base, headers)
+                    entry = CachedResponse(response.status_code, headers, body, self.ttl)
+            return response
+        finally:
+            with self.lock:
+                if self.inflight.get(key) is future:
+                    del self.inflight[key]
+                if entry is not None:
+                    self.set(self.key(scope, base), entry)
+            future.set_result(entry)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class ResponseCacheRegistry:
+    """
+    The response caches of an application by endpoint, the route ``cache`` option is
+    a TTL in seconds, True for the config defaults or a dict of ResponseCache options.
+    """
+
+    def __init__(self, config: typing.Optional[dict] = None) -> None:
+        self.defaults = dict(DEFAULT_CACHE_OPTIONS)
+        self.defaults.update(config or {})
+        self.caches: typing.Dict[str, ResponseCache] = {}
+
+    def get(self, endpoint: str, options: dict) -> typing.Optional[ResponseCache]:
+        option = options.get("cache")
+        if option is None or option is False:
+            return None
+        cache_options = dict(self.defaults)
+        if isinstance(option, dict):
+            cache_options.update(option)
+        elif option is not True:
+            cache_options["ttl"] = option
+        cache = ResponseCache(endpoint, **cache_options)
+        self.caches[endpoint] = cache
+        return cache
+
+    def clear(self) -> None:
+        for cache in self.caches.values():
+            cache.clear()
+
+    def stats(self) -> dict:
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+
+def request_scope(request) -> Scope:
+    # a native request keeps its scope, a2wsgi puts it in the environ
+    scope = getattr(request, "scope", None)
+    return scope if scope is not None else request.environ["asgi.scope"]
+
+
+def cached_view(view_func: typing.Callable, cache: ResponseCache) -> typing.Callable:
+    """
+    Wrap a sync view for the route ``cache`` option, inside the middlewares of the
+    endpoint so a cached response is only replayed to the requests they let through.
+    """
+
+    @functools.wraps(view_func)
+    def sync_view(request, **view_args):
+        return cache.call_sync(request, view_func, view_args)
+
+    return sync_view
+
+
+def make_etag(body: bytes) -> str:
+    return quote_etag(hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def version_etag(version) -> str:
+    # any version string makes a valid tag, quote_etag() rejects a '"'
+    return make_etag(str(version).encode("utf-8"))
+
+
+def is_not_modified(if_none_match: typing.Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return parse_etags(if_none_match).contains_weak(unquote_etag(etag)[0])
+
+
+def not_modified_sync_response(headers) -> SyncResponse:
+    response = SyncResponse(status=304, headers=headers)
+    # werkzeug adds its default mimetype
+    response.headers.pop("Content-Type", None)
+    return response
+
+
+def conditional_sync_response(request, response: SyncResponse, etag: typing.Optional[str] = None) -> SyncResponse:
+    """
+    Set the ETag of a 200 GET/HEAD response, a hash of its body unless ``etag`` is
+    given, and turn it into a 304 if the request's If-None-Match matches.
+    """
+    if response.status_code != 200 or request.method not in CACHEABLE_METHODS:
+        return response
+    if etag is None:
+        etag = response.headers.get("ETag")
+        if etag is None:
+            if not response.is_sequence:
+                return response
+            etag = make_etag(response.get_data())
+    response.headers["ETag"] = etag
+    if is_not_modified(request.headers.get("If-None-Match"), etag):
+        headers = [(name, value) for name, value in response.headers.items() if name.lower() not in ENTITY_HEADERS]
+        response.close()
+        return not_modified_sync_response(headers)
+    return response
+
+
+def conditional_async_response(request, response: AsyncResponse, etag: typing.Optional[str] = None) -> AsyncResponse:
+    if response.status_code != 200 or request.method not in CACHEABLE_METHODS:
+        return response
+    if etag is None:
+        etag = response.headers.get("etag")
+        if etag is None:
+            body = getattr(response, "body", None)
+            if body is None:
+                # streamed and file responses
+                return response
+            etag = make_etag(body)
+    response.headers["etag"] = etag
+    if is_not_modified(request.headers.get("if-none-match"), etag):
+        headers = {name: value for name, value in response.headers.items() if name not in ENTITY_HEADERS}
+        return AsyncResponse(status_code=304, headers=headers)
+    return response
+
+
+def conditional_view(view_func: typing.Callable, option: typing.Union[bool, typing.Callable], is_async: bool = False) -> typing.Callable:
+    """
+    Wrap a view for the route ``etag`` option: True hashes the rendered body, a
+    version function ``option(request, **view_args)`` runs before the view and the
+    hash of its result is the ETag, a matching If-None-Match then skips the view.
+    """
+    version_func = option if callable(option) else None
+
+    if is_async:
+        @functools.wraps(view_func)
+        async def async_view(request, **view_args):
+            etag = None
+            if version_func is not None and request.method in CACHEABLE_METHODS:
+                version = version_func(request, **view_args)
+                if inspect.isawaitable(version):
+                    version = await version
+                if version is not None:
+                    etag = version_etag(version)
+                    if is_not_modified(request.headers.get("if-none-match"), etag):
+                        return AsyncResponse(status_code=304, headers={"etag": etag})
+            response = make_async_response(await view_func(request, **view_args))
+            if hasattr(response, "render_body"):
+                # a template response rendered when sent, hash its body
+                await response.render_body()
+            return conditional_async_response(request, response, etag)
+
+        return async_view
+
+    @functools.wraps(view_func)
+    def sync_view(request, **view_args):
+        etag = None
+        if version_func is not None and request.method in CACHEABLE_METHODS:
+            version = version_func(request, **view_args)
+            if version is not None:
+                etag = version_etag(version)
+                if is_not_modified(request.headers.get("If-None-Match"), etag):
+                    return not_modified_sync_response({"ETag": etag})
+        response = make_sync_response(request, view_func(request, **view_args))
+        return conditional_sync_response(request, response, etag)
+
+    return sync_view
@@ -0,0 +1,172 @@
+from nuxt.staticfiles import ENCODING_SUFFIXES, MANIFEST_NAME, build_manifest, compress, get_content_type, is_compressible, brotli
+from nuxt.bundles import build_bundle
+from nuxt.utils import getcwd, remove_suffix
+import importlib
+import click
+import json
+import sys
+import os
+
+
+def read_config(config: str) -> dict:
+    if not config:
+        return {}
+    with open(config, "r", encoding="utf-8") as fd:
+        return json.loads(fd.read())
+
+
+@click.group()
+def cli():
+    """
+    Nuxt management commands, run the server with `nuxt [OPTIONS]`.
+    """
+
+
+@cli.command()
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.option("--min-size", default=1024, type=int, help="Skip files smaller than this many bytes.")
+@click.option("--force", default=False, type=bool, help="Compress again the files whose siblings are up to date.")
+def precompress(directory: str, min_size: int, force: bool):
+    """
+    Write the .br and .gz siblings of the compressible files in a static directory.
+    """
+    encodings = [(encoding, suffix) for encoding, suffix in ENCODING_SUFFIXES if encoding != "br" or brotli is not None]
+    if brotli is None:
+        click.echo("brotli is not installed, only writing .gz files")
+    suffixes = tuple(suffix for _, suffix in ENCODING_SUFFIXES)
+    written, skipped, saved = 0, 0, 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(suffixes) or not is_compressible(get_content_type(path)):
+                continue
+            stat_result = os.stat(path)
+            if stat_result.st_size < min_size:
+                continue
+            body = None
+            for encoding, suffix in encodings:
+                target = path + suffix
+                if not force and os.path.exists(target) and os.stat(target).st_mtime >= stat_result.st_mtime:
+                    skipped += 1
+                    continue
+                if body is None:
+                    with open(path, "rb") as fd:
+                        body = fd.read()
+                data = compress(body, encoding)
+                if len(data) >= len(body):
+                    # not worth it, don't leave a stale sibling behind
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, "wb") as fd:
+                    fd.write(data)
+                written += 1
+                saved += len(body) - len(data)
+    click.echo("{} files written, {} up to date, {} bytes saved".format(written, skipped, saved))
+
+
+@cli.command()
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.option("--manifest", default="", type=str, help="The manifest file path, default is static-manifest.json in the directory.")
+def fingerprint(directory: str, manifest: str):
+    """
+    Hash the files of a static directory into a manifest of fingerprinted paths.
+    """
+    manifest = manifest or os.path.join(directory, MANIFEST_NAME)
+    files = build_manifest(directory)
+    tmp = manifest + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fd:
+        json.dump(files, fd, indent=2, sort_keys=True)
+    os.replace(tmp, manifest)
+    click.echo("{} files fingerprinted into {}".format(len(files["files"]), manifest))
+
+
+@cli.command()
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("--min-size", default=1024, type=int, help="Store the files smaller than this many bytes uncompressed.")
+def bundle(directory: str, output: str, min_size: int):
+    """
+    Pack a static directory into a bundle served with `nuxt --static <bundle.zip>`.
+    """
+    count = build_bundle(directory, output, min_size)
+    click.echo("{} files packed into {}".format(count, output))
+
+
+@cli.group()
+def openapi():
+    """
+    OpenAPI schema commands.
+    """
+
+
+@openapi.command()
+@click.option("--module", default="nuxt.repositorys.empty", type=str, help="Your python module.")
+@click.option("--config", default="", type=str, help="Your nuxt app config json file path.")
+@click.option("--output", default="-", type=str, help="The schema file path, default is stdout.")
+@click.option("--format", "format_", default=None, type=click.Choice(["json", "yaml"]),
+              help="The schema format, default is json for a .json output and yaml otherwise.")
+def export(module: str, config: str, output: str, format_: str):
+    """
+    Write the OpenAPI schema of a module's routes without starting the server.
+    """
+    from nuxt.app import entry_app
+    from nuxt.openapi import SchemaGenerator, dump_schema
+    chdir = getcwd()
+    os.chdir(chdir)
+    if chdir not in sys.path:
+        sys.path.insert(0, chdir)
+    cfg = {
+        "openapi": {
+            "enable": True,
+            "base_schema": {
+                "openapi": "3.0.0"
+            }
+        }
+    }
+    cfg.update(read_config(config))
+    entry_app.__init__(cfg)
+    importlib.import_module(remove_suffix(module, ".py"))
+    schema = SchemaGenerator(cfg["openapi"].get("base_schema", {})).get_schema(entry_app.routes)
+    format_ = format_ or ("json" if output.endswith(".json") else "yaml")
+    body = dump_schema(schema, format_)
+    if output == "-":
+        click.echo(body.decode("utf-8"), nl=False)
+        return
+    tmp = output + ".tmp"
+    with open(tmp, "wb") as fd:
+        fd.write(body)
+    os.replace(tmp, output)
+    click.echo("{} paths written to {}".format(len(schema.get("paths", {})), output), err=True)
+
+
+@cli.group()
+def templates():
+    """
+    Jinja template commands.
+    """
+
+
+@templates.command(name="compile")
+@click.option("--config", default="", type=str, help="Your nuxt app config json file path.")
+@click.option("--path", default="", type=str, help="The template directory, default is template.path of the config.")
+@click.option("--cache-dir", default="", type=str, help="The bytecode cache directory, default is template.bytecode_cache of the config.")
+def compile_templates(config: str, path: str, cache_dir: str):
+    """
+    Compile every template into the bytecode cache shared by the workers.
+    """
+    from nuxt.templating import create_template_env, warm_templates
+    options = dict(read_config(config).get("template", {}))
+    if path:
+        options["path"] = path
+    if cache_dir:
+        options["bytecode_cache"] = cache_dir
+    env = create_template_env(options)
+    if env.bytecode_cache is None:
+        click.echo("no bytecode cache configured, only checking the templates", err=True)
+    count, errors = warm_templates(env)
+    for name, error in errors.items():
+        click.echo("{}: {}".format(name, error), err=True)
+    click.echo("{} templates compiled".format(count))
+    if errors:
+        sys.exit(1)
@@ -0,0 +1,274 @@
+from nuxt.responses import AsyncPlainTextResponse
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from starlette.types import Scope, Receive, Send
+import collections
+import threading
+import asyncio
+import typing
+import queue
+import math
+import time
+import os
+
+BULKHEAD_OPTIONS = ("pool", "max_concurrency", "max_queue", "retry_after")
+
+
+class Bulkhead:
+    """
+    Isolates a route or a group of routes: at most ``max_concurrency`` requests run at
+    once and at most ``max_queue`` wait for a slot, any request over that is shed with
+    a 503. Sync pools also own their executor so a slow endpoint can't take the
+    threads of the others.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: typing.Optional[int] = None,
+                 retry_after: int = 1, executor: typing.Optional[ThreadPoolExecutor] = None) -> None:
+        assert max_concurrency > 0, "Bulkhead {} max_concurrency should be positive".format(name)
+        self.name, self.max_concurrency, self.max_queue = name, max_concurrency, max_queue
+        self.retry_after, self.executor = retry_after, executor
+        self.running, self.waiting, self.shed = 0, 0, 0
+        self._semaphore: typing.Optional[asyncio.Semaphore] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        """
+        Wait for a slot, returns False without waiting if the wait queue is full.
+        """
+        if self.running >= self.max_concurrency and self.max_queue is not None and self.waiting >= self.max_queue:
+            self.shed += 1
+            return False
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        return True
+
+    def release(self) -> None:
+        self.running -= 1
+        self.semaphore.release()
+
+    async def shed_response(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = AsyncPlainTextResponse("Service Unavailable", status_code=503, headers={"Retry-After": str(self.retry_after)})
+        await response(scope, receive, send)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "shed": self.shed,
+        }
+
+
+def inherit_bulkhead_options(options: dict, defaults: dict, default_pool: str) -> dict:
+    """
+    Fill a blueprint route's bulkhead options from the blueprint register options,
+    a route declaring its own pool or max_concurrency keeps it.
+    """
+    if options.get("pool") is not None or options.get("max_concurrency") is not None:
+        return options
+    if defaults.get("pool") is None and defaults.get("max_concurrency") is None:
+        return options
+    options = dict(options)
+    options["pool"] = defaults.get("pool") or default_pool
+    for key in BULKHEAD_OPTIONS[1:]:
+        if defaults.get(key) is not None:
+            options[key] = defaults[key]
+    return options
+
+
+class BulkheadRegistry:
+    """
+    Named bulkheads of an application, pools can be declared in the config under
+    ``pools`` or by the first route using them.
+    """
+
+    def __init__(self, config: typing.Optional[dict] = None, thread_pool: bool = False) -> None:
+        self.config = config or {}
+        self.thread_pool = thread_pool
+        self.bulkheads: typing.Dict[str, Bulkhead] = {}
+
+    def get(self, default_name: str, options: dict) -> typing.Optional[Bulkhead]:
+        """
+        Return the bulkhead for a route's options, or None if the route is not isolated.
+        """
+        name = options.get("pool")
+        if name is None and options.get("max_concurrency") is None:
+            return None
+        name = name or default_name
+        if name in self.bulkheads:
+            return self.bulkheads[name]
+        pool_options = dict(self.config.get(name, {}))
+        pool_options.update({key: options[key] for key in BULKHEAD_OPTIONS[1:] if options.get(key) is not None})
+        max_concurrency = pool_options.get("max_concurrency")
+        assert max_concurrency, "Pool {} should set max_concurrency".format(name)
+        executor = None
+        if self.thread_pool:
+            executor = ThreadPoolExecutor(thread_name_prefix="WSGI-{}".format(name), max_workers=max_concurrency)
+        bulkhead = Bulkhead(name, max_concurrency, pool_options.get("max_queue"), pool_options.get("retry_after", 1), executor)
+        self.bulkheads[name] = bulkhead
+        return bulkhead
+
+    def stats(self) -> dict:
+        return {name: bulkhead.stats() for name, bulkhead in self.bulkheads.items()}
+
+
+class AdaptiveThreadPoolExecutor(Executor):
+    """
+    A thread pool resized between ``min_workers`` and ``max_workers`` by a feedback
+    controller: every ``interval`` seconds it looks at the p95 queue wait time and the
+    thread utilization, grows multiplicatively while the wait is over ``target_wait``
+    and retires one idle thread at a time while utilization stays low.
+
+    Threads and the controller start on the first submit and are rebuilt in a forked
+    child, so the executor can be created before gunicorn forks its workers.
+    """
+
+    def __init__(self, min_workers: int = 2, max_workers: int = 32, target_wait: float = 0.01,
+                 interval: float = 1.0, low_utilization: float = 0.3, window: int = 1024,
+                 thread_name_prefix: str = "WSGI") -> None:
+        assert 0 < min_workers <= max_workers, "AdaptiveThreadPoolExecutor needs 0 < min_workers <= max_workers"
+        self.min_workers, self.max_workers = min_workers, max_workers
+        self.target_wait, self.interval, self.low_utilization = target_wait, interval, low_utilization
+        self.window, self.thread_name_prefix = window, thread_name_prefix
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._waits: typing.Deque[float] = collections.deque(maxlen=self.window)
+        self._interval_waits: typing.List[float] = []
+        self._threads: typing.Set[threading.Thread] = set()
+        self._size, self._busy, self._busy_time = 0, 0, 0.0
+        self._utilization = 0.0
+        self._controller: typing.Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._shutdown = False
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        if self._pid != os.getpid():
+            # threads and locks don't survive a fork, start over in the child
+            self._reset()
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            if self._controller is None:
+                self._start()
+            self._queue.put((future, fn, args, kwargs, time.monotonic()))
+        return future
+
+    def _start(self) -> None:
+        self._resize(self.min_workers)
+        self._controller = threading.Thread(target=self._control, name="%s-controller" % self.thread_name_prefix, daemon=True)
+        self._controller.start()
+
+    def _resize(self, size: int) -> None:
+        size = max(self.min_workers, min(self.max_workers, size))
+        while self._size < size:
+            self._size += 1
+            thread = threading.Thread(target=self._work, name="%s_%d" % (self.thread_name_prefix, len(self._threads)), daemon=True)
+            self._threads.add(thread)
+            thread.start()
+        while self._size > size:
+            # idle threads pick the sentinel up and exit
+            self._size -= 1
+            self._queue.put(None)
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs, enqueued = item
+            started = time.monotonic()
+            self._waits.append(started - enqueued)
+            self._interval_waits.append(started - enqueued)
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self._busy += 1
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._busy_time += time.monotonic() - started
+            del future, fn, args, kwargs, item
+        with self._lock:
+            self._threads.discard(threading.current_thread())
+
+    def _control(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                if self._shutdown:
+                    return
+                busy_time, self._busy_time = self._busy_time, 0.0
+                waits, self._interval_waits = self._interval_waits, []
+                saturated = self._busy >= self._size
+                self._utilization = 1.0 if saturated else min(1.0, busy_time / (self._size * self.interval))
+                p95 = self.wait_percentiles(95, samples=waits)[95]
+                if (p95 > self.target_wait or (saturated and not self._queue.empty())) and self._size < self.max_workers:
+                    self._resize(self._size + max(1, math.ceil(self._size / 2)))
+                elif self._utilization < self.low_utilization and p95 < self.target_wait / 2 and self._size > self.min_workers:
+                    self._resize(self._size - 1)
+
+    def wait_percentiles(self, *percents: int, samples: typing.Optional[typing.List[float]] = None) -> typing.Dict[int, float]:
+        """
+        Queue wait time percentiles in seconds, over the last ``window`` tasks by default.
+        """
+        samples = sorted(self._waits.copy() if samples is None else samples)
+        if not samples:
+            return {percent: 0.0 for percent in percents}
+        return {percent: samples[min(len(samples) - 1, int(len(samples) * percent / 100))] for percent in percents}
+
+    def stats(self) -> dict:
+        waits = self.wait_percentiles(50, 95, 99)
+        return {
+            "size": self._size,
+            "min_workers": self.min_workers,
+            "max_workers": self.max_workers,
+            "busy": self._busy,
+            "queued": self._queue.qsize(),
+            "utilization": self._utilization,
+            "wait_p50": waits[50],
+            "wait_p95": waits[95],
+            "wait_p99": waits[99],
+        }
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._lock:
+            self._shutdown = True
+            self._stopped.set()
+            if cancel_futures:
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        item[0].cancel()
+            threads = list(self._threads)
+            for _ in threads:
+                self._queue.put(None)
+            self._size = 0
+        if wait:
+            for thread in threads:
+                thread.join()
@@ -1,2 +1,3 @@
 from starlette.datastructures import Headers as AsyncHeaders
+from werkzeug.datastructures import Headers as SyncHeaders
 from werkzeug.datastructures import ImmutableDict
@@ -1,4 +1,6 @@
 from werkzeug.exceptions import HTTPException as SyncHTTPException
 from werkzeug.exceptions import InternalServerError as SyncInternalServerError
 from werkzeug.exceptions import NotFound as SyncNotFound
+from werkzeug.exceptions import RequestEntityTooLarge as SyncRequestEntityTooLarge
+from starlette.exceptions import HTTPException as AsyncHTTPException
 from starlette.websockets import WebSocketDisconnect
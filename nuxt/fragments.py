@@ -0,0 +1,211 @@
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from collections import OrderedDict
+import threading
+import tempfile
+import asyncio
+import hashlib
+import inspect
+import typing
+import time
+import os
+
+DEFAULT_FRAGMENT_CACHE_OPTIONS = {
+    "ttl": 300,
+    "max_entries": 1024,
+    # a directory shared by the workers, the in-process LRU is in front of it
+    "directory": None,
+}
+
+
+class FileSystemFragmentBackend:
+    """
+    Fragments shared by the workers of a host, one file by key holding the expiry
+    time and the rendered text. An expired file is left for the next writer to
+    replace, unlinking it could delete the fresh file another worker just wrote.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, "__fragment_%s" % hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest())
+
+    def get(self, key: str) -> typing.Optional[typing.Tuple[str, float]]:
+        """
+        The fragment and its remaining time to live.
+        """
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as fd:
+                expires = float(fd.readline())
+                value = fd.read()
+        except (OSError, ValueError):
+            return None
+        ttl = expires - time.time()
+        if ttl <= 0:
+            return None
+        return value, ttl
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".__fragment_")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write("%f\n" % (time.time() + ttl))
+                f.write(value)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.startswith("__fragment_"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class FragmentCache:
+    """
+    An LRU of rendered template fragments with a TTL, in front of an optional shared
+    backend. Templates can be rendered in threads, the LRU is locked. The ``_async``
+    methods reach the backend from the default executor of the event loop.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 1024, directory: typing.Optional[str] = None,
+                 backend=None) -> None:
+        self.ttl, self.max_entries = ttl, max_entries
+        if backend is None and directory:
+            backend = FileSystemFragmentBackend(directory)
+        self.backend = backend
+        self.entries: typing.MutableMapping[str, typing.Tuple[str, float]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits, self.shared_hits, self.misses, self.evictions, self.expirations = 0, 0, 0, 0, 0
+
+    def get_local(self, key: str) -> typing.Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self.entries[key]
+                self.expirations += 1
+        return None
+
+    def get_shared(self, key: str, shared: typing.Optional[typing.Tuple[str, float]]) -> typing.Optional[str]:
+        if shared is not None:
+            value, ttl = shared
+            self.store(key, value, ttl)
+            with self.lock:
+                self.shared_hits += 1
+            return value
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def get(self, key: str) -> typing.Optional[str]:
+        value = self.get_local(key)
+        if value is not None:
+            return value
+        return self.get_shared(key, None if self.backend is None else self.backend.get(key))
+
+    async def get_async(self, key: str) -> typing.Optional[str]:
+        value = self.get_local(key)
+        if value is not None:
+            return value
+        shared = None
+        if self.backend is not None:
+            shared = await asyncio.get_running_loop().run_in_executor(None, self.backend.get, key)
+        return self.get_shared(key, shared)
+
+    def store(self, key: str, value: str, ttl: float) -> None:
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key: str, value: str, ttl: typing.Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self.store(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, ttl)
+
+    async def set_async(self, key: str, value: str, ttl: typing.Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self.store(key, value, ttl)
+        if self.backend is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.backend.set, key, value, ttl)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class FragmentCacheExtension(Extension):
+    """
+    ``{% cache key, ttl %}...{% endcache %}`` renders the block once per key (and
+    template) and replays it until the TTL in seconds expires, the TTL defaults to
+    the ``ttl`` of the fragment cache config.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment) -> None:
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [nodes.Const(parser.name), parser.parse_expression()]
+        if parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_cache_support", args), [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, template_name, key, ttl, caller):
+        cache: FragmentCache = self.environment.fragment_cache
+        key = "%s:%s" % (template_name, key)
+        if self.environment.is_async:
+            # rendered on the event loop, the shared backend is reached from the executor
+            return self._cache_async(cache, key, ttl, caller)
+        value = cache.get(key)
+        if value is not None:
+            return Markup(value)
+        rv = caller()
+        cache.set(key, str(rv), ttl)
+        return rv
+
+    async def _cache_async(self, cache: FragmentCache, key: str, ttl, caller):
+        value = await cache.get_async(key)
+        if value is not None:
+            return Markup(value)
+        rv = caller()
+        if inspect.isawaitable(rv):
+            rv = await rv
+        await cache.set_async(key, str(rv), ttl)
+        return rv
@@ -2,12 +2,26 @@ from nuxt.app import WSGIApplicationResponder, ASGIApplicationResponder
 from nuxt.routing import BaseRoute, Route, Mount, WebSocketRoute
 from nuxt.responses import AsyncHTMLResponse, AsyncResponse
 from nuxt.requests import AsyncRequest
+from nuxt.reloader import has_inotify
+from nuxt.caching import is_not_modified
+from nuxt.utils import apply_validated_args
+import threading
+import hashlib
 import typing
+import anyio
 import json
+import time
 import yaml
 import re
 import os
 
+if has_inotify:
+    from inotify.adapters import Inotify
+    import inotify.constants
+
+# seconds between the mtime checks of the __doc__ files without inotify
+DOCS_REVALIDATE = 1.0
+
 swagger_ui_default_parameters = {
     "dom_id": "#swagger-ui",
     "layout": "BaseLayout",
@@ -21,7 +35,13 @@ class OpenAPIResponse(AsyncResponse):
     media_type = "text/yaml"
 
     def render(self, content: typing.Any) -> bytes:
-        return yaml.dump(content, default_flow_style=False).encode("utf-8")
+        return dump_schema(content)
+
+
+def dump_schema(schema: dict, format: str = "yaml") -> bytes:
+    if format == "json":
+        return json.dumps(schema, indent=2, ensure_ascii=False).encode("utf-8")
+    return yaml.dump(schema, default_flow_style=False).encode("utf-8")
 
 
 class EndpointInfo(typing.NamedTuple):
@@ -30,14 +50,60 @@ class EndpointInfo(typing.NamedTuple):
     func: typing.Callable
 
 
+class SchemaDocsWatcher(threading.Thread):
+    if has_inotify:
+        event_mask = (inotify.constants.IN_MODIFY | inotify.constants.IN_ATTRIB | inotify.constants.IN_CLOSE_WRITE
+                      | inotify.constants.IN_CREATE | inotify.constants.IN_DELETE
+                      | inotify.constants.IN_MOVED_FROM | inotify.constants.IN_MOVED_TO)
+
+    def __init__(self, directory: str, generator: "SchemaGenerator") -> None:
+        super().__init__(name="SchemaDocsWatcher", daemon=True)
+        self.directory, self.generator = directory, generator
+        self.watcher = Inotify()
+        self.watcher.add_watch(directory, mask=self.event_mask)
+
+    def run(self) -> None:
+        try:
+            for event in self.watcher.event_gen():
+                if event is None:
+                    continue
+                _, _, dirname, filename = event
+                if os.path.join(dirname, filename) in self.generator.refs:
+                    self.generator.invalidate()
+        finally:
+            # the watch is gone, check the mtimes from now on
+            self.generator.watched_dirs.discard(self.directory)
+            self.generator.invalidate()
+
+
 class SchemaGenerator:
+    """
+    The schema is built on the first request and kept as YAML bytes with an ETag. It
+    is built again when the route table changes or a ``__doc__`` file changes, which
+    is seen by an inotify watch of the doc directories (or by checking their mtimes
+    every ``DOCS_REVALIDATE`` seconds without inotify).
 
-    def __init__(self, base_schema: dict, url_prefx: str = "/docs") -> None:
+    A ``schema_file`` written by ``nuxt openapi export`` is served as is instead, no
+    docstring is parsed.
+    """
+
+    def __init__(self, base_schema: dict, url_prefx: str = "/docs", schema_file: typing.Optional[str] = None) -> None:
         self.base_schema = base_schema
         self.url_prefix = url_prefx
         self.url_schema = "%s/%s" % (self.url_prefix.rstrip("/"), "openapi")
         self.refs = {}
         self.refs_hash = {}
+        self.watched_dirs = set()
+        self.lock = threading.Lock()
+        # bumped by a __doc__ file change
+        self.docs_version = 0
+        # ((routes version, docs version), body, etag)
+        self.cached: typing.Optional[typing.Tuple[tuple, bytes, str]] = None
+        self.checked = 0.0
+        self.builds = 0
+        self.prebuilt: typing.Optional[typing.Tuple[bytes, str, str]] = None
+        if schema_file:
+            self.load_schema_file(schema_file)
 
     def routes(self):
         return [
@@ -123,6 +189,11 @@ class SchemaGenerator:
         """
         Given a function, parse the docstring as YAML and return a dictionary of info.
         """
+        parsed = self.load_docstring(func_or_method)
+        return apply_validated_args(parsed, getattr(func_or_method, "__apispec__", ()),
+                                    self.base_schema.get("openapi", "3.0.0"))
+
+    def load_docstring(self, func_or_method: typing.Callable) -> dict:
         docstring = func_or_method.__doc__
         if not docstring:
             return {}
@@ -141,6 +212,7 @@ class SchemaGenerator:
 
         if "__doc__" in parsed:
             doc, ref = parsed.get("__doc__"), parsed.get("__ref__")
+            doc = os.path.abspath(doc)
             last_modified = os.path.getmtime(doc)
             if doc not in self.refs or last_modified != self.refs_hash.get(doc):
                 with open(doc, encoding="utf-8") as fd:
@@ -150,10 +222,88 @@ class SchemaGenerator:
 
         return parsed
 
-    def OpenAPIResponse(self, request: AsyncRequest) -> AsyncResponse:
-        routes = request.app.routes
-        schema = self.get_schema(routes=routes)
-        return OpenAPIResponse(schema)
+    def load_schema_file(self, path: str) -> None:
+        with open(path, "rb") as fd:
+            body = fd.read()
+        media_type = "application/json" if path.endswith(".json") else OpenAPIResponse.media_type
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.prebuilt = (body, etag, media_type)
+
+    def routes_version(self, routes: typing.List[BaseRoute]) -> tuple:
+        """
+        The change counter of the application's RouteList, bumped by a route added,
+        removed or replaced and by ``freeze_routes()``. A plain list is only told apart
+        by its size.
+        """
+        return id(routes), getattr(routes, "version", len(routes))
+
+    def docs_changed(self) -> bool:
+        for doc, last_modified in list(self.refs_hash.items()):
+            try:
+                if os.path.getmtime(doc) != last_modified:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def invalidate(self) -> None:
+        # waits for a build in progress, whose docs may be older than the change
+        with self.lock:
+            self.docs_version += 1
+            self.cached = None
+
+    def watch(self) -> None:
+        if not has_inotify:
+            return
+        for directory in {os.path.dirname(doc) for doc in self.refs} - self.watched_dirs:
+            try:
+                SchemaDocsWatcher(directory, self).start()
+            except Exception:
+                # out of inotify watches, fall back to the mtime checks
+                continue
+            self.watched_dirs.add(directory)
+
+    def get_cached(self, version: tuple) -> typing.Optional[typing.Tuple[tuple, bytes, str]]:
+        cached = self.cached
+        if cached is None or cached[0] != (version, self.docs_version):
+            return None
+        unwatched = any(os.path.dirname(doc) not in self.watched_dirs for doc in self.refs)
+        if unwatched and time.monotonic() - self.checked >= DOCS_REVALIDATE:
+            self.checked = time.monotonic()
+            if self.docs_changed():
+                return None
+        return cached
+
+    def build(self, routes: typing.List[BaseRoute], version: tuple) -> typing.Tuple[tuple, bytes, str]:
+        with self.lock:
+            # concurrent misses wait for a single build
+            cached = self.get_cached(version)
+            if cached is not None:
+                return cached
+            self.refs.clear()
+            self.refs_hash.clear()
+            body = OpenAPIResponse(self.get_schema(routes=routes)).body
+            etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+            self.cached = ((version, self.docs_version), body, etag)
+            self.checked = time.monotonic()
+            self.builds += 1
+            self.watch()
+            return self.cached
+
+    async def OpenAPIResponse(self, request: AsyncRequest) -> AsyncResponse:
+        if self.prebuilt is not None:
+            body, etag, media_type = self.prebuilt
+        else:
+            routes = request.app.routes
+            version = self.routes_version(routes)
+            cached = self.get_cached(version)
+            if cached is None:
+                cached = await anyio.to_thread.run_sync(self.build, routes, version)
+            _, body, etag = cached
+            media_type = OpenAPIResponse.media_type
+        if is_not_modified(request.headers.get("if-none-match"), etag):
+            return AsyncResponse(status_code=304, headers={"etag": etag})
+        return AsyncResponse(body, media_type=media_type, headers={"etag": etag})
 
     def SwaggerUIResponse(self, request: AsyncRequest) -> AsyncHTMLResponse:
         return get_swagger_ui_html(openapi_url=self.url_schema, title="Docs")
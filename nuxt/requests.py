@@ -1,3 +1,96 @@
 from madara.wrappers import Request as SyncRequest
 from starlette.requests import Request as AsyncRequest
 from starlette.websockets import WebSocket, WebSocketState
+from werkzeug.sansio.request import Request as SansIORequest
+from werkzeug.datastructures import Headers
+from a2wsgi.wsgi import build_environ
+from a2wsgi.asgi_typing import Receive, Scope, Send
+from nuxt.responses import AsyncPlainTextResponse
+import typing
+import io
+
+
+def get_content_length(scope: Scope) -> typing.Optional[int]:
+    for key, value in scope.get("headers", []):
+        if key == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class BodyLimit:
+    """
+    The ``max_body_size`` of a route, a request announcing a bigger Content-Length is
+    rejected before the view runs and a chunked body is cut as soon as it goes over.
+    """
+
+    def __init__(self, max_body_size: int, exception_factory: typing.Callable[[], Exception]) -> None:
+        self.max_body_size, self.exception_factory = max_body_size, exception_factory
+
+    def exceeds(self, scope: Scope) -> bool:
+        content_length = get_content_length(scope)
+        return content_length is not None and content_length > self.max_body_size
+
+    def wrap(self, receive: Receive) -> Receive:
+        received = 0
+
+        async def limited_receive() -> dict:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise self.exception_factory()
+            return message
+
+        return limited_receive
+
+    async def reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = AsyncPlainTextResponse("Request Entity Too Large", status_code=413)
+        await response(scope, receive, send)
+
+
+class NativeSyncRequest(SyncRequest):
+    """
+    A SyncRequest built straight from an ASGI scope and the received body, the
+    WSGI environ is only assembled when something reads it.
+    """
+
+    def __init__(self, scope: dict, body: typing.Union[bytes, typing.BinaryIO] = b"") -> None:
+        root_path, path = scope.get("root_path", ""), scope["path"]
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        server, client = scope.get("server"), scope.get("client")
+        SansIORequest.__init__(
+            self,
+            method=scope["method"],
+            scheme=scope.get("scheme", "http"),
+            server=tuple(server) if server else None,
+            root_path=root_path,
+            path=path,
+            query_string=scope.get("query_string", b""),
+            headers=Headers([(key.decode("latin1"), value.decode("latin1")) for key, value in scope.get("headers", [])]),
+            remote_addr=client[0] if client else None,
+        )
+        self.scope, self.body = scope, body
+        self.shallow = False
+        self._environ = None
+        if isinstance(body, bytes):
+            # get_data() and the form parser use the received body as is
+            self._cached_data = body
+
+    def close(self) -> None:
+        super().close()
+        if not isinstance(self.body, (bytes, bytearray)):
+            self.body.close()
+
+    @property
+    def environ(self) -> dict:
+        if self._environ is None:
+            body = io.BytesIO(self.body) if isinstance(self.body, (bytes, bytearray)) else self.body
+            self._environ = build_environ(self.scope, body)
+            self._environ["wsgi.input_terminated"] = True
+            self._environ["werkzeug.request"] = self
+        return self._environ
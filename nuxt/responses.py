@@ -1,7 +1,23 @@
 from madara.wrappers import Response as SyncResponse
+from werkzeug.wrappers import Response as BaseSyncResponse
 from starlette.responses import Response as AsyncResponse
-from starlette.responses import FileResponse as AsyncFileResponse
 from starlette.responses import RedirectResponse as AsyncRedirectResponse
 from starlette.responses import PlainTextResponse as AsyncPlainTextResponse
 from starlette.responses import HTMLResponse as AsyncHTMLResponse
-from starlette.responses import JSONResponse as AsyncJSONResponse
+from starlette.responses import JSONResponse as BaseAsyncJSONResponse
+from nuxt.serializers import serializer
+from nuxt.sendfile import AsyncFileResponse, SyncFileResponse
+import typing
+
+
+class AsyncJSONResponse(BaseAsyncJSONResponse):
+
+    def render(self, content: typing.Any) -> bytes:
+        return serializer.dumps(content)
+
+
+class SyncJSONResponse(SyncResponse):
+    default_mimetype = "application/json"
+
+    def __init__(self, content: typing.Any = None, *args, **kwargs) -> None:
+        super().__init__(serializer.dumps(content), *args, **kwargs)
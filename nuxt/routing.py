@@ -1 +1,224 @@
 from starlette.routing import BaseRoute, Route, Mount, WebSocketRoute
+from starlette.routing import Router, Match
+from starlette.convertors import CONVERTOR_TYPES
+from starlette.datastructures import URL
+from starlette.responses import RedirectResponse
+from starlette.types import Scope, Receive, Send
+import typing
+import re
+
+try:
+    from starlette._utils import get_route_path
+except ImportError:  # starlette < 0.33 matches on the raw scope path
+    def get_route_path(scope: Scope) -> str:
+        return scope["path"]
+
+
+# a path segment that is exactly one param, eg. '{name}' or '{post_id:int}'
+SEGMENT_PARAM_REGEX = re.compile(r"^{([a-zA-Z_][a-zA-Z0-9_]*)(?::([a-zA-Z_][a-zA-Z0-9_]*))?}$")
+
+# typed segment matchers for the convertors format_pattern emits, the path
+# convertor spans segments so routes using it stay on the linear scan.
+SEGMENT_MATCHERS = {
+    "str": bool,
+    "int": lambda segment: segment.isascii() and segment.isdigit(),
+    "float": re.compile(CONVERTOR_TYPES["float"].regex).fullmatch,
+    "uuid": re.compile(CONVERTOR_TYPES["uuid"].regex).fullmatch,
+}
+
+
+class RouteList(list):
+    """
+    The route table of an application, ``version`` counts its changes so what is built
+    from the routes (the compiled route table, the OpenAPI schema) sees a route added,
+    removed or replaced.
+    """
+
+    version = 0
+
+    def changed(self) -> None:
+        self.version += 1
+
+
+def _counting(name: str) -> typing.Callable:
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ("append", "extend", "insert", "remove", "pop", "clear", "sort", "reverse",
+              "__setitem__", "__delitem__", "__iadd__", "__imul__"):
+    setattr(RouteList, _name, _counting(_name))
+
+
+class PrefixNode:
+
+    __slots__ = ("children", "params", "routes")
+
+    def __init__(self) -> None:
+        self.children: typing.Dict[str, PrefixNode] = {}
+        self.params: typing.List[tuple] = []
+        self.routes: typing.List[typing.Tuple[int, BaseRoute]] = []
+
+    def child(self, segment: str) -> "PrefixNode":
+        node = self.children.get(segment)
+        if node is None:
+            node = self.children[segment] = PrefixNode()
+        return node
+
+    def param_child(self, name: str, convertor_type: str) -> "PrefixNode":
+        for param_name, param_type, _, _, node in self.params:
+            if param_name == name and param_type == convertor_type:
+                return node
+        node = PrefixNode()
+        self.params.append((name, convertor_type, SEGMENT_MATCHERS[convertor_type], CONVERTOR_TYPES[convertor_type], node))
+        return node
+
+    def collect(self, segments: typing.List[str], depth: int, params: tuple, out: list) -> None:
+        if depth == len(segments):
+            for index, route in self.routes:
+                out.append((index, route, params))
+            return
+        segment = segments[depth]
+        node = self.children.get(segment)
+        if node is not None:
+            node.collect(segments, depth + 1, params, out)
+        for name, _, matcher, convertor, node in self.params:
+            if matcher(segment):
+                node.collect(segments, depth + 1, params + ((name, convertor.convert(segment)),), out)
+
+
+def split_route_path(path: str) -> typing.Optional[typing.List[tuple]]:
+    """
+    Split a route path into (kind, value) segments, returns None if the path
+    can not be matched segment by segment.
+    """
+    segments = []
+    for segment in path[1:].split("/"):
+        if "{" not in segment:
+            segments.append(("static", segment))
+            continue
+        match = SEGMENT_PARAM_REGEX.match(segment)
+        if match is None:
+            return None
+        name, convertor_type = match.group(1), match.group(2) or "str"
+        if convertor_type not in SEGMENT_MATCHERS:
+            return None
+        segments.append(("param", (name, convertor_type)))
+    return segments
+
+
+class CompiledRouteTable:
+    """
+    A frozen snapshot of a route list, Route and WebSocketRoute paths are indexed by a
+    prefix tree of path segments, other routes (Mount, path convertors...) keep the linear
+    ``matches`` check. Candidates are resolved in registration order so the result is the
+    same as the starlette linear scan.
+    """
+
+    def __init__(self, routes: typing.List[BaseRoute]) -> None:
+        # a RouteList counts its changes, a plain list is only told apart by its size
+        self.routes, self.size, self.version = routes, len(routes), getattr(routes, "version", None)
+        self.trees = {"http": PrefixNode(), "websocket": PrefixNode()}
+        self.fallback: typing.List[typing.Tuple[int, BaseRoute]] = []
+        for index, route in enumerate(routes):
+            scope_type = {Route: "http", WebSocketRoute: "websocket"}.get(type(route))
+            segments = split_route_path(route.path) if scope_type else None
+            if segments is None:
+                self.fallback.append((index, route))
+                continue
+            node = self.trees[scope_type]
+            for kind, value in segments:
+                node = node.child(value) if kind == "static" else node.param_child(*value)
+            node.routes.append((index, route))
+
+    def valid_for(self, routes: typing.List[BaseRoute]) -> bool:
+        return routes is self.routes and len(routes) == self.size and getattr(routes, "version", None) == self.version
+
+    def lookup(self, scope: Scope) -> typing.Tuple[Match, typing.Optional[BaseRoute], Scope]:
+        candidates = []
+        tree = self.trees.get(scope["type"])
+        if tree is not None:
+            tree.collect(get_route_path(scope)[1:].split("/"), 0, (), candidates)
+        if self.fallback:
+            candidates.extend((index, route, None) for index, route in self.fallback)
+            candidates.sort(key=lambda candidate: candidate[0])
+        elif len(candidates) > 1:
+            candidates.sort(key=lambda candidate: candidate[0])
+
+        partial, partial_scope = None, {}
+        for _, route, params in candidates:
+            if params is None:
+                match, child_scope = route.matches(scope)
+            else:
+                path_params = dict(scope.get("path_params", {}))
+                path_params.update(params)
+                child_scope = {"endpoint": route.endpoint, "path_params": path_params}
+                methods = getattr(route, "methods", None)
+                match = Match.PARTIAL if methods and scope["method"] not in methods else Match.FULL
+            if match == Match.FULL:
+                return match, route, child_scope
+            if match == Match.PARTIAL and partial is None:
+                partial, partial_scope = route, child_scope
+        if partial is not None:
+            return Match.PARTIAL, partial, partial_scope
+        return Match.NONE, None, {}
+
+
+class CompiledRouter(Router):
+    """
+    A Router that dispatches through a CompiledRouteTable instead of scanning every
+    route. The table is frozen on first dispatch (or an explicit ``freeze``) and is
+    rebuilt if routes are appended afterwards.
+    """
+
+    compiled: typing.Optional[CompiledRouteTable] = None
+
+    def freeze(self) -> CompiledRouteTable:
+        self.compiled = CompiledRouteTable(self.routes)
+        return self.compiled
+
+    def lookup(self, scope: Scope) -> typing.Tuple[Match, typing.Optional[BaseRoute], Scope]:
+        compiled = self.compiled
+        if compiled is None or not compiled.valid_for(self.routes):
+            compiled = self.freeze()
+        return compiled.lookup(scope)
+
+    async def app(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] in ("http", "websocket", "lifespan")
+
+        if "router" not in scope:
+            scope["router"] = self
+
+        if scope["type"] == "lifespan":
+            await self.lifespan(scope, receive, send)
+            return
+
+        match, route, child_scope = self.lookup(scope)
+        if match != Match.NONE:
+            # full match or the first partial match, which answers 405 Method Not Allowed.
+            scope["route"] = route
+            scope.update(child_scope)
+            await route.handle(scope, receive, send)
+            return
+
+        route_path = get_route_path(scope)
+        if scope["type"] == "http" and self.redirect_slashes and route_path != "/":
+            redirect_scope = dict(scope)
+            if route_path.endswith("/"):
+                redirect_scope["path"] = redirect_scope["path"].rstrip("/")
+            else:
+                redirect_scope["path"] = redirect_scope["path"] + "/"
+            match, _, _ = self.lookup(redirect_scope)
+            if match != Match.NONE:
+                redirect_url = URL(scope=redirect_scope)
+                response = RedirectResponse(url=str(redirect_url))
+                await response(scope, receive, send)
+                return
+
+        await self.default(scope, receive, send)
@@ -0,0 +1,354 @@
+from madara.wrappers import Response as SyncResponse
+from starlette.responses import Response as AsyncResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
+from starlette.types import Scope, Receive, Send
+from werkzeug.http import parse_etags, unquote_etag
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from urllib.parse import quote
+import secrets
+import hashlib
+import typing
+import anyio
+import stat
+import os
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+# more ranges than that are served as the whole file
+MAX_RANGES = 32
+NOT_MODIFIED_HEADERS = frozenset(("cache-control", "content-location", "date", "etag", "expires", "vary", "last-modified"))
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(stat_result: os.stat_result, encoding: typing.Optional[str] = None) -> str:
+    etag = hashlib.md5((str(stat_result.st_mtime) + "-" + str(stat_result.st_size)).encode(), usedforsecurity=False).hexdigest()
+    if encoding:
+        etag = etag + "-" + encoding
+    return '"%s"' % etag
+
+
+def content_disposition(filename: str, disposition_type: str = "attachment") -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return "%s; filename*=utf-8''%s" % (disposition_type, quoted)
+    return '%s; filename="%s"' % (disposition_type, filename)
+
+
+def file_headers(path: typing.Union[str, os.PathLike], stat_result: os.stat_result, media_type: typing.Optional[str] = None,
+                 filename: typing.Optional[str] = None, disposition_type: str = "attachment") -> typing.List[typing.Tuple[str, str]]:
+    media_type = media_type or guess_type(filename or str(path))[0] or "text/plain"
+    if media_type.startswith("text/") and "charset=" not in media_type.lower():
+        media_type += "; charset=utf-8"
+    headers = [("content-type", media_type)]
+    if filename is not None:
+        headers.append(("content-disposition", content_disposition(filename, disposition_type)))
+    headers.extend((
+        ("accept-ranges", "bytes"),
+        ("content-length", str(stat_result.st_size)),
+        ("last-modified", formatdate(stat_result.st_mtime, usegmt=True)),
+        ("etag", file_etag(stat_result)),
+    ))
+    return headers
+
+
+def parse_date(value: typing.Optional[str]) -> typing.Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def is_digits(value: str) -> bool:
+    # str.isdigit() is true for digits int() rejects, "²"
+    return value.isascii() and value.isdigit()
+
+
+def parse_ranges(range_header: str, size: int) -> typing.Optional[typing.List[typing.Tuple[int, int]]]:
+    """
+    The sorted and merged ``(start, end)`` byte ranges of a Range header, end excluded.
+    Returns None for a header to ignore (another unit or a syntax error) and raises
+    RangeNotSatisfiable if no range overlaps the ``size`` bytes.
+    """
+    unit, _, specs = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, sep, last = spec.partition("-")
+        first, last = first.strip(), last.strip()
+        if not sep or first and not is_digits(first) or last and not is_digits(last) or not first and not last:
+            return None
+        if not first:
+            # a suffix range, the last bytes of the file
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(int(last) + 1 if last else size, size)))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        if start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class FileSend:
+    """
+    The status, headers and body parts of a file response to a request: a 304 for a
+    ``conditional`` request whose validators match, a 206 for a satisfiable Range (a
+    multipart/byteranges body for several ranges) unless an If-Range doesn't match, a
+    416 for an unsatisfiable one, the whole file otherwise.
+
+    The body is sent with the ``http.response.zerocopysend`` or ``http.response.pathsend``
+    extension if the server has it and read in chunks in a thread if not, or iterated
+    by a WSGI server.
+    """
+
+    def __init__(self, path: typing.Union[str, os.PathLike], stat_result: os.stat_result, headers: typing.List[typing.Tuple[str, str]],
+                 request_headers: typing.Mapping[str, str], method: str = "GET", status: int = 200, conditional: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.path, self.stat_result, self.chunk_size = path, stat_result, chunk_size
+        self.status, self.headers = status, list(headers)
+        self.body = method != "HEAD"
+        size = stat_result.st_size
+        self.parts: typing.List[typing.Tuple[bytes, int, int]] = [(b"", 0, size)]
+        self.trailer = b""
+        if status != 200 or method not in ("GET", "HEAD"):
+            return
+        values = {name.lower(): value for name, value in self.headers}
+        if conditional and self.is_not_modified(request_headers, values.get("etag"), values.get("last-modified")):
+            self.status, self.parts = 304, []
+            self.headers = [(name, value) for name, value in self.headers if name.lower() in NOT_MODIFIED_HEADERS]
+            return
+        range_header = request_headers.get("range")
+        if not range_header or not size or not self.if_range(request_headers.get("if-range"), values.get("etag"), values.get("last-modified")):
+            return
+        try:
+            ranges = parse_ranges(range_header, size)
+        except RangeNotSatisfiable:
+            self.status, self.parts = 416, []
+            self.set_headers(("content-range", "bytes */%d" % size), ("content-length", "0"))
+            return
+        if ranges is None or len(ranges) > MAX_RANGES:
+            return
+        self.status = 206
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.parts = [(b"", start, end)]
+            self.set_headers(("content-range", "bytes %d-%d/%d" % (start, end - 1, size)), ("content-length", str(end - start)))
+            return
+        boundary = secrets.token_hex(13)
+        content_type = values.get("content-type", "application/octet-stream")
+        self.parts = [(("\r\n--%s\r\ncontent-type: %s\r\ncontent-range: bytes %d-%d/%d\r\n\r\n"
+                        % (boundary, content_type, start, end - 1, size)).encode("latin-1"), start, end) for start, end in ranges]
+        self.trailer = ("\r\n--%s--\r\n" % boundary).encode("latin-1")
+        content_length = sum(len(prefix) + end - start for prefix, start, end in self.parts) + len(self.trailer)
+        self.set_headers(("content-type", "multipart/byteranges; boundary=%s" % boundary), ("content-length", str(content_length)))
+
+    def set_headers(self, *headers: typing.Tuple[str, str]) -> None:
+        names = {name for name, _ in headers}
+        self.headers = [(name, value) for name, value in self.headers if name.lower() not in names] + list(headers)
+
+    @staticmethod
+    def is_not_modified(request_headers: typing.Mapping[str, str], etag: typing.Optional[str], last_modified: typing.Optional[str]) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            if etag is None:
+                return False
+            return parse_etags(if_none_match).contains_weak(unquote_etag(etag)[0])
+        since, modified = parse_date(request_headers.get("if-modified-since")), parse_date(last_modified)
+        return since is not None and modified is not None and modified <= since
+
+    @staticmethod
+    def if_range(if_range: typing.Optional[str], etag: typing.Optional[str], last_modified: typing.Optional[str]) -> bool:
+        """
+        Whether the ranges of a request can be served, an If-Range validator must match
+        the file exactly: a strong ETag or the Last-Modified date.
+        """
+        if not if_range:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith(("W/", '"')):
+            return etag is not None and not etag.startswith("W/") and if_range == etag
+        date = parse_date(if_range)
+        return date is not None and date == parse_date(last_modified)
+
+    @property
+    def raw_headers(self) -> typing.List[typing.Tuple[bytes, bytes]]:
+        return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in self.headers]
+
+    async def send(self, scope: Scope, send: Send, raw_headers: typing.Optional[typing.List[typing.Tuple[bytes, bytes]]] = None) -> None:
+        await send({"type": "http.response.start", "status": self.status, "headers": self.raw_headers if raw_headers is None else raw_headers})
+        if not self.body or not self.parts:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            await self.send_zerocopy(send)
+        elif "http.response.pathsend" in extensions and self.status == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            await self.send_chunks(send)
+
+    async def send_zerocopy(self, send: Send) -> None:
+        fd = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            last = len(self.parts) - 1
+            for index, (prefix, start, end) in enumerate(self.parts):
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": fd,
+                    "offset": start,
+                    "count": end - start,
+                    "more_body": index < last or bool(self.trailer),
+                })
+            if self.trailer:
+                await send({"type": "http.response.body", "body": self.trailer})
+        finally:
+            fd.close()
+
+    async def send_chunks(self, send: Send) -> None:
+        fd = await anyio.to_thread.run_sync(open, self.path, "rb")
+        try:
+            for prefix, start, end in self.parts:
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                while start < end:
+                    chunk = await anyio.to_thread.run_sync(self.read, fd, start, min(self.chunk_size, end - start))
+                    if not chunk:
+                        # the file was truncated under us
+                        raise OSError("File at path {} was truncated".format(self.path))
+                    start += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": self.trailer})
+        finally:
+            fd.close()
+
+    @staticmethod
+    def read(fd: typing.BinaryIO, offset: int, size: int) -> bytes:
+        fd.seek(offset)
+        return fd.read(size)
+
+    def __iter__(self) -> typing.Iterator[bytes]:
+        if not self.body or not self.parts:
+            return
+        with open(self.path, "rb") as fd:
+            for prefix, start, end in self.parts:
+                if prefix:
+                    yield prefix
+                while start < end:
+                    chunk = self.read(fd, start, min(self.chunk_size, end - start))
+                    if not chunk:
+                        return
+                    start += len(chunk)
+                    yield chunk
+            if self.trailer:
+                yield self.trailer
+
+
+class AsyncFileResponse(AsyncResponse):
+    """
+    starlette's FileResponse served by FileSend, with byte ranges and zero-copy sends.
+    A ``conditional`` response answers If-None-Match and If-Modified-Since with a 304,
+    ``method="HEAD"`` sends the headers only whatever the request method.
+    """
+
+    def __init__(self, path: typing.Union[str, os.PathLike], status_code: int = 200, headers: typing.Optional[typing.Mapping[str, str]] = None,
+                 media_type: typing.Optional[str] = None, background: typing.Optional[BackgroundTask] = None,
+                 filename: typing.Optional[str] = None, stat_result: typing.Optional[os.stat_result] = None,
+                 method: typing.Optional[str] = None, content_disposition_type: str = "attachment",
+                 conditional: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.path, self.status_code, self.filename = path, status_code, filename
+        self.media_type = media_type or guess_type(filename or str(path))[0] or "text/plain"
+        self.content_disposition_type = content_disposition_type
+        self.conditional, self.chunk_size = conditional, chunk_size
+        self.send_header_only = method is not None and method.upper() == "HEAD"
+        self.background = background
+        self.init_headers(headers)
+        self.stat_result = stat_result
+        if stat_result is not None:
+            self.set_stat_headers(stat_result)
+
+    def set_stat_headers(self, stat_result: os.stat_result) -> None:
+        for name, value in file_headers(self.path, stat_result, self.media_type, self.filename, self.content_disposition_type):
+            self.headers.setdefault(name, value)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            try:
+                stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError("File at path {} does not exist.".format(self.path))
+            if not stat.S_ISREG(stat_result.st_mode):
+                raise RuntimeError("File at path {} is not a file.".format(self.path))
+            self.stat_result = stat_result
+            self.set_stat_headers(stat_result)
+        method = "HEAD" if self.send_header_only else scope["method"]
+        file_send = FileSend(self.path, self.stat_result, self.headers.items(), Headers(scope=scope), method,
+                             self.status_code, self.conditional, self.chunk_size)
+        await file_send.send(scope, send)
+        if self.background is not None:
+            await self.background()
+
+
+class SyncFileResponse(SyncResponse):
+    """
+    A file response of a sync view, iterated by the WSGI server or sent by FileSend
+    from the event loop by the native dispatch.
+    """
+
+    def __init__(self, file_send: FileSend) -> None:
+        super().__init__(file_send, status=file_send.status, headers=file_send.headers, direct_passthrough=True)
+        if not any(name.lower() == "content-type" for name, _ in file_send.headers):
+            # werkzeug adds its default mimetype
+            self.headers.pop("Content-Type", None)
+        self.file_send = file_send
+
+
+def send_file(request, path: typing.Union[str, os.PathLike], mimetype: typing.Optional[str] = None, as_attachment: bool = False,
+              download_name: typing.Optional[str] = None, conditional: bool = True, max_age: typing.Optional[int] = None) -> SyncFileResponse:
+    """
+    Send a file from a sync view, with ranges and conditional requests.
+    """
+    stat_result = os.stat(path)
+    if as_attachment and download_name is None:
+        download_name = os.path.basename(path)
+    headers = file_headers(path, stat_result, mimetype, download_name, "attachment" if as_attachment else "inline")
+    if max_age is not None:
+        headers.append(("cache-control", "public, max-age=%d" % max_age))
+    return SyncFileResponse(FileSend(path, stat_result, headers, request.headers, request.method, conditional=conditional))
+
+
+async def async_send_file(request, path: typing.Union[str, os.PathLike], mimetype: typing.Optional[str] = None, as_attachment: bool = False,
+                          download_name: typing.Optional[str] = None, conditional: bool = True, max_age: typing.Optional[int] = None) -> AsyncFileResponse:
+    """
+    Send a file from an async view, with ranges, conditional requests and zero-copy sends.
+    """
+    stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    if as_attachment and download_name is None:
+        download_name = os.path.basename(path)
+    headers = {"cache-control": "public, max-age=%d" % max_age} if max_age is not None else None
+    return AsyncFileResponse(path, headers=headers, media_type=mimetype, filename=download_name, stat_result=stat_result,
+                             content_disposition_type="attachment" if as_attachment else "inline", conditional=conditional)
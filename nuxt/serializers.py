@@ -0,0 +1,146 @@
+from collections import OrderedDict
+import dataclasses
+import datetime
+import decimal
+import enum
+import typing
+import uuid
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+JSON_BACKENDS = ("orjson", "ujson", "json")
+
+
+def is_namedtuple(obj) -> bool:
+    return isinstance(obj, tuple) and hasattr(obj, "_fields")
+
+
+class JSONSerializer:
+    """
+    The JSON encoder shared by sync and async responses. It uses the fastest
+    installed backend (orjson, ujson, then the stdlib json) and falls back to the
+    registered type encoders for anything the backend can't encode natively, the
+    encoder of a type is resolved once along its MRO and cached.
+
+    The stdlib and ujson backends encode a NamedTuple nested in a container as an
+    array, a NamedTuple returned by a view is always encoded as an object.
+
+    orjson encodes NaN and Infinity as ``null`` where the stdlib json raises a
+    ValueError. What orjson rejects (integers wider than 64 bits) is encoded by the
+    stdlib json instead.
+    """
+
+    def __init__(self, backend: str = "auto") -> None:
+        self.encoders: typing.Dict[type, typing.Callable] = OrderedDict()
+        self._encoder_cache: typing.Dict[type, typing.Optional[typing.Callable]] = {}
+        self._body_cache: typing.Dict[type, bool] = {}
+        self._orjson_option = 0
+        self.use(backend)
+        self.register_encoder(datetime.datetime, datetime.datetime.isoformat, builtin=True)
+        self.register_encoder(datetime.date, datetime.date.isoformat, builtin=True)
+        self.register_encoder(datetime.time, datetime.time.isoformat, builtin=True)
+        self.register_encoder(uuid.UUID, str, builtin=True)
+        self.register_encoder(decimal.Decimal, str, builtin=True)
+        self.register_encoder(enum.Enum, lambda obj: obj.value, builtin=True)
+        self.register_encoder(set, list, builtin=True)
+        self.register_encoder(frozenset, list, builtin=True)
+
+    def use(self, backend: str = "auto") -> None:
+        """
+        Select the JSON backend, ``auto`` picks the first installed of orjson, ujson and json.
+        """
+        backend = backend or "auto"
+        if backend == "auto":
+            backend = "orjson" if orjson else "ujson" if ujson else "json"
+        assert backend in JSON_BACKENDS, "Unknown json backend {}, should be one of {}".format(backend, JSON_BACKENDS)
+        if backend == "orjson" and orjson is None or backend == "ujson" and ujson is None:
+            raise ImportError("json backend {} is not installed".format(backend))
+        self.backend = backend
+        self._dumps = getattr(self, "_dumps_%s" % backend)
+
+    def register_encoder(self, type_: type, encoder: typing.Callable, builtin: bool = False) -> None:
+        """
+        Encode the instances of ``type_`` (and its subclasses) as ``encoder(obj)``,
+        which should return a JSON compatible value.
+        """
+        self.encoders[type_] = encoder
+        self._encoder_cache.clear()
+        self._body_cache.clear()
+        if not builtin and orjson is not None:
+            # let a user encoder win over the orjson native types
+            if issubclass(type_, (datetime.datetime, datetime.date, datetime.time)):
+                self._orjson_option |= orjson.OPT_PASSTHROUGH_DATETIME
+            if issubclass(type_, (dict, list, str, int)):
+                self._orjson_option |= orjson.OPT_PASSTHROUGH_SUBCLASS
+
+    def get_encoder(self, type_: type) -> typing.Optional[typing.Callable]:
+        try:
+            return self._encoder_cache[type_]
+        except KeyError:
+            pass
+        encoder = None
+        for base in type_.__mro__:
+            if base in self.encoders:
+                encoder = self.encoders[base]
+                break
+        if encoder is None:
+            if dataclasses.is_dataclass(type_):
+                encoder = dataclasses.asdict
+            elif issubclass(type_, tuple) and hasattr(type_, "_fields"):
+                encoder = type_._asdict
+        self._encoder_cache[type_] = encoder
+        return encoder
+
+    def default(self, obj):
+        encoder = self.get_encoder(type(obj))
+        if encoder is None:
+            raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+        return encoder(obj)
+
+    def is_body(self, obj) -> bool:
+        """
+        Whether a view return value should be serialized as a JSON response.
+        """
+        type_ = type(obj)
+        try:
+            return self._body_cache[type_]
+        except KeyError:
+            pass
+        if issubclass(type_, (str, bytes, bytearray)):
+            body = False
+        elif issubclass(type_, (dict, list)) or is_namedtuple(obj):
+            body = True
+        else:
+            body = self.get_encoder(type_) is not None
+        self._body_cache[type_] = body
+        return body
+
+    def dumps(self, obj) -> bytes:
+        if is_namedtuple(obj):
+            obj = obj._asdict()
+        return self._dumps(obj)
+
+    def _dumps_orjson(self, obj) -> bytes:
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option | orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            return self._dumps_json(obj)
+
+    def _dumps_ujson(self, obj) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, default=self.default).encode("utf-8")
+
+    def _dumps_json(self, obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=self.default).encode("utf-8")
+
+
+serializer = JSONSerializer()
+register_encoder = serializer.register_encoder
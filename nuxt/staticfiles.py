@@ -1,18 +1,556 @@
 from starlette.staticfiles import StaticFiles as _StaticFiles
-from starlette.staticfiles import PathLike
+from starlette.staticfiles import PathLike, NotModifiedResponse
 from starlette.datastructures import URL
 from starlette.exceptions import HTTPException
-from starlette.responses import FileResponse, RedirectResponse, Response
+from starlette.responses import RedirectResponse, Response
+from starlette.datastructures import Headers
 from starlette.types import Scope, Receive, Send
 from starlette.websockets import WebSocket
+from nuxt.reloader import has_inotify
+from nuxt.sendfile import AsyncFileResponse as FileResponse, file_etag
+from nuxt.serializers import serializer
+from collections import OrderedDict
 from html import escape as htmlescape
 from urllib import parse as urllibparse
+from mimetypes import guess_type
+from email.utils import formatdate
+import threading
+import hashlib
+import heapq
 import typing
+import json
 import anyio
+import gzip
 import stat
+import time
 import sys
 import os
 
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+if has_inotify:
+    from inotify.adapters import InotifyTree
+    import inotify.constants
+
+DEFAULT_STATIC_CACHE_OPTIONS = {
+    "max_entries": 4096,
+    "max_memory": 64 * 1024 * 1024,
+    "max_file_size": 256 * 1024,
+    "revalidate": 1.0,
+}
+DEFAULT_STATIC_COMPRESS_OPTIONS = {
+    "encodings": ("br", "gzip"),
+    "min_size": 1024,
+    "max_file_size": 4 * 1024 * 1024,
+    "max_memory": 32 * 1024 * 1024,
+}
+MANIFEST_NAME = "static-manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_LISTING_OPTIONS = {
+    "per_page": 1000,
+    "max_entries": 50000,
+    "cache_size": 64,
+}
+# preferred first
+ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_TYPES = frozenset((
+    "application/javascript", "application/json", "application/ld+json", "application/manifest+json",
+    "application/wasm", "application/xml", "application/xhtml+xml", "application/rss+xml", "application/atom+xml",
+    "application/x-javascript", "application/vnd.ms-fontobject", "font/otf", "font/ttf", "image/svg+xml",
+    "image/x-icon", "image/vnd.microsoft.icon", "image/bmp",
+))
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith("text/") or content_type in COMPRESSIBLE_TYPES
+
+
+def get_content_type(path: str) -> str:
+    content_type, encoding = guess_type(path)
+    if encoding:
+        # an already compressed file
+        return "application/gzip" if encoding == "gzip" else "application/octet-stream"
+    return content_type or "text/plain"
+
+
+def accepted_encodings(accept_encoding: str) -> typing.Set[str]:
+    """
+    The codings of an Accept-Encoding header, except the ones with q=0.
+    """
+    encodings = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(coding)
+    if "*" in encodings:
+        encodings.update(encoding for encoding, _ in ENCODING_SUFFIXES)
+    return encodings
+
+
+def fingerprint_name(path: str, digest: str) -> str:
+    """
+    ``css/app.css`` with the digest ``3f2a1b`` is ``css/app.3f2a1b.css``.
+    """
+    dirname, basename = os.path.split(path)
+    name, ext = os.path.splitext(basename)
+    return os.path.join(dirname, "%s.%s%s" % (name, digest, ext))
+
+
+def fingerprint_digest(path: str, fingerprinted: str) -> str:
+    """
+    The digest ``fingerprint_name`` put in the fingerprinted path of ``path``.
+    """
+    name, ext = os.path.splitext(os.path.basename(path))
+    basename = os.path.basename(fingerprinted)
+    return basename[len(name) + 1:len(basename) - len(ext)]
+
+
+def file_digest(path: str, digest_length: int = 16) -> str:
+    digest = hashlib.blake2b(digest_size=digest_length // 2)
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(directory: str, digest_length: int = 16) -> dict:
+    """
+    Hash every file under a static directory, the manifest maps each path to its
+    fingerprinted path. The .br and .gz siblings are served through their file.
+    """
+    files = {}
+    suffixes = tuple(suffix for _, suffix in ENCODING_SUFFIXES)
+    for root, dirs, names in os.walk(directory):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relpath = os.path.relpath(path, directory).replace(os.sep, "/")
+            if relpath == MANIFEST_NAME or name.endswith(suffixes):
+                continue
+            files[relpath] = fingerprint_name(relpath, file_digest(path, digest_length)).replace(os.sep, "/")
+    return {"version": 1, "files": files}
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body)
+    # mtime=0, the same input gives the same bytes
+    return gzip.compress(body, compresslevel=9 if len(body) < 1024 * 1024 else 6, mtime=0)
+
+
+def media_type_header(content_type: str) -> bytes:
+    if content_type.startswith("text/") and "charset=" not in content_type.lower():
+        content_type += "; charset=utf-8"
+    return content_type.encode("latin-1")
+
+
+class StaticEntry:
+
+    __slots__ = ("full_path", "stat_result", "headers", "body", "checked")
+
+    def __init__(self, full_path: str, stat_result: typing.Optional[os.stat_result],
+                 headers: typing.Optional[typing.List[typing.Tuple[bytes, bytes]]] = None, body: typing.Optional[bytes] = None) -> None:
+        self.full_path, self.stat_result, self.headers, self.body = full_path, stat_result, headers, body
+        self.checked = time.monotonic()
+
+    @property
+    def is_file(self) -> bool:
+        return self.stat_result is not None and stat.S_ISREG(self.stat_result.st_mode)
+
+    @property
+    def is_dir(self) -> bool:
+        return self.stat_result is not None and stat.S_ISDIR(self.stat_result.st_mode)
+
+    def unchanged(self, full_path: str, stat_result: typing.Optional[os.stat_result]) -> bool:
+        if full_path != self.full_path or stat_result is None or self.stat_result is None:
+            return full_path == self.full_path and stat_result is self.stat_result is None
+        old = self.stat_result
+        return (stat_result.st_mode, stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns) == \
+            (old.st_mode, old.st_ino, old.st_size, old.st_mtime_ns)
+
+
+class StaticFileCache:
+    """
+    The path lookups of a StaticFiles app, misses included, and the bodies of files up
+    to ``max_file_size`` bytes, bounded by ``max_entries`` lookups and ``max_memory``
+    bytes of bodies. Entries are dropped by an inotify watch of the directories. When
+    inotify is not available an entry older than ``revalidate`` seconds is looked up
+    again, and kept if its file has the same size and mtime.
+
+    Every invalidation bumps ``generation``, an entry loaded in a thread is only
+    stored if its path wasn't invalidated since the generation its load started at.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_memory: int = 64 * 1024 * 1024,
+                 max_file_size: int = 256 * 1024, revalidate: float = 1.0) -> None:
+        self.max_entries, self.max_memory, self.max_file_size = max_entries, max_memory, max_file_size
+        self.revalidate = revalidate
+        self.entries: typing.MutableMapping[str, StaticEntry] = OrderedDict()
+        self.memory = 0
+        self.watching, self.watched, self.watches = False, False, 0
+        # the generation of the last invalidation of a path, and of the last full one
+        self.generation, self.cleared = 0, 0
+        self.invalidated: typing.Dict[str, int] = {}
+        # the inotify thread invalidates while the event loop reads
+        self.lock = threading.Lock()
+        self.hits, self.misses, self.revalidations, self.evictions, self.invalidations = 0, 0, 0, 0, 0
+
+    def get(self, path: str) -> typing.Optional[StaticEntry]:
+        """
+        The entry of a path, possibly to revalidate (see ``expired``), or None.
+        """
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(path)
+            if self.expired(entry):
+                self.revalidations += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def expired(self, entry: StaticEntry) -> bool:
+        return not self.watched and time.monotonic() - entry.checked > self.revalidate
+
+    def set(self, path: str, entry: StaticEntry, generation: typing.Optional[int] = None) -> None:
+        with self.lock:
+            if generation is not None and self.is_stale(entry, generation):
+                return
+            if path in self.entries:
+                self.remove(path)
+            self.entries[path] = entry
+            if entry.body is not None:
+                self.memory += len(entry.body)
+            while self.entries and (len(self.entries) > self.max_entries or self.memory > self.max_memory):
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def remove(self, path: str) -> None:
+        entry = self.entries.pop(path)
+        if entry.body is not None:
+            self.memory -= len(entry.body)
+
+    def is_stale(self, entry: StaticEntry, generation: int) -> bool:
+        if generation == self.generation:
+            return False
+        if self.cleared > generation:
+            return True
+        for full_path, invalidated in self.invalidated.items():
+            if invalidated > generation and (entry.full_path == full_path or entry.full_path.startswith(full_path + os.sep)):
+                return True
+        return False
+
+    def invalidate(self, full_path: typing.Optional[str] = None) -> None:
+        """
+        Drop the entries of ``full_path``, or all the entries.
+        """
+        with self.lock:
+            self.invalidations += 1
+            self.generation += 1
+            if full_path is None or len(self.invalidated) >= self.max_entries:
+                self.cleared = self.generation
+                self.invalidated.clear()
+            if full_path is None:
+                self.entries.clear()
+                self.memory = 0
+                return
+            self.invalidated[full_path] = self.generation
+            prefix = full_path + os.sep
+            for path in [path for path, entry in self.entries.items()
+                         if entry.full_path == full_path or entry.full_path.startswith(prefix)]:
+                self.remove(path)
+
+    def watch(self, directories: typing.Iterable[str]) -> None:
+        """
+        Start the inotify threads once, in the process serving the requests. The threads
+        walk the directories, the entries are revalidated until they are all watched.
+        """
+        if self.watching or not has_inotify:
+            return
+        self.watching = True
+        directories = list(directories)
+        self.watches = len(directories)
+        for directory in directories:
+            StaticFileWatcher(directory, self).start()
+
+    def watch_started(self) -> None:
+        with self.lock:
+            self.watches -= 1
+            if self.watches:
+                return
+            self.watched = True
+        # a file may have changed before its directory was watched
+        self.invalidate()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "memory": self.memory,
+            "max_memory": self.max_memory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "watched": self.watched,
+        }
+
+
+class StaticFileWatcher(threading.Thread):
+    if has_inotify:
+        # a content change drops the file, anything else may change what a path resolves to
+        modify_mask = inotify.constants.IN_MODIFY | inotify.constants.IN_ATTRIB | inotify.constants.IN_CLOSE_WRITE
+        event_mask = (modify_mask | inotify.constants.IN_CREATE | inotify.constants.IN_DELETE
+                      | inotify.constants.IN_DELETE_SELF | inotify.constants.IN_MOVE_SELF
+                      | inotify.constants.IN_MOVED_FROM | inotify.constants.IN_MOVED_TO)
+
+    def __init__(self, directory: str, cache: StaticFileCache) -> None:
+        super().__init__(name="StaticFileWatcher", daemon=True)
+        self.directory, self.cache = directory, cache
+
+    def run(self) -> None:
+        if not os.path.isdir(self.directory):
+            return self.cache.watch_started()
+        try:
+            # a recursive walk, out of the event loop
+            watcher = InotifyTree(os.path.realpath(self.directory), mask=self.event_mask)
+        except Exception:
+            # out of inotify watches, fall back to the revalidation
+            return
+        self.cache.watch_started()
+        try:
+            for event in watcher.event_gen():
+                if event is None:
+                    continue
+                header, _, dirname, filename = event
+                if header.mask & self.modify_mask and not header.mask & ~self.modify_mask & self.event_mask:
+                    self.cache.invalidate(os.path.join(dirname, filename))
+                else:
+                    self.cache.invalidate()
+        finally:
+            # the watch is gone, revalidate from now on
+            self.cache.watched = False
+            self.cache.invalidate()
+
+
+class StaticCompressor:
+    """
+    Compress static files of a compressible type on their first request and keep the
+    results in an LRU of ``max_memory`` bytes, keyed by the file's path, mtime and size.
+    Brotli is only used if the ``brotli`` package is installed.
+    """
+
+    def __init__(self, encodings: typing.Iterable[str] = ("br", "gzip"), min_size: int = 1024,
+                 max_file_size: int = 4 * 1024 * 1024, max_memory: int = 32 * 1024 * 1024) -> None:
+        self.encodings = tuple(encoding for encoding in encodings if encoding == "gzip" or encoding == "br" and brotli is not None)
+        self.min_size, self.max_file_size, self.max_memory = min_size, max_file_size, max_memory
+        self.entries: typing.MutableMapping[tuple, typing.Optional[StaticEntry]] = OrderedDict()
+        self.memory = 0
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def compressible(self, entry: StaticEntry, content_type: str) -> bool:
+        return self.min_size <= entry.stat_result.st_size <= self.max_file_size and is_compressible(content_type)
+
+    async def get(self, entry: StaticEntry, content_type: str, encoding: str) -> typing.Optional[StaticEntry]:
+        """
+        The compressed variant of a file, None if it doesn't get smaller.
+        """
+        key = (entry.full_path, entry.stat_result.st_mtime_ns, entry.stat_result.st_size, encoding)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        variant = await anyio.to_thread.run_sync(self.compress_entry, entry, content_type, encoding)
+        self.entries[key] = variant
+        if variant is not None:
+            self.memory += len(variant.body)
+        while self.entries and self.memory > self.max_memory:
+            _, evicted = self.entries.popitem(last=False)
+            if evicted is not None:
+                self.memory -= len(evicted.body)
+            self.evictions += 1
+        return variant
+
+    def compress_entry(self, entry: StaticEntry, content_type: str, encoding: str) -> typing.Optional[StaticEntry]:
+        body = entry.body
+        if body is None:
+            with open(entry.full_path, "rb") as fd:
+                body = fd.read()
+        data = compress(body, encoding)
+        if len(data) >= len(body):
+            return None
+        return variant_entry(entry, data, content_type, encoding, file_etag(entry.stat_result, encoding))
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.memory = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "memory": self.memory,
+            "max_memory": self.max_memory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def variant_entry(entry: StaticEntry, body: bytes, content_type: str, encoding: str, etag: str) -> StaticEntry:
+    headers = [
+        (b"content-type", media_type_header(content_type)),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        (b"last-modified", formatdate(entry.stat_result.st_mtime, usegmt=True).encode("latin-1")),
+        (b"etag", etag.encode("latin-1")),
+        (b"content-encoding", encoding.encode("latin-1")),
+        (b"vary", b"Accept-Encoding"),
+    ]
+    return StaticEntry(entry.full_path, entry.stat_result, headers, body)
+
+
+class DirectoryListing:
+    """
+    The directory listings of a StaticFiles app. A directory is scanned in a thread,
+    keeping the first ``max_entries`` names in sorted order, and the scan is cached by
+    the directory's mtime. It is rendered ``per_page`` entries at a time (``?page=2``)
+    as HTML or as JSON (``?format=json``), and the rendered pages are cached by URL.
+    """
+
+    def __init__(self, per_page: int = 1000, max_entries: int = 50000, cache_size: int = 64) -> None:
+        self.per_page, self.max_entries, self.cache_size = per_page, max_entries, cache_size
+        self.scans: typing.MutableMapping[tuple, typing.Tuple[list, bool]] = OrderedDict()
+        self.pages: typing.MutableMapping[tuple, typing.Tuple[bytes, str]] = OrderedDict()
+
+    def scan(self, full_path: str) -> typing.Tuple[typing.List[typing.Tuple[str, bool, bool]], bool]:
+        total = 0
+
+        def counted(it: typing.Iterator[os.DirEntry]) -> typing.Iterator[os.DirEntry]:
+            nonlocal total
+            for dir_entry in it:
+                total += 1
+                yield dir_entry
+
+        with os.scandir(full_path) as it:
+            # sorted before the truncation, a page doesn't depend on the directory order
+            kept = heapq.nsmallest(self.max_entries, counted(it), key=lambda dir_entry: dir_entry.name.lower())
+        entries = []
+        for dir_entry in kept:
+            try:
+                is_dir = dir_entry.is_dir()
+            except OSError:
+                is_dir = False
+            entries.append((dir_entry.name, is_dir, dir_entry.is_symlink()))
+        return entries, total > len(entries)
+
+    @staticmethod
+    def cache_set(cache: typing.MutableMapping, key: tuple, value, size: int) -> None:
+        cache[key] = value
+        while len(cache) > size:
+            cache.popitem(last=False)
+
+    async def response(self, entry: StaticEntry, scope: Scope) -> Response:
+        query = urllibparse.parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        try:
+            page = max(int(query.get("page", ["1"])[0]), 1)
+        except ValueError:
+            page = 1
+        fmt = "json" if query.get("format", [""])[0] == "json" else "html"
+        base = (entry.full_path, entry.stat_result.st_mtime_ns)
+        # the links and the title show the URL, a directory may be mounted at several
+        key = base + (scope.get("root_path", "") + scope["path"], page, fmt)
+        rendered = self.pages.get(key)
+        if rendered is None:
+            scan = self.scans.get(base)
+            if scan is None:
+                scan = await anyio.to_thread.run_sync(self.scan, entry.full_path)
+                self.cache_set(self.scans, base, scan, self.cache_size)
+            rendered = getattr(self, "render_%s" % fmt)(scope, scan[0], scan[1], page)
+            self.cache_set(self.pages, key, rendered, self.cache_size)
+        else:
+            self.pages.move_to_end(key)
+        body, media_type = rendered
+        return Response(body, status_code=200, headers={"Content-type": media_type, "Content-Length": str(len(body))})
+
+    def page_count(self, entries: list) -> int:
+        return max((len(entries) + self.per_page - 1) // self.per_page, 1)
+
+    def render_json(self, scope: Scope, entries: list, truncated: bool, page: int) -> typing.Tuple[bytes, str]:
+        start = (page - 1) * self.per_page
+        body = serializer.dumps({
+            "path": URL(scope=scope).path,
+            "page": page,
+            "pages": self.page_count(entries),
+            "total": len(entries),
+            "truncated": truncated,
+            "entries": [{"name": name, "type": "directory" if is_dir else "file", "link": is_link}
+                        for name, is_dir, is_link in entries[start:start + self.per_page]],
+        })
+        return body, "application/json"
+
+    def render_html(self, scope: Scope, entries: list, truncated: bool, page: int) -> typing.Tuple[bytes, str]:
+        displaypath = htmlescape(urllibparse.unquote(URL(scope=scope).path, errors='surrogatepass'), quote=False)
+        enc = sys.getfilesystemencoding()
+        title = 'Directory listing for %s' % displaypath
+        r = []
+        r.append('<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01//EN" '
+                 '"http://www.w3.org/TR/html4/strict.dtd">')
+        r.append('<html>\n<head>')
+        r.append('<meta http-equiv="Content-Type" '
+                 'content="text/html; charset=%s">' % enc)
+        r.append('<title>%s</title>\n</head>' % title)
+        r.append('<body>\n<h1>%s</h1>' % title)
+        r.append('<hr>\n<ul>')
+        start = (page - 1) * self.per_page
+        for name, is_dir, is_link in entries[start:start + self.per_page]:
+            displayname = linkname = name
+            # Append / for directories or @ for symbolic links
+            if is_dir:
+                displayname = name + "/"
+                linkname = name + "/"
+            if is_link:
+                displayname = name + "@"
+                # Note: a link to a directory displays with @ and links with /
+            r.append('<li><a href="%s">%s</a></li>' % (urllibparse.quote(linkname, errors='surrogatepass'), htmlescape(displayname, quote=False)))
+        r.append('</ul>\n<hr>')
+        pages = self.page_count(entries)
+        if pages > 1:
+            links = []
+            if page > 1:
+                links.append('<a href="?page=%d">previous</a>' % (page - 1))
+            links.append('page %d of %d' % (page, pages))
+            if page < pages:
+                links.append('<a href="?page=%d">next</a>' % (page + 1))
+            r.append('<p>%s</p>' % ' | '.join(links))
+        if truncated:
+            r.append('<p>Only the first %d entries are listed.</p>' % self.max_entries)
+        r.append('</body>\n</html>\n')
+        return '\n'.join(r).encode(enc, 'surrogateescape'), "text/html; charset=%s" % enc
+
+
+class CachedFileResponse(Response):
+
+    def __init__(self, entry: StaticEntry, status_code: int = 200, method: str = "GET") -> None:
+        self.status_code = status_code
+        self.body = b"" if method == "HEAD" else entry.body
+        self.raw_headers = list(entry.headers)
+        self.background = None
+
 
 class StaticFiles(_StaticFiles):
 
@@ -22,9 +560,45 @@ class StaticFiles(_StaticFiles):
                  html: bool = False,
                  check_dir: bool = True,
                  follow_symlink: bool = False,
-                 list_directory: bool = False) -> None:
+                 list_directory: typing.Union[bool, dict] = False,
+                 cache: typing.Union[bool, dict] = False,
+                 precompressed: bool = False,
+                 compress: typing.Union[bool, dict] = False,
+                 manifest: typing.Optional[PathLike] = None) -> None:
         super().__init__(directory=directory, packages=packages, html=html, check_dir=check_dir, follow_symlink=follow_symlink)
-        self.is_list_directory = list_directory
+        # the fingerprinted paths of the manifest and the paths they serve
+        self.fingerprints: typing.Dict[str, str] = {}
+        self.fingerprinted: typing.Dict[str, str] = {}
+        # the digest of each path, and the file version last hashed against it
+        self.digests: typing.Dict[str, str] = {}
+        self.verified: typing.Dict[str, typing.Tuple[tuple, bool]] = {}
+        # the manifest file, when it's under the directory
+        self.manifest_path: typing.Optional[str] = None
+        if manifest is None and directory is not None:
+            manifest = os.path.join(directory, MANIFEST_NAME)
+        if manifest is not None and os.path.isfile(manifest):
+            self.load_manifest(manifest)
+        self.is_list_directory = bool(list_directory)
+        self.listing: typing.Optional[DirectoryListing] = None
+        if list_directory:
+            listing_options = dict(DEFAULT_LISTING_OPTIONS)
+            if isinstance(list_directory, dict):
+                listing_options.update(list_directory)
+            self.listing = DirectoryListing(**listing_options)
+        self.cache: typing.Optional[StaticFileCache] = None
+        if cache:
+            cache_options = dict(DEFAULT_STATIC_CACHE_OPTIONS)
+            if isinstance(cache, dict):
+                cache_options.update(cache)
+            self.cache = StaticFileCache(**cache_options)
+        # serve the .br and .gz siblings of a file, probed on every request unless cached
+        self.precompressed = precompressed
+        self.compressor: typing.Optional[StaticCompressor] = None
+        if compress:
+            compress_options = dict(DEFAULT_STATIC_COMPRESS_OPTIONS)
+            if isinstance(compress, dict):
+                compress_options.update(compress)
+            self.compressor = StaticCompressor(**compress_options)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """
@@ -39,11 +613,34 @@ class StaticFiles(_StaticFiles):
         if not self.config_checked:
             await self.check_config()
             self.config_checked = True
+            if self.cache is not None:
+                self.cache.watch(self.all_directories)
 
         path = self.get_path(scope)
         response = await self.get_response(path, scope)
         await response(scope, receive, send)
 
+    def load_manifest(self, manifest: PathLike) -> None:
+        """
+        Load a manifest written by ``nuxt fingerprint``.
+        """
+        with open(manifest, "r", encoding="utf-8") as fd:
+            files: dict = json.load(fd).get("files", {})
+        self.fingerprints = dict(files)
+        self.fingerprinted = {os.path.normpath(fingerprinted): os.path.normpath(path) for path, fingerprinted in files.items()}
+        self.digests = {os.path.normpath(path): fingerprint_digest(path, fingerprinted) for path, fingerprinted in files.items()}
+        self.verified = {}
+        if self.directory is not None:
+            relpath = os.path.relpath(os.path.realpath(manifest), os.path.realpath(self.directory))
+            if not relpath.startswith(os.pardir):
+                self.manifest_path = os.path.normpath(relpath)
+
+    def fingerprint(self, path: str) -> str:
+        """
+        The fingerprinted path of a file, or the path itself if it's not in the manifest.
+        """
+        return self.fingerprints.get(path.lstrip("/"), path)
+
     async def get_response(self, path: str, scope: Scope) -> Response:
         """
         Returns an HTTP response, given the incoming path, method and request headers.
@@ -51,82 +648,182 @@ class StaticFiles(_StaticFiles):
         if scope["method"] not in ("GET", "HEAD"):
             raise HTTPException(status_code=405)
 
+        if path == self.manifest_path:
+            return await self.not_found_response(scope)
+        original = self.fingerprinted.get(path)
+        if original is None:
+            return await self.path_response(path, scope)
+        response = await self.path_response(original, scope)
+        # the content of a fingerprinted path never changes, while the file still has the digest
+        if response.status_code in (200, 206, 304) and await self.fingerprint_matches(original):
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+    async def fingerprint_matches(self, path: str) -> bool:
+        """
+        Whether the file of a path still has the digest of the manifest, it's hashed
+        again in a thread when its size or mtime change.
+        """
+        entry = await self.lookup(path)
+        if not entry.is_file:
+            return False
+        version = (entry.full_path, entry.stat_result.st_size, entry.stat_result.st_mtime_ns)
+        verified = self.verified.get(path)
+        if verified is None or verified[0] != version:
+            digest = self.digests[path]
+            matches = await anyio.to_thread.run_sync(file_digest, entry.full_path, len(digest)) == digest
+            verified = self.verified[path] = (version, matches)
+        return verified[1]
+
+    async def path_response(self, path: str, scope: Scope) -> Response:
         try:
-            full_path, stat_result = await anyio.to_thread.run_sync(
-                self.lookup_path, path
-            )
+            entry = await self.lookup(path)
         except PermissionError:
             raise HTTPException(status_code=401)
         except OSError:
             raise
 
-        if stat_result and stat.S_ISREG(stat_result.st_mode):
+        if entry.is_file:
             # We have a static file to serve.
-            return self.file_response(full_path, stat_result, scope)
+            return await self.encoded_response(path, entry, scope)
 
-        elif stat_result and stat.S_ISDIR(stat_result.st_mode) and self.html:
+        elif entry.is_dir and self.html:
             # We're in HTML mode, and have got a directory URL.
             # Check if we have 'index.html' file to serve.
             index_path = os.path.join(path, "index.html")
-            full_path, stat_result = await anyio.to_thread.run_sync(
-                self.lookup_path, index_path
-            )
-            if stat_result is not None and stat.S_ISREG(stat_result.st_mode):
+            index_entry = await self.lookup(index_path)
+            if index_entry.is_file:
                 if not scope["path"].endswith("/"):
                     # Directory URLs should redirect to always end in "/".
                     url = URL(scope=scope)
                     url = url.replace(path=url.path + "/")
                     return RedirectResponse(url=url)
-                return self.file_response(full_path, stat_result, scope)
+                return await self.encoded_response(index_path, index_entry, scope)
 
-            if stat_result is None and self.is_list_directory:
-                return await anyio.to_thread.run_sync(self.list_directory, path)
+            if index_entry.stat_result is None and self.is_list_directory:
+                if not scope["path"].endswith("/"):
+                    # the links of the listing are relative to the directory
+                    url = URL(scope=scope)
+                    return RedirectResponse(url=url.replace(path=url.path + "/"))
+                return await self.list_directory(entry, scope)
+
+        return await self.not_found_response(scope)
 
+    async def not_found_response(self, scope: Scope) -> Response:
         if self.html:
             # Check for '404.html' if we're in HTML mode.
-            full_path, stat_result = await anyio.to_thread.run_sync(
-                self.lookup_path, "404.html"
-            )
-            if stat_result and stat.S_ISREG(stat_result.st_mode):
-                return FileResponse(
-                    full_path,
-                    stat_result=stat_result,
-                    method=scope["method"],
-                    status_code=404,
-                )
+            entry = await self.lookup("404.html")
+            if entry.is_file:
+                return self.entry_response(entry, scope, status_code=404)
         raise HTTPException(status_code=404)
 
-    def list_directory(self, path):
-        dir_list = os.listdir(path)
-        dir_list.sort(key=lambda a: a.lower())
-        r = []
-        displaypath = urllibparse.unquote(os.path.basename(os.path.realpath(path)), errors='surrogatepass')
-        displaypath = htmlescape(displaypath, quote=False)
-        enc = sys.getfilesystemencoding()
-        title = 'Directory listing for %s' % displaypath
-        r.append('<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01//EN" '
-                 '"http://www.w3.org/TR/html4/strict.dtd">')
-        r.append('<html>\n<head>')
-        r.append('<meta http-equiv="Content-Type" '
-                 'content="text/html; charset=%s">' % enc)
-        r.append('<title>%s</title>\n</head>' % title)
-        r.append('<body>\n<h1>%s</h1>' % title)
-        r.append('<hr>\n<ul>')
-        for name in dir_list:
-            fullname = os.path.join(path, name)
-            displayname = linkname = name
-            # Append / for directories or @ for symbolic links
-            if os.path.isdir(fullname):
-                displayname = name + "/"
-                linkname = name + "/"
-            if os.path.islink(fullname):
-                displayname = name + "@"
-                # Note: a link to a directory displays with @ and links with /
-            r.append('<li><a href="%s">%s</a></li>' % (urllibparse.quote(linkname, errors='surrogatepass'), htmlescape(displayname, quote=False)))
-        r.append('</ul>\n<hr>\n</body>\n</html>\n')
-        encoded = '\n'.join(r).encode(enc, 'surrogateescape')
+    async def lookup(self, path: str) -> StaticEntry:
+        """
+        Resolve a path from the cache, a miss looks it up in a thread.
+        """
+        if self.cache is None:
+            return await anyio.to_thread.run_sync(self.load_entry, path)
+        entry = self.cache.get(path)
+        if entry is not None and not self.cache.expired(entry):
+            return entry
+        generation = self.cache.generation
+        entry = await anyio.to_thread.run_sync(self.load_entry, path, entry)
+        self.cache.set(path, entry, generation)
+        return entry
 
-        return Response(encoded, status_code=200, headers={
-            "Content-type": "text/html; charset=%s" % enc,
-            "Content-Length": str(len(encoded))
-        })
+    def load_entry(self, path: str, cached: typing.Optional[StaticEntry] = None) -> StaticEntry:
+        """
+        Look a path up, a ``cached`` entry of an unchanged file is kept with its body.
+        """
+        full_path, stat_result = self.lookup_path(path)
+        if cached is not None and cached.unchanged(full_path, stat_result):
+            cached.checked = time.monotonic()
+            return cached
+        entry = StaticEntry(full_path, stat_result)
+        if self.cache is None or not entry.is_file or stat_result.st_size > self.cache.max_file_size:
+            return entry
+        try:
+            fd = open(full_path, "rb")
+        except FileNotFoundError:
+            # removed since the lookup
+            return StaticEntry(full_path, None)
+        with fd:
+            # the headers describe the file that was read
+            stat_result = os.fstat(fd.fileno())
+            entry = StaticEntry(full_path, stat_result)
+            if stat_result.st_size > self.cache.max_file_size:
+                return entry
+            body = fd.read()
+        if len(body) == stat_result.st_size:
+            # the in-memory response doesn't serve ranges
+            entry.headers = [(name, value) for name, value in FileResponse(full_path, stat_result=stat_result).raw_headers
+                             if name != b"accept-ranges"]
+            entry.body = body
+        return entry
+
+    async def encoded_response(self, path: str, entry: StaticEntry, scope: Scope) -> Response:
+        """
+        Serve the .br or .gz sibling of a file, or a compressed copy of it, to a client
+        accepting the encoding.
+        """
+        request_headers = Headers(scope=scope)
+        if "range" in request_headers:
+            # ranges are served from the file, in the identity encoding
+            response = self.file_response(entry.full_path, entry.stat_result, scope)
+            if self.precompressed or self.compressor is not None:
+                response.headers["vary"] = "Accept-Encoding"
+            return response
+        if not self.precompressed and self.compressor is None:
+            return self.entry_response(entry, scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        content_type = get_content_type(entry.full_path)
+        vary = False
+        if self.precompressed:
+            for (encoding, _), sibling in zip(ENCODING_SUFFIXES, await self.sibling_entries(path)):
+                if not sibling.is_file:
+                    continue
+                vary = True
+                if encoding in accepted:
+                    if sibling.body is not None:
+                        sibling = variant_entry(sibling, sibling.body, content_type, encoding, file_etag(sibling.stat_result))
+                        return self.entry_response(sibling, scope)
+                    return FileResponse(sibling.full_path, stat_result=sibling.stat_result, media_type=content_type,
+                                        headers={"content-encoding": encoding, "vary": "Accept-Encoding"}, conditional=True)
+        if self.compressor is not None and self.compressor.compressible(entry, content_type):
+            vary = True
+            for encoding in self.compressor.encodings:
+                if encoding in accepted:
+                    variant = await self.compressor.get(entry, content_type, encoding)
+                    if variant is not None:
+                        return self.entry_response(variant, scope)
+                    break
+        response = self.entry_response(entry, scope)
+        if vary:
+            response.headers["vary"] = "Accept-Encoding"
+        return response
+
+    async def sibling_entries(self, path: str) -> typing.List[StaticEntry]:
+        """
+        The entries of the precompressed siblings of a path, in ENCODING_SUFFIXES order.
+        The cache keeps the missing ones too, without it they are looked up in one thread.
+        """
+        paths = [path + suffix for _, suffix in ENCODING_SUFFIXES]
+        if self.cache is None:
+            return await anyio.to_thread.run_sync(lambda: [self.load_entry(sibling) for sibling in paths])
+        return [await self.lookup(sibling) for sibling in paths]
+
+    def file_response(self, full_path: PathLike, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        return FileResponse(full_path, status_code=status_code, stat_result=stat_result, conditional=True)
+
+    def entry_response(self, entry: StaticEntry, scope: Scope, status_code: int = 200) -> Response:
+        if entry.body is None:
+            if status_code != 200:
+                return FileResponse(entry.full_path, stat_result=entry.stat_result, method=scope["method"], status_code=status_code)
+            return self.file_response(entry.full_path, entry.stat_result, scope)
+        response = CachedFileResponse(entry, status_code, scope["method"])
+        if status_code == 200 and self.is_not_modified(Headers(raw=entry.headers), Headers(scope=scope)):
+            return NotModifiedResponse(Headers(raw=entry.headers))
+        return response
+
+    async def list_directory(self, entry: StaticEntry, scope: Scope) -> Response:
+        return await self.listing.response(entry, scope)
@@ -0,0 +1,200 @@
+from a2wsgi.asgi_typing import Receive, Scope, Send
+from a2wsgi.wsgi import WSGIResponder, Body, build_environ
+from a2wsgi.wsgi_typing import Environ, StartResponse
+from concurrent.futures import Executor
+import contextvars
+import functools
+import threading
+import asyncio
+import typing
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+class StreamBuffer:
+    """
+    The byte budget between a producer thread and the ASGI send side, the producer
+    blocks once ``buffer_size`` bytes are waiting to be sent and gives up when the
+    stream is stopped (client disconnected or send failed).
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.buffer_size = buffer_size
+        self.buffered = 0
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def reserve(self, size: int) -> bool:
+        with self.condition:
+            while self.buffered >= self.buffer_size and not self.stopped:
+                self.condition.wait()
+            if self.stopped:
+                return False
+            self.buffered += size
+            return True
+
+    def release(self, size: int) -> None:
+        with self.condition:
+            self.buffered -= size
+            self.condition.notify()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+class SyncResponseStream:
+    """
+    Send the chunks of a sync response iterable as they are produced in the executor,
+    at most ``buffer_size`` bytes ahead of the client. The iteration stops at the next
+    chunk once the client disconnects.
+    """
+
+    def __init__(self, iterable: typing.Iterable[bytes], executor: Executor, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.iterable, self.executor = iterable, executor
+        self.buffer = StreamBuffer(buffer_size)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.loop = asyncio.get_event_loop()
+
+    def produce(self) -> None:
+        put = functools.partial(self.loop.call_soon_threadsafe, self.queue.put_nowait)
+        try:
+            for chunk in self.iterable:
+                if not chunk:
+                    continue
+                if not self.buffer.reserve(len(chunk)):
+                    return
+                put(chunk)
+        finally:
+            put(None)
+
+    async def watch(self, receive: Receive) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self.buffer.stop()
+                self.queue.put_nowait(None)
+                return
+
+    async def __call__(self, receive: Receive, send: Send) -> None:
+        producer = self.loop.run_in_executor(self.executor, contextvars.copy_context().run, self.produce)
+        watcher = self.loop.create_task(self.watch(receive))
+        try:
+            while True:
+                chunk = await self.queue.get()
+                if chunk is None or self.buffer.stopped:
+                    break
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                self.buffer.release(len(chunk))
+            if not self.buffer.stopped:
+                await producer
+                await send({"type": "http.response.body", "body": b""})
+        finally:
+            self.buffer.stop()
+            watcher.cancel()
+            # the iterable can only be closed once the producer has left it
+            await asyncio.wait([producer])
+            if not producer.cancelled():
+                producer.exception()
+
+
+class StreamingWSGIResponder(WSGIResponder):
+    """
+    The a2wsgi responder with flow control, the WSGI thread waits while
+    ``buffer_size`` bytes are queued for the client and stops iterating the
+    response when the client disconnects.
+    """
+
+    def __init__(self, app, executor: Executor, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        super().__init__(app, executor)
+        self.buffer = StreamBuffer(buffer_size)
+        self.messages: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # a single reader owns receive(), the body reads from it and a disconnect
+        # can be seen while the response is streamed.
+        reader = self.loop.create_task(self.read(receive))
+        try:
+            await self.respond(scope, send)
+        finally:
+            self.buffer.stop()
+            reader.cancel()
+
+    async def read(self, receive: Receive) -> None:
+        while True:
+            try:
+                message = await receive()
+            except Exception as e:
+                # raised again in the WSGI thread reading the body
+                await self.messages.put(e)
+                return
+            if message["type"] == "http.disconnect":
+                self.buffer.stop()
+                self.send_event.set()
+                await self.messages.put(message)
+                return
+            await self.messages.put(message)
+
+    async def receive_body(self) -> dict:
+        message = await self.messages.get()
+        if isinstance(message, Exception):
+            raise message
+        if message["type"] == "http.disconnect":
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return message
+
+    async def respond(self, scope: Scope, send: Send) -> None:
+        environ = build_environ(scope, Body(self.loop, self.receive_body))
+        # the body ends with the last http.request message, chunked uploads are readable
+        environ["wsgi.input_terminated"] = True
+        sender = None
+        try:
+            sender = self.loop.create_task(self.sender(send))
+            context = contextvars.copy_context()
+            func = functools.partial(context.run, self.wsgi)
+            await self.loop.run_in_executor(self.executor, func, environ, self.start_response)
+            self.send_queue.append(None)
+            self.send_event.set()
+            await asyncio.wait_for(sender, None)
+            if self.exc_info is not None:
+                raise self.exc_info[0].with_traceback(self.exc_info[1], self.exc_info[2])
+        finally:
+            if sender and not sender.done():
+                sender.cancel()
+
+    async def sender(self, send: Send) -> None:
+        while True:
+            if self.buffer.stopped:
+                return
+            if self.send_queue:
+                message = self.send_queue.popleft()
+                if message is None:
+                    return
+                await send(message)
+                if message.get("more_body"):
+                    self.buffer.release(len(message["body"]))
+            else:
+                await self.send_event.wait()
+                self.send_event.clear()
+
+    def start_response(self, status: str, response_headers: list, exc_info=None) -> typing.Callable[[bytes], None]:
+        super().start_response(status, response_headers, exc_info)
+        return self.write
+
+    def write(self, chunk: bytes) -> None:
+        if chunk and self.buffer.reserve(len(chunk)):
+            self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    def wsgi(self, environ: Environ, start_response: StartResponse) -> None:
+        iterable = self.app(environ, start_response)
+        try:
+            for chunk in iterable:
+                if not chunk:
+                    continue
+                if not self.buffer.reserve(len(chunk)):
+                    return
+                self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+            self.send({"type": "http.response.body", "body": b""})
+        finally:
+            getattr(iterable, "close", lambda: None)()
@@ -1,26 +1,181 @@
 from nuxt.app import entry_app
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 from starlette.requests import Request as AsyncRequest
 from starlette.responses import Response as AsyncResponse
+from starlette.responses import StreamingResponse as AsyncStreamingResponse
 from madara.wrappers import Request, Response
+from nuxt.staticfiles import StaticFiles
+from nuxt.routing import Mount
+from nuxt.fragments import FragmentCache, FragmentCacheExtension, DEFAULT_FRAGMENT_CACHE_OPTIONS
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import functools
+import asyncio
+import typing
 import os
 
 
+DEFAULT_TEMPLATE_OPTIONS = {
+    "path": "",
+    # False, True for a directory in the system temp dir or the cache directory
+    "bytecode_cache": False,
+    # compile every template when the server starts, before the workers fork
+    "warm": False,
+    "cache_size": 400,
+    "auto_reload": True,
+    # how render_template_async renders: "thread", "async" or "sync" (on the event loop)
+    "render_mode": "thread",
+    "render_workers": 4,
+    # the characters buffered into each chunk of a streamed template
+    "stream_chunk_size": 16 * 1024,
+    # the {% cache %} tag, see DEFAULT_FRAGMENT_CACHE_OPTIONS
+    "fragment_cache": {},
+}
+RENDER_MODES = ("thread", "async", "sync")
+
 __template_env: Environment = None
+__async_template_env: Environment = None
+__render_executor: ThreadPoolExecutor = None
+__fragment_cache: FragmentCache = None
+__static_mounts: typing.Dict[str, Mount] = {}
+
+
+def create_template_env(options: typing.Optional[dict] = None, enable_async: bool = False,
+                        fragment_cache: typing.Optional[FragmentCache] = None) -> Environment:
+    """
+    The template environment of the ``template`` config. With a bytecode cache the
+    templates are compiled once for all the workers (and across restarts).
+    """
+    template_options = dict(DEFAULT_TEMPLATE_OPTIONS)
+    template_options.update(options or {})
+    path = template_options["path"].lstrip("/")
+    template_path: str = os.path.join(os.path.abspath(os.path.dirname(path)), path)
+    bytecode_cache = template_options["bytecode_cache"]
+    # async templates compile to other code, don't share their bytecode
+    pattern = "__jinja2_async_%s.cache" if enable_async else "__jinja2_%s.cache"
+    if bytecode_cache is True:
+        bytecode_cache = FileSystemBytecodeCache(pattern=pattern)
+    elif bytecode_cache:
+        os.makedirs(bytecode_cache, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(bytecode_cache, pattern=pattern)
+    else:
+        bytecode_cache = None
+    env = Environment(loader=FileSystemLoader([template_path]), bytecode_cache=bytecode_cache, enable_async=enable_async,
+                      cache_size=template_options["cache_size"], auto_reload=template_options["auto_reload"],
+                      extensions=[FragmentCacheExtension])
+    env.fragment_cache = fragment_cache or create_fragment_cache(template_options["fragment_cache"])
+    env.globals["static_url"] = static_url
+    return env
+
+
+def create_fragment_cache(options: typing.Optional[dict] = None) -> FragmentCache:
+    cache_options = dict(DEFAULT_FRAGMENT_CACHE_OPTIONS)
+    cache_options.update(options or {})
+    return FragmentCache(**cache_options)
+
+
+def get_fragment_cache() -> FragmentCache:
+    """
+    The fragment cache of the {% cache %} tag, shared by the sync and async environments.
+    """
+    global __fragment_cache
+    if __fragment_cache is None:
+        __fragment_cache = create_fragment_cache(entry_app.config.get("template", {}).get("fragment_cache"))
+    return __fragment_cache
 
 
 def __init_template_env():
     global __template_env
-    __template_config: dict = entry_app.config.get("template", {})
-    __path = __template_config.get("path", "").lstrip("/")
-    __template_path: str = os.path.join(os.path.abspath(os.path.dirname(__path)), __path)
-    __template_env = Environment(loader=FileSystemLoader([__template_path]))
+    __template_env = create_template_env(entry_app.config.get("template", {}), fragment_cache=get_fragment_cache())
 
 
-def render_template(request: Request, template_name: str, **context):
+def get_template_env() -> Environment:
     if __template_env is None:
         __init_template_env()
-    template = __template_env.get_template(template_name)
+    return __template_env
+
+
+def get_async_template_env() -> Environment:
+    global __async_template_env
+    if __async_template_env is None:
+        __async_template_env = create_template_env(entry_app.config.get("template", {}), enable_async=True,
+                                                   fragment_cache=get_fragment_cache())
+    return __async_template_env
+
+
+def get_render_executor() -> ThreadPoolExecutor:
+    global __render_executor
+    if __render_executor is None:
+        max_workers = entry_app.config.get("template", {}).get("render_workers", DEFAULT_TEMPLATE_OPTIONS["render_workers"])
+        __render_executor = ThreadPoolExecutor(thread_name_prefix="Template", max_workers=max_workers)
+    return __render_executor
+
+
+def warm_templates(env: typing.Optional[Environment] = None) -> typing.Tuple[int, typing.Dict[str, Exception]]:
+    """
+    Load every template of the environment, so that they are compiled (and written
+    to the bytecode cache) before the first request, return the count and errors.
+    """
+    env = env or get_template_env()
+    count, errors = 0, {}
+    # skip the files of a bytecode cache in the template directory
+    for name in env.list_templates(filter_func=lambda name: not os.path.basename(name).startswith("__jinja2_")):
+        try:
+            env.get_template(name)
+        except Exception as error:
+            errors[name] = error
+        else:
+            count += 1
+    return count, errors
+
+
+def static_url(path: str, name: str = "async.nuxt.static") -> str:
+    """
+    The URL of a static file, fingerprinted if the static directory has a manifest.
+    """
+    mount = __static_mounts.get(name)
+    if mount is None:
+        for route in entry_app.routes:
+            if isinstance(route, Mount) and route.name == name:
+                mount = __static_mounts[name] = route
+                break
+        else:
+            raise ValueError("No static mount named {}".format(name))
+    if isinstance(mount.app, StaticFiles):
+        path = mount.app.fingerprint(path)
+    return str(mount.url_path_for(name, path="/" + path.lstrip("/")))
+
+
+def get_stream_chunk_size() -> int:
+    return entry_app.config.get("template", {}).get("stream_chunk_size", DEFAULT_TEMPLATE_OPTIONS["stream_chunk_size"])
+
+
+def buffer_chunks(chunks: typing.Iterable[str], chunk_size: int) -> typing.Iterator[bytes]:
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+async def async_buffer_chunks(chunks: typing.AsyncIterable[str], chunk_size: int) -> typing.AsyncIterator[bytes]:
+    buffer, size = [], 0
+    async for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def render_template(request: Request, template_name: str, **context):
+    template = get_template_env().get_template(template_name)
     return template.render(**context)
 
 
@@ -29,6 +184,135 @@ def render_html(request: Request, template_name: str, **context):
     return Response(content, mimetype="text/html")
 
 
+def stream_template(request: Request, template_name: str, **context) -> typing.Iterator[bytes]:
+    """
+    Render a template as it is iterated, in utf-8 chunks of about ``stream_chunk_size``
+    characters of the template config.
+    """
+    template = get_template_env().get_template(template_name)
+    return buffer_chunks(template.generate(**context), get_stream_chunk_size())
+
+
+def stream_html(request: Request, template_name: str, **context):
+    return Response(stream_template(request, template_name, **context), mimetype="text/html")
+
+
+async def render_template_async(request: AsyncRequest, template_name: str, render_mode: typing.Optional[str] = None, **context) -> str:
+    """
+    Render a template without blocking the event loop: in the bounded template thread
+    pool ("thread"), with ``Template.render_async`` ("async") or on the loop ("sync").
+    The default mode is ``render_mode`` of the template config.
+    """
+    if render_mode is None:
+        render_mode = entry_app.config.get("template", {}).get("render_mode", DEFAULT_TEMPLATE_OPTIONS["render_mode"])
+    if render_mode == "thread":
+        loop = asyncio.get_running_loop()
+        func = functools.partial(contextvars.copy_context().run, render_template, request, template_name, **context)
+        return await loop.run_in_executor(get_render_executor(), func)
+    if render_mode == "async":
+        template = get_async_template_env().get_template(template_name)
+        return await template.render_async(**context)
+    if render_mode == "sync":
+        return render_template(request, template_name, **context)
+    raise ValueError("Unknown render mode {}, expected one of {}".format(render_mode, ", ".join(RENDER_MODES)))
+
+
+async def render_html_async(request: AsyncRequest, template_name: str, render_mode: typing.Optional[str] = None, **context):
+    content = await render_template_async(request, template_name, render_mode, **context)
+    return AsyncResponse(content, media_type="text/html")
+
+
+class AsyncTemplateResponse(AsyncResponse):
+    """
+    An HTML response whose template is rendered by ``render_template_async`` when the
+    response is sent, or earlier by an ``await render_body()``.
+    """
+
+    media_type = "text/html"
+
+    def __init__(self, request: AsyncRequest, template_name: str, context: dict, render_mode: typing.Optional[str] = None,
+                 status_code: int = 200, headers: typing.Optional[typing.Mapping[str, str]] = None) -> None:
+        self.request, self.template_name, self.context, self.render_mode = request, template_name, context, render_mode
+        self.status_code = status_code
+        self.background = None
+        self.init_headers(headers)
+
+    async def render_body(self) -> bytes:
+        if getattr(self, "body", None) is None:
+            content = await render_template_async(self.request, self.template_name, self.render_mode, **self.context)
+            self.body = self.render(content)
+            self.headers["content-length"] = str(len(self.body))
+        return self.body
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.render_body()
+        await super().__call__(scope, receive, send)
+
+
 def async_render_html(request: AsyncRequest, template_name: str, **context):
     content = render_template(request, template_name, **context)
     return AsyncResponse(content, media_type="text/html")
+
+
+def lazy_render_html(request: AsyncRequest, template_name: str, **context) -> AsyncTemplateResponse:
+    """
+    ``render_html`` without an ``await`` or a render on the loop: the template is
+    rendered when the response is sent, with the ``render_mode`` of the template config.
+    """
+    return AsyncTemplateResponse(request, template_name, context)
+
+
+async def iterate_in_executor(iterator: typing.Iterator[bytes], executor: ThreadPoolExecutor) -> typing.AsyncIterator[bytes]:
+    """
+    Iterate in the executor, a chunk at a time. When the consumer is cancelled while
+    a chunk is produced, the iterator is closed once that ``next()`` returns.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    pending = None
+
+    async def close() -> None:
+        if pending is not None:
+            await asyncio.wait([pending])
+        # context is entered by next() until it returns, close in a copy
+        await loop.run_in_executor(executor, context.copy().run, iterator.close)
+
+    try:
+        while True:
+            pending = loop.run_in_executor(executor, context.run, next, iterator, None)
+            chunk = await asyncio.shield(pending)
+            pending = None
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await asyncio.shield(close())
+
+
+async def iterate_in_loop(iterator: typing.Iterator[bytes]) -> typing.AsyncIterator[bytes]:
+    for chunk in iterator:
+        yield chunk
+
+
+def async_stream_template(request: AsyncRequest, template_name: str, render_mode: typing.Optional[str] = None,
+                          **context) -> typing.AsyncIterator[bytes]:
+    """
+    The async iterator of a streamed template, rendered like render_template_async:
+    chunk by chunk in the template thread pool, with ``Template.generate_async`` or on
+    the event loop.
+    """
+    if render_mode is None:
+        render_mode = entry_app.config.get("template", {}).get("render_mode", DEFAULT_TEMPLATE_OPTIONS["render_mode"])
+    if render_mode == "thread":
+        return iterate_in_executor(stream_template(request, template_name, **context), get_render_executor())
+    if render_mode == "async":
+        template = get_async_template_env().get_template(template_name)
+        return async_buffer_chunks(template.generate_async(**context), get_stream_chunk_size())
+    if render_mode == "sync":
+        return iterate_in_loop(stream_template(request, template_name, **context))
+    raise ValueError("Unknown render mode {}, expected one of {}".format(render_mode, ", ".join(RENDER_MODES)))
+
+
+def async_stream_html(request: AsyncRequest, template_name: str, render_mode: typing.Optional[str] = None, **context):
+    content = async_stream_template(request, template_name, render_mode, **context)
+    return AsyncStreamingResponse(content, media_type="text/html")
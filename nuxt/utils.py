@@ -1,13 +1,23 @@
-from nuxt.responses import AsyncResponse, AsyncJSONResponse
-from nuxt.datastructures import AsyncHeaders
+from nuxt.responses import AsyncResponse, AsyncJSONResponse, SyncResponse, SyncJSONResponse
+from nuxt.datastructures import AsyncHeaders, SyncHeaders
+from nuxt.serializers import serializer, is_namedtuple
 from madara.utils import _endpoint_from_view_func as endpoint_from_view_func
-from madara.wrappers import make_response as make_sync_response
+from madara.wrappers import make_response as make_madara_response
 from madara.utils import load_config, import_string
 from werkzeug.local import LocalProxy
 from apispec.ext.marshmallow import MarshmallowPlugin
+from apispec.ext.marshmallow.common import make_schema_key, resolve_schema_instance
 from apispec import APISpec
+from collections.abc import Mapping
+import marshmallow as ma
+import typing
+import copy
 import os
 
+# one marshmallow plugin (and APISpec) by openapi version, and the specs it made
+__apispec_plugins: typing.Dict[str, MarshmallowPlugin] = {}
+__apispec_schemas: typing.Dict[tuple, dict] = {}
+
 
 def getcwd():
     # get current path, try to use PWD env first
@@ -51,17 +61,17 @@ def format_pattern(pattern: str) -> str:
     return "".join(out)
 
 
-def make_async_response(*rv) -> AsyncResponse:
-    if not rv:
-        return AsyncResponse()
-
+def unpack_response(rv: tuple, headers_types: tuple) -> tuple:
+    """
+    Split the return value of a view into (body, status, headers).
+    """
     if len(rv) == 1:
         rv = rv[0]
 
     status = headers = None
 
-    # unpack tuple returns
-    if isinstance(rv, tuple):
+    # unpack tuple returns, a NamedTuple is a body
+    if isinstance(rv, tuple) and not is_namedtuple(rv):
         len_rv = len(rv)
 
         # a 3-tuple is unpacked directly
@@ -69,7 +79,7 @@ def make_async_response(*rv) -> AsyncResponse:
             rv, status, headers = rv
         # decide if a 2-tuple has status or headers
         elif len_rv == 2:
-            if isinstance(rv[1], (AsyncHeaders, dict, tuple, list)):
+            if isinstance(rv[1], headers_types):
                 rv, headers = rv
             else:
                 rv, status = rv
@@ -89,12 +99,37 @@ def make_async_response(*rv) -> AsyncResponse:
             " statement."
         )
 
+    return rv, status, headers
+
+
+def make_sync_response(request, *rv) -> SyncResponse:
+    if not rv:
+        return SyncResponse()
+
+    rv, status, headers = unpack_response(rv, (SyncHeaders, dict, tuple, list))
+
+    # JSON bodies go through the shared serializer, everything else through madara
+    if serializer.is_body(rv):
+        rv = SyncJSONResponse(rv)
+    elif isinstance(rv, typing.Iterator):
+        # a generator body is streamed
+        rv = SyncResponse(rv)
+
+    return make_madara_response(request, rv, status, headers)
+
+
+def make_async_response(*rv) -> AsyncResponse:
+    if not rv:
+        return AsyncResponse()
+
+    rv, status, headers = unpack_response(rv, (AsyncHeaders, dict, tuple, list))
+
     # make sure the body is an instance of the response class
     if not isinstance(rv, AsyncResponse):
         if isinstance(rv, (str, bytes, bytearray)):
             rv = AsyncResponse(rv, status_code=status if status else 200, headers=headers)
             status = headers = None
-        elif isinstance(rv, dict):
+        elif serializer.is_body(rv):
             rv = AsyncJSONResponse(content=rv)
 
     # prefer the status if it was provided
@@ -109,14 +144,77 @@ def make_async_response(*rv) -> AsyncResponse:
 
 
 def maschema_to_apisepc(schema, openapi_version) -> dict:
-    spec = APISpec(
-        title="maschema",
-        version="1.0.0",
-        openapi_version=openapi_version,
-        plugins=[MarshmallowPlugin()],
-    )
-    spec.components.schema("maschema", schema=schema)
-    return spec.to_dict()["components"]["schemas"]["maschema"]
+    schema = resolve_schema_instance(schema)
+    key = (openapi_version, make_schema_key(schema))
+    spec = __apispec_schemas.get(key)
+    if spec is None:
+        plugin = __apispec_plugins.get(openapi_version)
+        if plugin is None:
+            plugin = __apispec_plugins[openapi_version] = MarshmallowPlugin()
+            APISpec(title="maschema", version="1.0.0", openapi_version=openapi_version, plugins=[plugin])
+        spec = __apispec_schemas[key] = plugin.converter.schema2jsonschema(schema)
+    # a copy, yaml would dump a spec shared by two views as an alias
+    return copy.deepcopy(spec)
+
+
+class ValidatedArgs:
+    """
+    The argmap and location of a ``use_args`` decorator, kept on the view in
+    ``__apispec__`` until the schema generator asks for their spec.
+    """
+
+    __slots__ = ("argmap", "location")
+
+    def __init__(self, argmap, location: typing.Optional[str]) -> None:
+        self.argmap, self.location = argmap, location
+
+    def schema(self) -> typing.Optional[ma.Schema]:
+        if isinstance(self.argmap, Mapping):
+            self.argmap = ma.Schema.from_dict(dict(self.argmap))()
+        if isinstance(self.argmap, ma.Schema) or isinstance(self.argmap, type) and issubclass(self.argmap, ma.Schema):
+            return self.argmap
+        # a schema factory of the request
+        return None
+
+
+def apply_validated_args(parsed: dict, validated_args: typing.Iterable[ValidatedArgs], openapi_version: str) -> dict:
+    """
+    Add the parameters or request body of a view's ``use_args`` decorators to the
+    operation parsed from its docstring.
+    """
+    if not validated_args:
+        return parsed
+    parsed = dict(parsed) if parsed else {"parameters": []}
+    for args in validated_args:
+        schema, location = args.schema(), args.location
+        if schema is None:
+            continue
+        spec = maschema_to_apisepc(schema, openapi_version)
+        if location in ["view_args", "path", "querystring", "query"]:
+            parameters = list(parsed.get("parameters", []))
+            requireds = spec.get("required", [])
+            param_in = "path" if location in ["view_args", "path"] else "query"
+            # the declaration order, the fields of an unordered schema come from a set
+            order = {field.data_key or name: index for index, (name, field) in enumerate(schema._declared_fields.items())}
+            properties = spec.get("properties", {}).items()
+            for key, schema in sorted(properties, key=lambda item: order.get(item[0], len(order))):
+                parameters.append({
+                    "name": key,
+                    "in": param_in,
+                    "required": key in requireds,
+                    "schema": schema
+                })
+            parsed["parameters"] = parameters
+        if location in ["json", "form"]:
+            content_type = "application/json" if location in ["json"] else "application/x-www-form-urlencoded"
+            parsed["requestBody"] = {
+                "content": {
+                    content_type: {
+                        "schema": spec
+                    }
+                }
+            }
+    return parsed
 
 
 def __convertor_type(_type: str):
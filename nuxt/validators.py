@@ -0,0 +1,139 @@
+from webargs.core import _UNKNOWN_DEFAULT_PARAM
+from marshmallow import fields as ma_fields
+from collections.abc import Mapping
+import marshmallow as ma
+import typing
+
+# the locations whose data is a flat mapping of strings (or converted view args)
+COMPILED_LOCATIONS = ("view_args", "path", "querystring", "query")
+EnumField = getattr(ma_fields, "Enum", None)
+
+
+def load_int(field: ma_fields.Integer, value):
+    # marshmallow's Number._validated with strict=False
+    if value is True or value is False:
+        raise field.make_error("invalid", input=value)
+    try:
+        return int(value)
+    except OverflowError as error:
+        raise field.make_error("too_large", input=value) from error
+    except (TypeError, ValueError) as error:
+        raise field.make_error("invalid", input=value) from error
+
+
+def load_str(field: ma_fields.String, value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes):
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError as error:
+            raise field.make_error("invalid_utf8") from error
+    raise field.make_error("invalid")
+
+
+def load_bool(field: ma_fields.Boolean, value):
+    if not field.truthy:
+        return bool(value)
+    try:
+        if value in field.truthy:
+            return True
+        if value in field.falsy:
+            return False
+    except TypeError as error:
+        raise field.make_error("invalid", input=value) from error
+    raise field.make_error("invalid", input=value)
+
+
+def load_enum(field, value):
+    return field._deserialize(value, None, None)
+
+
+def get_loader(field: ma_fields.Field) -> typing.Optional[typing.Callable]:
+    field_type = type(field)
+    if field_type is ma_fields.Integer and not field.strict:
+        return load_int
+    if field_type is ma_fields.String:
+        return load_str
+    if field_type is ma_fields.Boolean:
+        return load_bool
+    if EnumField is not None and field_type is EnumField:
+        return load_enum
+    return None
+
+
+class CompiledArgs:
+    """
+    A flat argmap of int, str, bool and enum fields loaded without a schema load,
+    with the values, defaults and error messages marshmallow would give.
+    """
+
+    def __init__(self, schema: ma.Schema, loaders: typing.List[tuple], unknown: str) -> None:
+        self.schema, self.loaders, self.unknown = schema, loaders, unknown
+        self.names = frozenset(name for name, _, _ in loaders)
+
+    def __call__(self, data: typing.Optional[typing.Mapping]) -> dict:
+        if not data:
+            data = {}
+        result, errors = {}, {}
+        for name, field, loader in self.loaders:
+            value = data.get(name, ma.missing)
+            try:
+                if value is ma.missing:
+                    default = field.load_default
+                    if default is ma.missing:
+                        if field.required:
+                            raise field.make_error("required")
+                        continue
+                    result[name] = default() if callable(default) else default
+                    continue
+                if value is None:
+                    if not field.allow_none:
+                        raise field.make_error("null")
+                    result[name] = None
+                    continue
+                value = loader(field, value)
+                if field.validators:
+                    field._validate(value)
+                result[name] = value
+            except ma.ValidationError as error:
+                errors[name] = error.messages
+        if self.unknown != ma.EXCLUDE:
+            for name in data:
+                if name not in self.names:
+                    if self.unknown == ma.INCLUDE:
+                        result[name] = data.get(name)
+                    else:
+                        errors[name] = [self.schema.error_messages["unknown"]]
+        if errors:
+            raise ma.ValidationError(errors, data=data, valid_data=result)
+        return result
+
+
+def compile_argmap(schema_class: typing.Type[ma.Schema], argmap, location: str,
+                   unknown: typing.Optional[str]) -> typing.Optional[CompiledArgs]:
+    """
+    Compile a dict argmap of view args or query params made only of plain int, str,
+    bool and enum fields, anything else is left to marshmallow.
+    """
+    if not isinstance(argmap, Mapping) or location not in COMPILED_LOCATIONS:
+        return None
+    schema = schema_class.from_dict(dict(argmap))()
+    if schema._hooks or schema.many or schema.partial or schema.only is not None or schema.exclude:
+        return None
+    loaders = []
+    for name, field in schema.load_fields.items():
+        loader = get_loader(field)
+        if loader is None or field.data_key is not None or field.attribute is not None:
+            return None
+        loaders.append((name, field, loader))
+    return CompiledArgs(schema, loaders, unknown or schema.unknown)
+
+
+def resolve_unknown(parser, unknown: typing.Optional[str], location: str) -> typing.Optional[str]:
+    # the precedence of webargs' Parser._process_location_data
+    if unknown != _UNKNOWN_DEFAULT_PARAM:
+        return unknown
+    if parser.unknown != _UNKNOWN_DEFAULT_PARAM:
+        return parser.unknown
+    return parser.DEFAULT_UNKNOWN_BY_LOCATION.get(location)
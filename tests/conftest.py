@@ -0,0 +1,94 @@
+import asyncio
+import typing
+
+import pytest
+
+from nuxt import templating
+from nuxt.app import NuxtApplication, entry_app
+
+
+@pytest.fixture(params=["a2wsgi", "native"])
+def sync_dispatch(request) -> str:
+    return request.param
+
+
+@pytest.fixture
+def make_app() -> typing.Callable[..., NuxtApplication]:
+    def factory(**config) -> NuxtApplication:
+        return NuxtApplication(config)
+
+    return factory
+
+
+@pytest.fixture
+def global_app():
+    """
+    entry_app re-initialised with a config, as the launchers do, for the features
+    reached through the module level ``route`` decorators.
+    """
+
+    def init(**config) -> NuxtApplication:
+        entry_app.__init__(config)
+        return entry_app
+
+    yield init
+    entry_app.__init__({})
+
+
+def reset_templating() -> None:
+    # the environments, caches and executor are built once from the entry_app config
+    state = vars(templating)
+    if state["__render_executor"] is not None:
+        state["__render_executor"].shutdown()
+    for name in ("__template_env", "__async_template_env", "__render_executor", "__fragment_cache"):
+        state[name] = None
+    state["__static_mounts"].clear()
+
+
+@pytest.fixture
+def template_app(global_app):
+    """
+    global_app with the template state of nuxt.templating built from its config.
+    """
+
+    def init(**config) -> NuxtApplication:
+        reset_templating()
+        return global_app(**config)
+
+    yield init
+    reset_templating()
+
+
+def call_asgi(app, path: str = "/", method: str = "GET", query_string: bytes = b"",
+              headers: typing.Iterable[typing.Tuple[bytes, bytes]] = (), body: typing.Union[bytes, typing.List[bytes]] = b"",
+              extensions: typing.Optional[dict] = None) -> typing.Tuple[int, typing.List[tuple], typing.List[dict]]:
+    """
+    Call an ASGI app with one request and return the status, the headers and every
+    body message, the test client buffers them. A list body is received chunk by chunk.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query_string,
+        "headers": [(b"host", b"testserver")] + list(headers), "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    if extensions is not None:
+        scope["extensions"] = extensions
+    chunks = list(body) if isinstance(body, list) else [body]
+    messages = []
+
+    async def receive() -> dict:
+        if chunks:
+            return {"type": "http.request", "body": chunks.pop(0), "more_body": bool(chunks)}
+        await asyncio.sleep(3600)
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    return start["status"], start["headers"], messages[1:]
+
+
+@pytest.fixture
+def asgi_request() -> typing.Callable:
+    return call_asgi
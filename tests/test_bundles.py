@@ -0,0 +1,160 @@
+import gzip
+import threading
+import zipfile
+
+import pytest
+from click.testing import CliRunner
+from starlette.testclient import TestClient
+
+from nuxt import bundles
+from nuxt.bundles import Bundle, BundleFiles, build_bundle
+from nuxt.commands import cli
+
+SCRIPT = b"function hello() { return 'hello'; }\n" * 200
+LOGO = b"\x89PNG" + bytes(range(256)) * 8
+STYLE = b"body { color: red; }\n" * 100
+PRECOMPRESSED = gzip.compress(b"/* precompressed */\n" + STYLE, mtime=0)
+
+
+@pytest.fixture
+def bundle_path(tmp_path):
+    static = tmp_path / "static"
+    (static / "docs").mkdir(parents=True)
+    (static / "app.js").write_bytes(SCRIPT)
+    (static / "logo.png").write_bytes(LOGO)
+    (static / "tiny.txt").write_text("tiny\n")
+    (static / "style.css").write_bytes(STYLE)
+    (static / "style.css.gz").write_bytes(PRECOMPRESSED)
+    (static / "docs" / "index.html").write_text("<p>docs</p>\n")
+    (static / "404.html").write_text("missing\n")
+    output = tmp_path / "static.zip"
+    result = CliRunner().invoke(cli, ["bundle", str(static), str(output)])
+    assert result.exit_code == 0, result.output
+    assert result.output == "7 files packed into %s\n" % output
+    return str(output)
+
+
+@pytest.fixture
+def app(bundle_path):
+    return BundleFiles(path=bundle_path, html=True)
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app)
+
+
+def test_build_bundle(bundle_path):
+    with zipfile.ZipFile(bundle_path) as zf:
+        types = {info.filename: info.compress_type for info in zf.infolist()}
+    assert types["app.js"] == types["style.css"] == zipfile.ZIP_DEFLATED
+    # small, not compressible or already compressed
+    assert types["tiny.txt"] == types["logo.png"] == types["style.css.gz"] == zipfile.ZIP_STORED
+
+
+def test_stored_member(client):
+    response = client.get("/logo.png")
+    assert (response.status_code, response.content) == (200, LOGO)
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "vary" not in response.headers
+    response = client.get("/logo.png", headers={"range": "bytes=4-7"})
+    assert (response.status_code, response.content) == (206, LOGO[4:8])
+    assert response.headers["content-range"] == "bytes 4-7/%d" % len(LOGO)
+    response = client.get("/logo.png", headers={"range": "bytes=9999-"})
+    assert (response.status_code, response.headers["content-range"]) == (416, "bytes */%d" % len(LOGO))
+    response = client.get("/logo.png", headers={"range": "bytes=4-7", "if-range": '"nope"'})
+    assert (response.status_code, response.content) == (200, LOGO)
+
+
+def test_deflated_member_to_a_gzip_client(app, client):
+    response = client.get("/app.js", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(SCRIPT)
+    # the client checks the gzip trailer while decoding
+    assert response.content == SCRIPT
+    assert response.headers["etag"].endswith('-gzip"')
+    assert not app.bundle.inflated
+
+
+def test_deflated_member_inflated_once(app, client):
+    response = client.get("/app.js", headers={"accept-encoding": "identity"})
+    assert (response.content, response.headers["content-length"]) == (SCRIPT, str(len(SCRIPT)))
+    assert "content-encoding" not in response.headers
+    assert list(app.bundle.inflated) == ["app.js"]
+    cached = app.bundle.inflated["app.js"]
+    response = client.get("/app.js", headers={"accept-encoding": "identity", "range": "bytes=0-7"})
+    assert (response.status_code, response.content) == (206, SCRIPT[:8])
+    assert app.bundle.inflated["app.js"] is cached
+
+
+def test_big_member_inflated_in_a_thread(app, client, monkeypatch):
+    threads = []
+    read = Bundle.read
+
+    def recording_read(self, member):
+        threads.append(threading.current_thread())
+        return read(self, member)
+
+    monkeypatch.setattr(Bundle, "read", recording_read)
+    assert client.get("/style.css", headers={"accept-encoding": "identity"}).content == STYLE
+    monkeypatch.setattr(bundles, "INFLATE_IN_THREAD_SIZE", len(SCRIPT) - 1)
+    assert client.get("/app.js", headers={"accept-encoding": "identity"}).content == SCRIPT
+    # the small member on the event loop, the big one in a worker thread
+    assert len(threads) == 2 and threads[0] is not threads[1]
+    assert list(app.bundle.inflated) == ["style.css", "app.js"]
+    # cached, not inflated again
+    assert client.get("/app.js", headers={"accept-encoding": "identity"}).content == SCRIPT
+    assert len(threads) == 2
+
+
+def test_head_does_not_inflate(app, client):
+    response = client.head("/app.js", headers={"accept-encoding": "identity"})
+    assert (response.status_code, response.content) == (200, b"")
+    assert response.headers["content-length"] == str(len(SCRIPT))
+    assert not app.bundle.inflated
+
+
+def test_inflated_cache_is_bounded(bundle_path):
+    bundle = Bundle(bundle_path, inflated_cache_size=len(SCRIPT) + 10)
+    try:
+        assert bytes(bundle.read(bundle.get("app.js"))) == SCRIPT
+        assert bytes(bundle.read(bundle.get("style.css"))) == STYLE
+        assert list(bundle.inflated) == ["style.css"]
+        assert bundle.inflated_memory == 2100
+    finally:
+        bundle.close()
+
+
+def test_precompressed_sibling(client):
+    response = client.get("/style.css", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-length"] == str(len(PRECOMPRESSED))
+    assert response.headers["content-type"] == "text/css; charset=utf-8"
+    assert response.content == b"/* precompressed */\n" + STYLE
+    assert client.get("/style.css", headers={"accept-encoding": "identity"}).content == STYLE
+
+
+def test_not_modified(client):
+    for headers in ({"accept-encoding": "identity"}, {"accept-encoding": "gzip"}):
+        etag = client.get("/app.js", headers=headers).headers["etag"]
+        for if_none_match in (etag, "W/%s" % etag, '"a", %s' % etag):
+            response = client.get("/app.js", headers=dict(headers, **{"if-none-match": if_none_match}))
+            assert (response.status_code, response.content) == (304, b"")
+            assert response.headers["etag"] == etag
+
+
+def test_html_mode(client):
+    response = client.get("/docs", follow_redirects=False)
+    assert (response.status_code, response.headers["location"]) == (307, "http://testserver/docs/")
+    assert client.get("/docs/").text == "<p>docs</p>\n"
+    response = client.get("/nope")
+    assert (response.status_code, response.text) == (404, "missing\n")
+    assert client.get("/../static.zip").status_code == 404
+
+
+def test_build_bundle_skips_the_output(tmp_path):
+    (tmp_path / "a.txt").write_text("a")
+    assert build_bundle(str(tmp_path), str(tmp_path / "out.zip")) == 1
+    assert build_bundle(str(tmp_path), str(tmp_path / "out.zip")) == 1
@@ -0,0 +1,304 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+from starlette.testclient import TestClient
+
+from nuxt.caching import CachedResponse, ResponseCache, ResponseCacheRegistry
+
+
+class Deny:
+
+    def __init__(self, get_response, app=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.args.get("deny"):
+            return "denied", 403
+        return self.get_response(request)
+
+
+@pytest.fixture
+def app(make_app, sync_dispatch):
+    app = make_app(sync_dispatch=sync_dispatch)
+    app.calls = []
+
+    def view(request, name):
+        app.calls.append(name)
+        return {"name": name, "host": request.host, "page": request.args.get("page")}
+
+    def language(request):
+        app.calls.append("language")
+        return request.headers.get("Accept-Language", ""), {"Vary": "Accept-Language"}
+
+    def tenant(request):
+        app.calls.append("tenant")
+        return request.headers.get("X-Tenant", "")
+
+    def uncacheable(request, kind):
+        app.calls.append(kind)
+        if kind == "cookie":
+            return "x", {"Set-Cookie": "a=1"}
+        if kind == "private":
+            return "x", {"Cache-Control": "private"}
+        return "x", 404
+
+    app.wsgi_app.add_url_rule("/view/<name>", "view", view, cache=10, middlewares=[Deny])
+    app.wsgi_app.add_url_rule("/language", "language", language, cache=True)
+    app.wsgi_app.add_url_rule("/tenant", "tenant", tenant, cache={"vary": ["X-Tenant", "Cookie"]})
+    app.wsgi_app.add_url_rule("/uncacheable/<kind>", "uncacheable", uncacheable, cache=10)
+    app.wsgi_app.add_url_rule("/paged", "paged", lambda request: view(request, "paged"), cache={"query": ["page"]})
+    return app
+
+
+def test_hit_is_replayed(app):
+    client = TestClient(app)
+    first = client.get("/view/a")
+    second = client.get("/view/a")
+    assert first.json() == second.json() == {"name": "a", "host": "testserver", "page": None}
+    assert "age" not in first.headers and second.headers["age"] == "0"
+    assert app.calls == ["a"]
+    client.get("/view/b")
+    # only GET and HEAD are cached
+    client.post("/view/a")
+    assert app.calls == ["a", "b", "a"]
+    assert app.wsgi_app.caches.stats()["sync.view"]["hits"] == 1
+
+
+def test_middlewares_run_on_a_hit(app):
+    client = TestClient(app)
+    client.get("/view/a")
+    assert client.get("/view/a?deny=1").status_code == 403
+    assert app.calls == ["a"]
+
+
+def test_key_has_the_host_and_query(app):
+    client = TestClient(app)
+    assert client.get("/view/a", headers={"host": "one"}).json()["host"] == "one"
+    assert client.get("/view/a", headers={"host": "two"}).json()["host"] == "two"
+    client.get("/view/a", headers={"host": "one"})
+    client.get("/view/a?page=2", headers={"host": "one"})
+    assert app.calls == ["a", "a", "a"]
+    # only the listed params are part of the key
+    assert client.get("/paged?page=1&utm=x").json()["page"] == "1"
+    assert client.get("/paged?utm=y&page=1").json()["page"] == "1"
+    assert client.get("/paged?page=2").json()["page"] == "2"
+    assert app.calls.count("paged") == 2
+
+
+def test_credentials_bypass_the_cache(app):
+    client = TestClient(app)
+    client.get("/view/a")
+    client.get("/view/a", headers={"authorization": "Bearer x"})
+    client.get("/view/a", headers={"cookie": "session=1"})
+    assert app.calls == ["a", "a", "a"]
+    # unless they are in vary
+    client.get("/tenant", headers={"cookie": "session=1"})
+    client.get("/tenant", headers={"cookie": "session=1"})
+    client.get("/tenant", headers={"cookie": "session=2"})
+    assert app.calls.count("tenant") == 2
+
+
+def test_vary(app):
+    client = TestClient(app)
+    assert client.get("/tenant", headers={"x-tenant": "a"}).text == "a"
+    assert client.get("/tenant", headers={"x-tenant": "b"}).text == "b"
+    assert client.get("/tenant", headers={"x-tenant": "a"}).text == "a"
+    assert app.calls.count("tenant") == 2
+    # learned from the Vary header of the response
+    assert client.get("/language", headers={"accept-language": "fr"}).text == "fr"
+    assert client.get("/language", headers={"accept-language": "de"}).text == "de"
+    assert client.get("/language", headers={"accept-language": "fr"}).text == "fr"
+    assert app.calls.count("language") == 2
+
+
+def test_uncacheable_responses(app):
+    client = TestClient(app)
+    for kind in ("cookie", "private", "missing"):
+        client.get("/uncacheable/%s" % kind)
+        client.get("/uncacheable/%s" % kind)
+    assert app.calls == ["cookie", "cookie", "private", "private", "missing", "missing"]
+
+
+def test_sync_misses_are_coalesced(make_app, sync_dispatch):
+    app = make_app(sync_dispatch=sync_dispatch)
+    event, calls = threading.Event(), []
+
+    def slow(request):
+        calls.append(1)
+        event.wait(5)
+        return "done"
+
+    app.wsgi_app.add_url_rule("/slow", "slow", slow, cache=10)
+    cache = app.wsgi_app.caches.caches["sync.slow"]
+    executor, busy = app.wsgi_app.executor, []
+    submit = executor.submit
+
+    def counting_submit(*args, **kwargs):
+        busy.append(1)
+        future = submit(*args, **kwargs)
+        future.add_done_callback(lambda _: busy.pop())
+        return future
+
+    executor.submit = counting_submit
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+            requests = [asyncio.ensure_future(client.get("/slow")) for _ in range(5)]
+            for _ in range(500):
+                if cache.coalesced == 4:
+                    break
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.05)
+            # the other misses wait on the event loop, only the first one holds a thread
+            occupancy = len(busy)
+            event.set()
+            return occupancy, await asyncio.gather(*requests)
+
+    occupancy, responses = asyncio.run(main())
+    assert occupancy == 1
+    assert [response.text for response in responses] == ["done"] * 5
+    assert len(calls) == 1
+    assert (cache.misses, cache.coalesced, cache.hits) == (1, 4, 4)
+
+
+def test_sync_miss_answered_by_a_middleware(make_app):
+    app = make_app()
+    calls = []
+
+    def view(request):
+        calls.append(1)
+        return "view"
+
+    app.wsgi_app.add_url_rule("/guarded", "guarded", view, cache=10, middlewares=[Deny])
+    cache = app.wsgi_app.caches.caches["sync.guarded"]
+    client = TestClient(app)
+    assert client.get("/guarded?deny=1").status_code == 403
+    # the claim of the miss is released
+    assert cache.inflight == {}
+    assert client.get("/guarded").text == "view"
+    assert client.get("/guarded").text == "view" and len(calls) == 1
+
+
+def test_async_cache(make_app):
+    app = make_app()
+    event, calls = asyncio.Event(), []
+
+    @app.asgi_app.route("/slow", cache=10)
+    async def slow(request):
+        calls.append(request.headers.get("accept-language"))
+        await event.wait()
+        return request.headers.get("accept-language", ""), {"Vary": "Accept-Language"}
+
+    cache = app.asgi_app.caches.caches["async.slow"]
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+            requests = [asyncio.ensure_future(client.get("/slow")) for _ in range(3)]
+            for _ in range(500):
+                if cache.coalesced == 2:
+                    break
+                await asyncio.sleep(0.01)
+            event.set()
+            responses = await asyncio.gather(*requests)
+            responses.append(await client.get("/slow"))
+            responses.append(await client.get("/slow", headers={"accept-language": "fr"}))
+            responses.append(await client.get("/slow", headers={"cookie": "a=1"}))
+            return responses
+
+    responses = asyncio.run(main())
+    assert [response.text for response in responses] == ["", "", "", "", "fr", ""]
+    assert calls == [None, "fr", None]
+    assert responses[3].headers["age"] == "0"
+    assert (cache.misses, cache.coalesced, cache.hits) == (2, 2, 1)
+
+
+def test_lru_and_ttl():
+    cache = ResponseCache("test", ttl=10, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set((key,), CachedResponse(200, [], key.encode(), 10))
+    assert cache.get(("a",)) is None and cache.get(("c",)).body == b"c"
+    cache.set(("d",), CachedResponse(200, [], b"d", -1))
+    assert cache.get(("d",)) is None
+    assert (cache.evictions, cache.expirations) == (2, 1)
+
+
+def test_registry_options():
+    registry = ResponseCacheRegistry({"ttl": 5})
+    assert registry.get("e", {}) is None and registry.get("e", {"cache": False}) is None
+    assert registry.get("e", {"cache": True}).ttl == 5
+    assert registry.get("e", {"cache": 30}).ttl == 30
+    cache = registry.get("e", {"cache": {"max_entries": 3, "vary": ["X-A"]}})
+    assert (cache.ttl, cache.max_entries, cache.vary) == (5, 3, (b"x-a",))
+
+
+@pytest.fixture
+def etag_client(make_app, sync_dispatch):
+    app = make_app(sync_dispatch=sync_dispatch)
+    app.calls = []
+
+    def data(request):
+        return {"rows": [1, 2, 3]}
+
+    def versioned(request, uid):
+        app.calls.append(uid)
+        return {"uid": uid}
+
+    def stream(request):
+        return iter([b"a", b"b"])
+
+    async def async_data(request):
+        return {"rows": [1, 2, 3]}
+
+    async def async_versioned(request):
+        app.calls.append("async")
+        return "hello"
+
+    async def version(request):
+        return 'v"42'
+
+    app.wsgi_app.add_url_rule("/data", "data", data, etag=True)
+    app.wsgi_app.add_url_rule("/versioned/<int:uid>", "versioned", versioned, etag=lambda request, uid: 'u%d"7' % uid)
+    app.wsgi_app.add_url_rule("/stream", "stream", stream, etag=True)
+    app.wsgi_app.add_url_rule("/cached", "cached", data, etag=True, cache=10)
+    app.asgi_app.route("/async/data", etag=True)(async_data)
+    app.asgi_app.route("/async/versioned", etag=version)(async_versioned)
+    client = TestClient(app)
+    client.calls = app.calls
+    return client
+
+
+@pytest.mark.parametrize("path", ["/data", "/cached", "/async/data"])
+def test_etag_of_the_body(etag_client, path):
+    response = etag_client.get(path)
+    etag = response.headers["etag"]
+    assert response.status_code == 200 and etag.startswith('"')
+    assert etag_client.get(path).headers["etag"] == etag
+    for if_none_match in (etag, '"nope", %s' % etag, "W/%s" % etag, "*"):
+        response = etag_client.get(path, headers={"if-none-match": if_none_match})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        assert "content-type" not in response.headers and "content-length" not in response.headers
+    assert etag_client.get(path, headers={"if-none-match": '"nope"'}).status_code == 200
+
+
+def test_version_etag_skips_the_view(etag_client):
+    # a version with a '"' still makes a valid tag
+    response = etag_client.get("/versioned/3")
+    etag = response.headers["etag"]
+    assert (response.status_code, response.json()) == (200, {"uid": 3})
+    assert etag_client.get("/versioned/3", headers={"if-none-match": etag}).status_code == 304
+    assert etag_client.get("/versioned/4", headers={"if-none-match": etag}).status_code == 200
+    assert etag_client.calls == [3, 4]
+
+    etag = etag_client.get("/async/versioned").headers["etag"]
+    response = etag_client.get("/async/versioned", headers={"if-none-match": etag})
+    assert (response.status_code, response.headers["etag"]) == (304, etag)
+    assert etag_client.calls.count("async") == 1
+
+
+def test_no_etag_for_streams_and_posts(etag_client):
+    assert "etag" not in etag_client.get("/stream").headers
+    assert "etag" not in etag_client.post("/data").headers
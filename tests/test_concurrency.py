@@ -0,0 +1,166 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from nuxt.app import ASGIBlueprint, WSGIBlueprint
+from nuxt.concurrency import AdaptiveThreadPoolExecutor, Bulkhead, BulkheadRegistry, inherit_bulkhead_options
+
+
+async def wait_for(predicate) -> None:
+    for _ in range(500):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+async def fetch_while_held(app, path: str, bulkhead: Bulkhead, count: int, release) -> list:
+    """
+    Send ``count`` requests once the first one holds the bulkhead, release it when
+    the others are queued or shed and return the responses in sending order.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        first = asyncio.ensure_future(client.get(path))
+        await wait_for(lambda: bulkhead.running == 1)
+        others = [asyncio.ensure_future(client.get(path)) for _ in range(count - 1)]
+        await wait_for(lambda: bulkhead.waiting + bulkhead.shed == count - 1)
+        release()
+        return await asyncio.gather(first, *others)
+
+
+def test_bulkhead_queue_limit():
+    async def main():
+        bulkhead = Bulkhead("test", max_concurrency=1, max_queue=1)
+        assert await bulkhead.acquire()
+        queued = asyncio.ensure_future(bulkhead.acquire())
+        await asyncio.sleep(0)
+        assert bulkhead.waiting == 1
+        assert not await bulkhead.acquire()
+        bulkhead.release()
+        assert await queued
+        assert bulkhead.stats() == {"max_concurrency": 1, "max_queue": 1, "running": 1, "waiting": 0, "shed": 1}
+
+    asyncio.run(main())
+
+
+def test_registry_pools():
+    registry = BulkheadRegistry({"reports": {"max_concurrency": 2, "max_queue": 4}}, thread_pool=True)
+    assert registry.get("sync.index", {}) is None
+    bulkhead = registry.get("sync.report", {"pool": "reports", "retry_after": 9})
+    assert (bulkhead.name, bulkhead.max_concurrency, bulkhead.max_queue, bulkhead.retry_after) == ("reports", 2, 4, 9)
+    assert bulkhead.executor._max_workers == 2
+    assert registry.get("sync.other", {"pool": "reports"}) is bulkhead
+    assert registry.get("sync.own", {"max_concurrency": 1}).name == "sync.own"
+
+
+def test_inherit_bulkhead_options():
+    defaults = {"max_concurrency": 3, "max_queue": 0}
+    assert inherit_bulkhead_options({}, defaults, "bp") == {"pool": "bp", "max_concurrency": 3, "max_queue": 0}
+    assert inherit_bulkhead_options({"pool": "own"}, defaults, "bp") == {"pool": "own"}
+    assert inherit_bulkhead_options({}, {}, "bp") == {}
+
+
+def test_async_route_sheds_with_503(make_app):
+    app = make_app()
+    event = asyncio.Event()
+
+    @app.asgi_app.route("/slow", max_concurrency=1, max_queue=0, retry_after=5)
+    async def slow(request):
+        await event.wait()
+        return "ok"
+
+    bulkhead = app.asgi_app.bulkheads.bulkheads["async.slow"]
+    first, second = asyncio.run(fetch_while_held(app, "/slow", bulkhead, 2, event.set))
+    assert (first.status_code, first.text) == (200, "ok")
+    assert second.status_code == 503
+    assert second.headers["retry-after"] == "5"
+
+
+def test_sync_pool_queues_then_sheds(make_app, sync_dispatch):
+    app = make_app(sync_dispatch=sync_dispatch, pools={"reports": {"max_concurrency": 1, "max_queue": 1}})
+    event = threading.Event()
+
+    @app.wsgi_app.route("/report", pool="reports")
+    def report(request):
+        event.wait(5)
+        return "ok"
+
+    bulkhead = app.wsgi_app.bulkheads.bulkheads["reports"]
+    responses = asyncio.run(fetch_while_held(app, "/report", bulkhead, 3, event.set))
+    assert sorted(response.status_code for response in responses) == [200, 200, 503]
+    assert bulkhead.shed == 1
+
+
+def test_blueprint_bulkheads(make_app):
+    app = make_app()
+    event, sync_event = asyncio.Event(), threading.Event()
+    bp = ASGIBlueprint("abp")
+
+    @bp.route("/x")
+    async def x(request):
+        await event.wait()
+        return "ok"
+
+    app.asgi_app.register_blueprint(bp, url_prefix="/abp", max_concurrency=1, max_queue=0)
+    sbp = WSGIBlueprint("sbp")
+
+    @sbp.route("/y")
+    def y(request):
+        sync_event.wait(5)
+        return "ok"
+
+    app.wsgi_app.register_blueprint(sbp, url_prefix="/sbp", max_concurrency=1, max_queue=0)
+
+    bulkhead = app.asgi_app.bulkheads.bulkheads["abp"]
+    responses = asyncio.run(fetch_while_held(app, "/abp/x", bulkhead, 2, event.set))
+    assert [response.status_code for response in responses] == [200, 503]
+    bulkhead = app.wsgi_app.bulkheads.bulkheads["sbp"]
+    responses = asyncio.run(fetch_while_held(app, "/sbp/y", bulkhead, 2, sync_event.set))
+    assert [response.status_code for response in responses] == [200, 503]
+
+
+def wait_until(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_adaptive_pool_grows_and_shrinks():
+    executor = AdaptiveThreadPoolExecutor(min_workers=1, max_workers=4, target_wait=0.001, interval=0.05)
+    try:
+        event = threading.Event()
+        futures = [executor.submit(event.wait, 5) for _ in range(8)]
+        # saturated with a backlog, the controller grows up to max_workers
+        assert wait_until(lambda: executor.size == 4)
+        event.set()
+        assert [future.result(5) for future in futures] == [True] * 8
+        # idle, one thread is retired per interval down to min_workers
+        assert wait_until(lambda: executor.size == 1)
+        assert wait_until(lambda: len(executor._threads) == 1)
+        assert executor.submit(lambda: 42).result(5) == 42
+        stats = executor.stats()
+        assert (stats["size"], stats["min_workers"], stats["max_workers"]) == (1, 1, 4)
+    finally:
+        executor.shutdown()
+
+
+def test_adaptive_pool_shutdown():
+    executor = AdaptiveThreadPoolExecutor(min_workers=2, max_workers=2)
+    assert executor.submit(sum, [1, 2]).result(5) == 3
+    executor.shutdown()
+    assert executor.size == 0
+    with pytest.raises(RuntimeError):
+        executor.submit(sum, [1])
+
+
+def test_adaptive_executor_config(make_app):
+    app = make_app(executor={"adaptive": True, "min_workers": 1, "max_workers": 3})
+    assert isinstance(app.wsgi_app.executor, AdaptiveThreadPoolExecutor)
+    assert (app.wsgi_app.executor.min_workers, app.wsgi_app.executor.max_workers) == (1, 3)
@@ -0,0 +1,137 @@
+import asyncio
+
+from starlette.testclient import TestClient
+from werkzeug.exceptions import NotFound
+
+from nuxt.responses import SyncResponse
+
+
+def make_client(make_app, sync_dispatch):
+    app = make_app(sync_dispatch=sync_dispatch)
+
+    @app.wsgi_app.route("/users/<int:uid>", methods=["GET", "POST"])
+    def user(request, uid):
+        return {"uid": uid, "args": request.args.to_dict(), "json": request.get_json(silent=True),
+                "path": request.path, "host": request.host}
+
+    @app.wsgi_app.route("/lines")
+    def lines(request):
+        def generate():
+            for i in range(3):
+                yield "line%d\n" % i
+
+        return SyncResponse(generate(), mimetype="text/csv")
+
+    @app.wsgi_app.route("/error")
+    def error(request):
+        raise ValueError("boom")
+
+    @app.wsgi_app.route("/missing")
+    def missing(request):
+        raise NotFound()
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_json_view(make_app, sync_dispatch):
+    client = make_client(make_app, sync_dispatch)
+    response = client.post("/users/3?a=1", json={"x": 1})
+    assert response.status_code == 200
+    assert response.json() == {"uid": 3, "args": {"a": "1"}, "json": {"x": 1}, "path": "/users/3", "host": "testserver"}
+    assert response.headers["content-length"] == str(len(response.content))
+
+
+def test_head_has_no_body(make_app, sync_dispatch):
+    client = make_client(make_app, sync_dispatch)
+    response = client.head("/users/3")
+    assert response.status_code == 200
+    assert response.content == b""
+
+
+def test_streamed_view(make_app, sync_dispatch):
+    client = make_client(make_app, sync_dispatch)
+    response = client.get("/lines")
+    assert response.text == "line0\nline1\nline2\n"
+    assert response.headers["content-type"].startswith("text/csv")
+
+
+def test_errors(make_app, sync_dispatch):
+    client = make_client(make_app, sync_dispatch)
+    assert client.get("/error").status_code == 500
+    assert client.get("/missing").status_code == 404
+    assert client.get("/nope").status_code == 404
+
+
+def test_native_sequence_body_is_encoded_once(make_app, asgi_request):
+    app = make_app(sync_dispatch="native")
+    encoded = []
+
+    class CountingResponse(SyncResponse):
+        def iter_encoded(self):
+            encoded.append(1)
+            return super().iter_encoded()
+
+    @app.wsgi_app.route("/")
+    def index(request):
+        return CountingResponse("hello")
+
+    status, headers, messages = asgi_request(app)
+    assert status == 200
+    assert (b"content-length", b"5") in headers
+    assert [message["body"] for message in messages] == [b"hello"]
+    assert len(encoded) == 1
+
+
+def test_werkzeug_header_fixups(make_app, sync_dispatch):
+    app = make_app(sync_dispatch=sync_dispatch)
+
+    @app.wsgi_app.route("/not-modified")
+    def not_modified(request):
+        return SyncResponse("hello", status=304, headers={"ETag": '"a"'})
+
+    @app.wsgi_app.route("/moved")
+    def moved(request):
+        return SyncResponse("", status=302, headers={"Location": "/target"})
+
+    client = TestClient(app)
+    response = client.get("/not-modified")
+    assert response.status_code == 304 and response.headers["etag"] == '"a"'
+    assert "content-type" not in response.headers and "content-length" not in response.headers
+    response = client.get("/moved", follow_redirects=False)
+    assert response.headers["location"] == "/target"
+
+
+def test_head_has_the_content_length(make_app, sync_dispatch):
+    client = make_client(make_app, sync_dispatch)
+    length = client.get("/users/3").headers["content-length"]
+    response = client.head("/users/3")
+    assert (response.headers["content-length"], response.content) == (length, b"")
+
+
+def test_disconnect_during_the_body(make_app):
+    app = make_app(sync_dispatch="native")
+    calls = []
+
+    @app.wsgi_app.route("/upload", methods=["POST"])
+    def upload(request):
+        calls.append(request.get_data())
+        return "ok"
+
+    messages = [{"type": "http.request", "body": b"part", "more_body": True}, {"type": "http.disconnect"}]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/upload", "raw_path": b"/upload", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver"), (b"content-length", b"100")], "client": ("127.0.0.1", 1),
+        "server": ("testserver", 80),
+    }
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    # the view is not run with a truncated body
+    assert (calls, sent) == ([], [])
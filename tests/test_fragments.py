@@ -0,0 +1,136 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from jinja2 import DictLoader, Environment
+
+from nuxt.fragments import FileSystemFragmentBackend, FragmentCache, FragmentCacheExtension
+from nuxt.templating import get_fragment_cache, render_template, render_template_async
+
+TEMPLATES = {
+    "nav.html": "{% cache 'user' ~ uid %}{{ load() }}{% endcache %}|{% cache 'short', 0 %}{{ load() }}{% endcache %}",
+}
+
+
+class ThreadRecorder(FileSystemFragmentBackend):
+
+    def __init__(self, directory: str) -> None:
+        super().__init__(directory)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.current_thread())
+        return super().get(key)
+
+    def set(self, key, value, ttl):
+        self.threads.append(threading.current_thread())
+        super().set(key, value, ttl)
+
+
+@pytest.fixture
+def load():
+    def load():
+        load.calls += 1
+        return "<nav%d>" % load.calls
+
+    load.calls = 0
+    return load
+
+
+def make_env(cache: FragmentCache, enable_async: bool = False) -> Environment:
+    env = Environment(loader=DictLoader(TEMPLATES), extensions=[FragmentCacheExtension], enable_async=enable_async,
+                      autoescape=True)
+    env.fragment_cache = cache
+    return env
+
+
+def test_lru_and_ttl():
+    cache = FragmentCache(ttl=10, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (None, "b", "c")
+    cache.set("d", "d", ttl=-1)
+    assert cache.get("d") is None
+    assert cache.stats() == {"entries": 1, "max_entries": 2, "hits": 2, "shared_hits": 0, "misses": 2,
+                             "evictions": 2, "expirations": 1}
+
+
+def test_cache_tag(load):
+    cache = FragmentCache()
+    template = make_env(cache).get_template("nav.html")
+    assert template.render(uid=1, load=load) == "&lt;nav1&gt;|&lt;nav2&gt;"
+    # the cached fragment is not escaped again, a ttl of 0 is not replayed
+    assert template.render(uid=1, load=load) == "&lt;nav1&gt;|&lt;nav3&gt;"
+    assert template.render(uid=2, load=load) == "&lt;nav4&gt;|&lt;nav5&gt;"
+    assert sorted(cache.entries) == ["nav.html:short", "nav.html:user1", "nav.html:user2"]
+
+
+def test_cache_tag_async(load, tmp_path):
+    cache = FragmentCache(backend=ThreadRecorder(str(tmp_path)))
+    template = make_env(cache, enable_async=True).get_template("nav.html")
+
+    async def render():
+        first = await template.render_async(uid=1, load=load)
+        second = await template.render_async(uid=1, load=load)
+        return first, second
+
+    assert asyncio.run(render()) == ("&lt;nav1&gt;|&lt;nav2&gt;", "&lt;nav1&gt;|&lt;nav3&gt;")
+    # the backend IO is kept off the event loop
+    assert cache.backend.threads and threading.main_thread() not in cache.backend.threads
+
+
+def test_shared_backend(tmp_path, load):
+    first, second = FragmentCache(directory=str(tmp_path)), FragmentCache(directory=str(tmp_path))
+    first_env, second_env = make_env(first), make_env(second)
+    assert first_env.get_template("nav.html").render(uid=1, load=load) == "&lt;nav1&gt;|&lt;nav2&gt;"
+    # another worker with the same directory
+    assert second_env.get_template("nav.html").render(uid=1, load=load) == "&lt;nav1&gt;|&lt;nav3&gt;"
+    assert second.stats()["shared_hits"] == 1
+    assert second.get("nav.html:user1") == "&lt;nav1&gt;"
+    assert second.stats()["hits"] == 1
+    second.clear()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("__fragment_")]
+    assert first.get("nav.html:user1") == "&lt;nav1&gt;"
+    assert second.get("nav.html:user1") is None
+
+
+def test_expired_file_is_left_to_writers(tmp_path):
+    backend = FileSystemFragmentBackend(str(tmp_path))
+    backend.set("key", "old", -1)
+    path = backend.path("key")
+    assert backend.get("key") is None
+    assert os.path.exists(path)
+    backend.set("key", "new", 10)
+    value, ttl = backend.get("key")
+    assert value == "new" and 9 < ttl <= 10
+    assert sorted(os.listdir(tmp_path)) == [os.path.basename(path)]
+
+
+def test_async_methods(tmp_path):
+    cache = FragmentCache(backend=ThreadRecorder(str(tmp_path)))
+
+    async def main():
+        await cache.set_async("key", "value")
+        cache.entries.clear()
+        return await cache.get_async("key"), await cache.get_async("key"), await cache.get_async("missing")
+
+    assert asyncio.run(main()) == ("value", "value", None)
+    assert (cache.hits, cache.shared_hits, cache.misses) == (1, 1, 1)
+    assert len(cache.backend.threads) == 3 and threading.main_thread() not in cache.backend.threads
+
+
+def test_template_config(template_app, tmp_path, monkeypatch, load):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "templates" / "nav.html").write_text(TEMPLATES["nav.html"])
+    template_app(template={"path": "templates", "fragment_cache": {"ttl": 60, "max_entries": 5}})
+    cache = get_fragment_cache()
+    assert (cache.ttl, cache.max_entries, cache.backend) == (60, 5, None)
+    assert render_template(None, "nav.html", uid=1, load=load) == "<nav1>|<nav2>"
+    # shared by the sync and async environments
+    rendered = asyncio.run(render_template_async(None, "nav.html", "async", uid=1, load=load))
+    assert rendered == "<nav1>|<nav3>"
+    expires = cache.entries["nav.html:user1"][1]
+    assert 59 < expires - time.monotonic() <= 60
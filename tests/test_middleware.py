@@ -0,0 +1,181 @@
+import pytest
+from starlette.testclient import TestClient
+
+from nuxt.app import WSGIBlueprint
+
+
+class Recorder:
+    log = []
+
+    def __init__(self, get_response, app=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        self.log.append("%s call" % self.name)
+        response = self.get_response(request)
+        self.log.append("%s done" % self.name)
+        return response
+
+
+class Outer(Recorder):
+    name = "outer"
+
+    def process_view(self, request, callback, kwargs):
+        self.log.append("outer view %s %s" % (callback.__name__, sorted(kwargs)))
+
+    def process_exception(self, request, exception):
+        self.log.append("outer exception %r" % exception)
+        if isinstance(exception, LookupError):
+            return {"handled": str(exception)}
+
+
+class Scoped(Recorder):
+    name = "scoped"
+
+    def process_exception(self, request, exception):
+        self.log.append("scoped exception %r" % exception)
+        if isinstance(exception, KeyError):
+            return "scoped", 418
+
+
+class Deny:
+
+    def __init__(self, get_response, app=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, callback, kwargs):
+        if request.args.get("deny"):
+            return {"denied": True}
+
+
+class Wrap:
+
+    def __init__(self, get_response, app=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        except ValueError as error:
+            raise RuntimeError("wrapped") from error
+
+
+SHARED = IndexError("shared")
+
+
+class Broken:
+
+    def __init__(self, get_response, app=None):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        raise KeyError("middleware")
+
+
+@pytest.fixture
+def client(make_app, sync_dispatch):
+    Recorder.log.clear()
+    app = make_app(sync_dispatch=sync_dispatch, middlewares={"sync": [Outer], "async": []})
+
+    @app.wsgi_app.route("/plain/<int:x>")
+    def plain(request, x):
+        return {"x": x}
+
+    @app.wsgi_app.route("/guarded", middlewares=[Deny])
+    def guarded(request):
+        return {"ok": True}
+
+    @app.wsgi_app.route("/boom")
+    def boom(request):
+        raise ValueError("boom")
+
+    @app.wsgi_app.route("/scoped/<name>", middlewares=[Scoped])
+    def scoped(request, name):
+        raise {"key": KeyError, "index": IndexError, "value": ValueError}[name](name)
+
+    @app.wsgi_app.route("/shared", middlewares=[Scoped])
+    def shared(request):
+        raise SHARED
+
+    @app.wsgi_app.route("/wrapped", middlewares=[Scoped, Wrap])
+    def wrapped(request):
+        raise ValueError("inner")
+
+    @app.wsgi_app.route("/broken", middlewares=[Scoped, Broken])
+    def broken(request):
+        return "unreachable"
+
+    bp = WSGIBlueprint("bp")
+
+    @bp.route("/v/<name>")
+    def view(request, name):
+        return {"name": name}
+
+    @bp.route("/g", middlewares=[Deny])
+    def bp_guarded(request):
+        return {"g": 1}
+
+    app.wsgi_app.register_blueprint(bp, url_prefix="/bp", middlewares=[Scoped])
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_global_middlewares(client):
+    assert client.get("/plain/3").json() == {"x": 3}
+    assert Recorder.log == ["outer call", "outer view plain ['x']", "outer done"]
+
+
+def test_route_process_view_short_circuits(client):
+    assert client.get("/guarded").json() == {"ok": True}
+    assert client.get("/guarded?deny=1").json() == {"denied": True}
+
+
+def test_global_process_exception(client):
+    assert client.get("/boom").status_code == 500
+    assert Recorder.log == ["outer call", "outer view boom []", "outer exception ValueError('boom')", "outer done"]
+
+
+def test_scoped_process_exception_runs_once(client):
+    response = client.get("/scoped/key")
+    assert (response.status_code, response.text) == (418, "scoped")
+    assert Recorder.log.count("scoped exception KeyError('key')") == 1
+
+    Recorder.log.clear()
+    # unhandled by the scope, handled by the global middleware
+    assert client.get("/scoped/index").json() == {"handled": "index"}
+    assert Recorder.log.count("scoped exception IndexError('index')") == 1
+    assert Recorder.log.count("outer exception IndexError('index')") == 1
+
+    Recorder.log.clear()
+    assert client.get("/scoped/value").status_code == 500
+    assert Recorder.log.count("scoped exception ValueError('value')") == 1
+
+
+def test_exception_raised_again(client):
+    # the same instance on every request
+    for _ in range(2):
+        assert client.get("/shared").json() == {"handled": "shared"}
+    assert Recorder.log.count("scoped exception IndexError('shared')") == 2
+    assert "__nuxt_handled_by__" not in SHARED.__dict__
+
+
+def test_exception_wrapped_by_a_middleware(client):
+    assert client.get("/wrapped").status_code == 500
+    assert Recorder.log.count("scoped exception ValueError('inner')") == 1
+    assert Recorder.log.count("scoped exception RuntimeError('wrapped')") == 1
+
+
+def test_scoped_middleware_exception(client):
+    # raised by a middleware of the scope, not by dispatch_view
+    response = client.get("/broken")
+    assert (response.status_code, response.text) == (418, "scoped")
+    assert Recorder.log.count("scoped exception KeyError('middleware')") == 1
+
+
+def test_blueprint_scope(client):
+    assert client.get("/bp/v/n").json() == {"name": "n"}
+    assert Recorder.log == ["outer call", "outer view view ['name']", "scoped call", "scoped done", "outer done"]
+    assert client.get("/bp/g?deny=1").json() == {"denied": True}
+    assert client.get("/bp/g").json() == {"g": 1}
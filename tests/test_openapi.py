@@ -0,0 +1,275 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import marshmallow as ma
+import pytest
+import yaml
+from click.testing import CliRunner
+from starlette.testclient import TestClient
+
+from nuxt import openapi, utils
+from nuxt.asyncio.repositorys import validation as async_validation
+from nuxt.commands import cli
+from nuxt.openapi import SchemaGenerator
+from nuxt.repositorys.validation import fields, use_args, use_kwargs
+
+EXPORTED_APP = '''
+import nuxt
+from nuxt.asyncio import route as aroute
+
+
+@nuxt.route("/items/<int:iid>")
+def item(request, iid):
+    """
+    summary: an item
+    """
+
+
+@aroute("/ping")
+async def ping(request):
+    """
+    summary: ping
+    """
+'''
+
+
+def wait_until(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def docs(tmp_path):
+    path = tmp_path / "api.yaml"
+    path.write_text("hello:\n  summary: v1\n")
+    return path
+
+
+@pytest.fixture
+def app(make_app, docs):
+    app = make_app()
+
+    async def hello(request):
+        return "hi"
+
+    hello.__doc__ = "\n    __doc__: %s\n    __ref__: hello\n    " % docs
+
+    def sync(request):
+        """
+        summary: sync
+        """
+        return "x"
+
+    app.asgi_app.route("/hello")(hello)
+    app.wsgi_app.add_url_rule("/sync/<int:uid>", "sync", sync)
+    app.schema = SchemaGenerator({"openapi": "3.0.0", "info": {"title": "t", "version": "1"}})
+    app.routes.extend(app.schema.routes())
+    return app
+
+
+def test_schema_is_cached(app):
+    client = TestClient(app)
+    response = client.get("/docs/openapi")
+    assert response.headers["content-type"].startswith("text/yaml")
+    paths = yaml.safe_load(response.text)["paths"]
+    assert paths["/hello"]["get"]["summary"] == "v1"
+    assert paths["/sync/{uid}"]["get"]["summary"] == "sync"
+    etag = response.headers["etag"]
+    assert client.get("/docs/openapi").content == response.content
+    for if_none_match in (etag, "W/%s" % etag):
+        response = client.get("/docs/openapi", headers={"if-none-match": if_none_match})
+        assert (response.status_code, response.content, response.headers["etag"]) == (304, b"", etag)
+    assert app.schema.builds == 1
+
+
+def test_route_change_rebuilds(app):
+    client = TestClient(app)
+    etag = client.get("/docs/openapi").headers["etag"]
+
+    async def new(request):
+        """
+        summary: new
+        """
+
+    app.asgi_app.route("/new")(new)
+    response = client.get("/docs/openapi", headers={"if-none-match": etag})
+    assert response.status_code == 200
+    assert "/new" in yaml.safe_load(response.text)["paths"]
+    assert app.schema.builds == 2
+    # a replaced route keeps the size of the table
+    app.routes[-1] = app.routes[-1]
+    client.get("/docs/openapi")
+    assert app.schema.builds == 3
+    app.schema.invalidate()
+    client.get("/docs/openapi")
+    client.get("/docs/openapi")
+    assert app.schema.builds == 4
+
+
+def test_doc_change_without_inotify(app, docs, monkeypatch):
+    monkeypatch.setattr(openapi, "has_inotify", False)
+    monkeypatch.setattr(openapi, "DOCS_REVALIDATE", 0)
+    client = TestClient(app)
+    client.get("/docs/openapi")
+    client.get("/docs/openapi")
+    assert (app.schema.builds, app.schema.watched_dirs) == (1, set())
+    docs.write_text("hello:\n  summary: v2\n")
+    mtime = os.path.getmtime(docs) + 10
+    os.utime(docs, (mtime, mtime))
+    response = client.get("/docs/openapi")
+    assert yaml.safe_load(response.text)["paths"]["/hello"]["get"]["summary"] == "v2"
+    assert app.schema.builds == 2
+
+
+@pytest.mark.skipif(not openapi.has_inotify, reason="inotify is not available")
+def test_doc_change_with_inotify(app, docs):
+    client = TestClient(app)
+    client.get("/docs/openapi")
+    assert app.schema.watched_dirs == {str(docs.parent)}
+    version = app.schema.docs_version
+    docs.write_text("hello:\n  summary: v2\n")
+    assert wait_until(lambda: app.schema.docs_version > version)
+    response = client.get("/docs/openapi")
+    assert yaml.safe_load(response.text)["paths"]["/hello"]["get"]["summary"] == "v2"
+    assert app.schema.builds == 2
+
+
+def test_concurrent_misses_build_once(app):
+    routes = app.routes
+    version = app.schema.routes_version(routes)
+    with ThreadPoolExecutor(5) as executor:
+        results = list(executor.map(lambda _: app.schema.build(routes, version), range(5)))
+    assert app.schema.builds == 1
+    assert all(result is results[0] for result in results)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch, global_app):
+    (tmp_path / "exported_app.py").write_text(EXPORTED_APP)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PWD", str(tmp_path))
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    yield tmp_path
+    sys.modules.pop("exported_app", None)
+
+
+def test_export(project):
+    runner = CliRunner()
+    result = runner.invoke(cli, ["openapi", "export", "--module", "exported_app.py"])
+    assert result.exit_code == 0, result.output
+    paths = yaml.safe_load(result.stdout)["paths"]
+    assert paths["/items/{iid}"]["get"]["summary"] == "an item"
+    assert paths["/ping"]["get"]["summary"] == "ping"
+
+    sys.modules.pop("exported_app")
+    result = runner.invoke(cli, ["openapi", "export", "--module", "exported_app", "--output", "openapi.json"])
+    assert result.exit_code == 0, result.output
+    assert result.stderr == "2 paths written to openapi.json\n"
+    with open(project / "openapi.json", encoding="utf-8") as fd:
+        schema = json.load(fd)
+    assert schema["openapi"] == "3.0.0" and set(schema["paths"]) == {"/items/{iid}", "/ping"}
+    assert not (project / "openapi.json.tmp").exists()
+
+
+def test_schema_file_is_served_as_is(make_app, tmp_path):
+    schema_file = tmp_path / "openapi.json"
+    schema_file.write_text('{"openapi": "3.0.0", "paths": {"/prebuilt": {}}}')
+    app = make_app()
+
+    def undocumented(request):
+        """
+        summary: not parsed
+        """
+
+    app.wsgi_app.add_url_rule("/x", "x", undocumented)
+    schema = SchemaGenerator({"openapi": "3.0.0"}, schema_file=str(schema_file))
+    app.routes.extend(schema.routes())
+    client = TestClient(app)
+    response = client.get("/docs/openapi")
+    assert response.headers["content-type"] == "application/json"
+    assert response.content == schema_file.read_bytes()
+    response = client.get("/docs/openapi", headers={"if-none-match": response.headers["etag"]})
+    assert response.status_code == 304
+    assert (schema.builds, schema.refs) == (0, {})
+
+
+class Body(ma.Schema):
+    name = fields.Str(required=True)
+    tags = fields.List(fields.Str())
+
+
+class Filters(ma.Schema):
+    zone = fields.Str()
+    after = fields.Int(data_key="from")
+    active = fields.Bool(required=True)
+
+
+def test_use_args_spec_is_lazy(make_app, monkeypatch):
+    calls = []
+    convert = utils.maschema_to_apisepc
+    monkeypatch.setattr(utils, "maschema_to_apisepc", lambda *args: calls.append(args) or convert(*args))
+
+    @use_args({"iid": fields.Int(required=True)}, location="view_args")
+    @use_args(Body(), location="json")
+    def item(request, args, body):
+        """
+        summary: an item
+        """
+
+    @async_validation.use_args(Body, location="form")
+    async def form(request, args):
+        pass
+
+    assert calls == []
+    assert item.__doc__ == "\n        summary: an item\n        "
+    app = make_app()
+    app.wsgi_app.add_url_rule("/items/<int:iid>", "item", item, methods=["POST"])
+    app.asgi_app.route("/form", methods=["POST"])(form)
+    paths = SchemaGenerator({"openapi": "3.0.0"}).get_schema(app.routes)["paths"]
+    assert len(calls) == 3
+    operation = paths["/items/{iid}"]["post"]
+    assert operation["summary"] == "an item"
+    assert operation["parameters"] == [{"name": "iid", "in": "path", "required": True, "schema": {"type": "integer"}}]
+    body = operation["requestBody"]["content"]["application/json"]["schema"]
+    # the properties of an unordered schema come out in set order
+    assert (set(body["properties"]), body["required"]) == ({"name", "tags"}, ["name"])
+    assert "application/x-www-form-urlencoded" in paths["/form"]["post"]["requestBody"]["content"]
+
+
+def test_parameters_in_declaration_order(make_app):
+    @use_kwargs({"q": fields.Str(required=True), "page": fields.Int(), "b": fields.Int()}, location="query")
+    def search(request, **kwargs):
+        pass
+
+    @async_validation.use_args(Filters, location="querystring")
+    async def filtered(request, args):
+        """
+        parameters:
+          - name: x
+            in: header
+        """
+
+    app = make_app()
+    app.wsgi_app.add_url_rule("/search", "search", search)
+    app.asgi_app.route("/filtered")(filtered)
+    paths = SchemaGenerator({"openapi": "3.0.0"}).get_schema(app.routes)["paths"]
+    parameters = paths["/search"]["get"]["parameters"]
+    assert [(parameter["name"], parameter["required"]) for parameter in parameters] == [("q", True), ("page", False), ("b", False)]
+    parameters = paths["/filtered"]["get"]["parameters"]
+    assert [parameter["name"] for parameter in parameters] == ["x", "zone", "from", "active"]
+
+
+def test_spec_is_cached_by_schema_key():
+    first = utils.maschema_to_apisepc(Body, "3.0.0")
+    assert utils.maschema_to_apisepc(Body(), "3.0.0") == first
+    # a copy for each view
+    assert utils.maschema_to_apisepc(Body, "3.0.0") is not first
+    assert list(utils.maschema_to_apisepc(Body(only=["tags"]), "3.0.0")["properties"]) == ["tags"]
+    assert list(utils.maschema_to_apisepc(Body(exclude=["tags"]), "3.0.0")["properties"]) == ["name"]
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+from aiohttp import web
+from starlette.testclient import TestClient
+
+from nuxt.asyncio import mount
+from nuxt.asyncio.proxies import close_proxy_contexts, make_proxy_response, proxy_contexts
+from nuxt.asyncio.proxies.context import ProxyConfig, ProxyContext
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    """
+    An aiohttp server in its own thread, recording the client port of each request.
+    """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state = {"ports": []}
+
+    async def handler(request):
+        state["ports"].append(request.transport.get_extra_info("peername")[1])
+        return web.Response(text="up %s %s" % (request.path, request.headers["host"]))
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", handler)
+        runner = state["runner"] = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        state["url"] = "http://127.0.0.1:%d" % runner.addresses[0][1]
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    assert started.wait(5)
+    yield state
+    asyncio.run_coroutine_threadsafe(state["runner"].cleanup(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def get_context(proxy) -> ProxyContext:
+    return next(cell.cell_contents for cell in proxy.__closure__ if isinstance(cell.cell_contents, ProxyContext))
+
+
+def test_session_is_reused(global_app, upstream):
+    app = global_app(proxy={"limit_per_host": 4})
+    proxy = make_proxy_response(upstream["url"])
+    mount("/proxy", proxy)
+    context = get_context(proxy)
+    del upstream["ports"][:]
+    with TestClient(app) as client:
+        for i in range(5):
+            response = client.get("/proxy/x%d" % i)
+            assert response.text == "up /proxy/x%d %s" % (i, upstream["url"][len("http://"):])
+        session = context._session
+        assert session is not None and not session.closed
+    # the keep-alive connection of the pool is reused
+    assert len(upstream["ports"]) == 5 and len(set(upstream["ports"])) == 1
+    # and closed by the shutdown hook
+    assert session.closed and context._session is None
+
+
+def test_connector_options(global_app, upstream):
+    global_app(proxy={"limit_per_host": 4, "ttl_dns_cache": 30, "max_concurrency": 3})
+    context = get_context(make_proxy_response(upstream["url"], keepalive_timeout=30))
+    assert context.connector_options == {"limit": 100, "limit_per_host": 4, "keepalive_timeout": 30, "ttl_dns_cache": 30}
+    assert context.semaphore._value == 3
+    assert get_context(make_proxy_response(upstream["url"], max_concurrency=7)).semaphore._value == 7
+
+
+def test_shutdown_hook_is_registered_once(global_app, upstream):
+    app = global_app()
+    proxies = [make_proxy_response(upstream["url"]) for _ in range(3)]
+    assert app.shutdown_hooks.count(close_proxy_contexts) == 1
+    assert {get_context(proxy) for proxy in proxies} <= set(proxy_contexts)
+    # the launchers re-initialise entry_app before the modules make their proxies
+    app.__init__({"debug": False})
+    assert app.shutdown_hooks == []
+    make_proxy_response(upstream["url"])
+    assert app.shutdown_hooks.count(close_proxy_contexts) == 1
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_starlette_event_handlers_run(make_app, compiled):
+    app = make_app(router={"compiled": compiled})
+    calls = []
+    app.base_app.add_event_handler("startup", lambda: calls.append("starlette startup"))
+    app.base_app.add_event_handler("shutdown", lambda: calls.append("starlette shutdown"))
+    app.on_startup(lambda: calls.append("startup"))
+
+    @app.on_shutdown
+    async def shutdown():
+        calls.append("shutdown")
+
+    with TestClient(app):
+        assert calls == ["starlette startup", "startup"]
+    assert calls == ["starlette startup", "startup", "shutdown", "starlette shutdown"]
+
+
+def test_session_of_a_closed_loop(caplog):
+    context = ProxyContext(type("Config", (ProxyConfig,), {})())
+
+    async def open_session():
+        return context.session
+
+    first = asyncio.run(open_session())
+    with caplog.at_level(logging.WARNING, logger="nuxt.asyncio.proxies.context"):
+        second = asyncio.run(open_session())
+    assert second is not first and context._session is second
+    assert "event loop is not running" in caplog.text
+    asyncio.run(context.close())
+    assert context._session is None
+
+
+def test_session_is_closed_on_its_running_loop():
+    context = ProxyContext(type("Config", (ProxyConfig,), {})())
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    async def open_session():
+        return context.session
+
+    try:
+        session = asyncio.run_coroutine_threadsafe(open_session(), loop).result(5)
+        # closed from another loop
+        asyncio.run(context.close())
+        assert context._session is None
+        deadline = time.monotonic() + 5
+        while not session.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert session.closed
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(5)
+        loop.close()
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from nuxt.app import ASGIBlueprint, WSGIBlueprint
+
+MULTIPART = (
+    b'--XyZ\r\nContent-Disposition: form-data; name="x"\r\n\r\n1\r\n'
+    b'--XyZ\r\nContent-Disposition: form-data; name="f"; filename="a.bin"\r\n'
+    b"Content-Type: application/octet-stream\r\n\r\n" + b"z" * 3000 + b"\r\n--XyZ--\r\n"
+)
+
+
+@pytest.fixture
+def app(make_app, sync_dispatch):
+    app = make_app(sync_dispatch=sync_dispatch, request_body={"max_size": 1000, "spool_size": 100})
+    app.seen = {}
+
+    def upload(request):
+        app.seen["body"] = getattr(request, "body", None)
+        return {"len": len(request.get_data())}
+
+    def form(request):
+        upload = request.files["f"]
+        return {"name": upload.filename, "len": len(upload.read()), "x": request.form["x"]}
+
+    app.wsgi_app.add_url_rule("/upload", "upload", upload, methods=["POST"])
+    app.wsgi_app.add_url_rule("/big", "big", upload, methods=["POST"], max_body_size=5000)
+    app.wsgi_app.add_url_rule("/form", "form", form, methods=["POST"], max_body_size=None)
+    bp = WSGIBlueprint("sbp")
+    bp.route("/x", methods=["POST"])(lambda request: {"len": len(request.get_data())})
+    app.wsgi_app.register_blueprint(bp, url_prefix="/sbp", max_body_size=10)
+
+    async def async_upload(request):
+        return {"len": len(await request.body())}
+
+    app.asgi_app.route("/async", methods=["POST"])(async_upload)
+    abp = ASGIBlueprint("abp")
+    abp.route("/y", methods=["POST"], max_body_size=3000)(async_upload)
+    app.asgi_app.register_blueprint(abp, url_prefix="/abp")
+    return app
+
+
+def post(asgi_request, app, path, body, content_length=True, headers=()):
+    headers = list(headers)
+    if content_length:
+        size = len(body) if isinstance(body, bytes) else sum(map(len, body))
+        headers.append((b"content-length", str(size).encode()))
+    status, _, messages = asgi_request(app, path, method="POST", headers=headers, body=body)
+    body = b"".join(message.get("body", b"") for message in messages)
+    return status, json.loads(body) if status == 200 else body
+
+
+def test_small_body(app, asgi_request):
+    assert post(asgi_request, app, "/upload", b"a" * 50) == (200, {"len": 50})
+
+
+def test_big_body_is_spooled(app, asgi_request, sync_dispatch):
+    assert post(asgi_request, app, "/upload", [b"a" * 300, b"b" * 300]) == (200, {"len": 600})
+    if sync_dispatch == "native":
+        assert not isinstance(app.seen["body"], bytes)
+        assert app.seen["body"].closed
+
+
+def test_content_length_over_the_limit(app, asgi_request):
+    assert post(asgi_request, app, "/upload", b"a" * 2000) == (413, b"Request Entity Too Large")
+    assert post(asgi_request, app, "/async", b"a" * 2000) == (413, b"Request Entity Too Large")
+
+
+def test_chunked_body_over_the_limit(app, asgi_request):
+    assert post(asgi_request, app, "/upload", [b"a" * 600] * 4, content_length=False)[0] == 413
+    assert post(asgi_request, app, "/async", [b"a" * 600] * 4, content_length=False)[0] == 413
+
+
+def test_route_and_blueprint_limits(app, asgi_request):
+    assert post(asgi_request, app, "/big", [b"a" * 600] * 4, content_length=False) == (200, {"len": 2400})
+    assert post(asgi_request, app, "/sbp/x", b"a" * 20)[0] == 413
+    assert post(asgi_request, app, "/sbp/x", b"a" * 5) == (200, {"len": 5})
+    assert post(asgi_request, app, "/abp/y", [b"a" * 600] * 4, content_length=False) == (200, {"len": 2400})
+
+
+def test_unlimited_multipart_form(app, asgi_request):
+    headers = [(b"content-type", b"multipart/form-data; boundary=XyZ")]
+    status, body = post(asgi_request, app, "/form", [MULTIPART[:1000], MULTIPART[1000:]], headers=headers)
+    assert (status, body) == (200, {"name": "a.bin", "len": 3000, "x": "1"})
@@ -0,0 +1,130 @@
+import pytest
+from starlette.responses import PlainTextResponse
+from starlette.routing import Router
+from starlette.testclient import TestClient
+
+from nuxt.routing import CompiledRouter, CompiledRouteTable, Mount, Route, RouteList, WebSocketRoute
+
+
+def endpoint(name):
+    async def view(request):
+        return PlainTextResponse("%s %s" % (name, sorted(request.path_params.items())))
+
+    return view
+
+
+def make_routes():
+    return [
+        Route("/", endpoint("index")),
+        Route("/users/{uid:int}", endpoint("user"), methods=["GET"]),
+        Route("/users/me", endpoint("me")),
+        Route("/users/{name}", endpoint("named"), methods=["POST"]),
+        Route("/prices/{value:float}", endpoint("price")),
+        Route("/items/{key:uuid}", endpoint("item")),
+        Route("/files/{path:path}", endpoint("file")),
+        Route("/mixed/v{version}", endpoint("mixed")),
+        Mount("/mounted", routes=[Route("/{slug}", endpoint("mounted"))]),
+        WebSocketRoute("/users/{uid:int}", endpoint("ws")),
+    ]
+
+
+@pytest.fixture
+def client():
+    return TestClient(CompiledRouter(routes=make_routes()))
+
+
+def test_typed_segments(client):
+    assert client.get("/users/12").text == "user [('uid', 12)]"
+    assert client.get("/prices/1.5").text == "price [('value', 1.5)]"
+    uuid = "8c7f1a3e-0c4b-4d34-9b5a-3f0c2f1d9e11"
+    assert client.get("/items/%s" % uuid).text.startswith("item [('key', UUID(")
+    # a non-ASCII digit is not an int segment
+    assert client.get("/users/²").status_code == 405
+
+
+def test_registration_order_wins(client):
+    # /users/{uid:int} is first but only for digits, /users/me is next
+    assert client.get("/users/me").text == "me []"
+    assert client.post("/users/bob").text == "named [('name', 'bob')]"
+
+
+def test_partial_match_is_405(client):
+    response = client.delete("/users/12")
+    assert response.status_code == 405
+    assert set(response.headers["allow"].split(", ")) == {"GET", "HEAD"}
+
+
+def test_fallback_routes(client):
+    # path convertors, a param inside a segment and mounts keep the linear match
+    assert client.get("/files/a/b.txt").text == "file [('path', 'a/b.txt')]"
+    assert client.get("/mixed/v2").text == "mixed [('version', '2')]"
+    assert client.get("/mounted/x").text == "mounted [('slug', 'x')]"
+    assert client.get("/nope/nope").status_code == 404
+
+
+def test_same_result_as_linear_scan():
+    routes = make_routes()
+    table = CompiledRouteTable(routes)
+    linear = Router(routes=routes)
+    paths = ["/", "/users/1", "/users/me", "/users/bob", "/users/", "/prices/2", "/prices/x",
+             "/files/", "/files/a", "/mixed/v", "/mounted/a", "/mounted", "/other"]
+    for path in paths:
+        for method in ("GET", "POST"):
+            scope = {"type": "http", "path": path, "method": method, "root_path": ""}
+            expected = (None, None)
+            for route in linear.routes:
+                match, child_scope = route.matches(scope)
+                if match.value == 2:
+                    expected = (match, route)
+                    break
+                if match.value == 1 and expected[0] is None:
+                    expected = (match, route)
+            match, route, _ = table.lookup(scope)
+            assert (match, route) == expected or expected == (None, None) and route is None, (path, method)
+
+
+def test_routes_appended_after_freeze():
+    router = CompiledRouter(routes=[Route("/a", endpoint("a"))])
+    router.freeze()
+    client = TestClient(router)
+    assert client.get("/b").status_code == 404
+    router.routes.append(Route("/b", endpoint("b")))
+    assert client.get("/b").text == "b []"
+
+
+def test_route_replaced_after_freeze():
+    routes = RouteList([Route("/a", endpoint("a"))])
+    router = CompiledRouter(routes=[])
+    router.routes = routes
+    router.freeze()
+    client = TestClient(router)
+    assert client.get("/a").text == "a []"
+    routes[0] = Route("/a", endpoint("replaced"))
+    assert client.get("/a").text == "replaced []"
+
+
+def test_app_uses_compiled_router(make_app):
+    app = make_app(router={"compiled": True})
+    assert isinstance(app.base_app.router, CompiledRouter)
+    assert isinstance(app.routes, RouteList)
+
+    def user(request, uid):
+        return {"uid": uid}
+
+    app.wsgi_app.add_url_rule("/u/<int:uid>", "user", user, methods=["GET"])
+    app.freeze_routes()
+    client = TestClient(app)
+    assert client.get("/u/7").json() == {"uid": 7}
+    assert client.get("/u/x").status_code == 404
+    assert client.post("/u/7").status_code == 405
+
+
+def test_route_list_counts_changes():
+    routes = RouteList()
+    routes.append(Route("/a", endpoint("a")))
+    routes[0] = Route("/b", endpoint("b"))
+    routes.extend([Route("/c", endpoint("c"))])
+    del routes[0]
+    assert routes.version == 4
+    routes.changed()
+    assert routes.version == 5
@@ -0,0 +1,178 @@
+import asyncio
+import re
+
+import pytest
+
+from nuxt.sendfile import AsyncFileResponse, RangeNotSatisfiable, async_send_file, parse_ranges, send_file
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(DATA)
+    return str(path)
+
+
+@pytest.fixture
+def app(make_app, sync_dispatch, data_file):
+    app = make_app(sync_dispatch=sync_dispatch)
+    app.wsgi_app.add_url_rule("/sync", "sync", lambda request: send_file(request, data_file, max_age=60))
+    app.wsgi_app.add_url_rule("/download", "download", lambda request: send_file(
+        request, data_file, as_attachment=True, download_name="naïve.bin"))
+
+    async def async_file(request):
+        return await async_send_file(request, data_file)
+
+    app.asgi_app.route("/async")(async_file)
+    return app
+
+
+def fetch(app, path, headers=(), method="GET", extensions=None):
+    """
+    The status, headers and body of a request, zero-copy and path sends read from the file.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver")] + [(name.encode(), value.encode()) for name, value in headers],
+        "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    if extensions:
+        scope["extensions"] = {name: {} for name in extensions}
+    result = {"body": b"", "sends": []}
+    started = False
+
+    async def receive():
+        nonlocal started
+        if not started:
+            started = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        result["sends"].append(message["type"])
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {name.decode(): value.decode() for name, value in message["headers"]}
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+        elif message["type"] == "http.response.zerocopysend":
+            message["file"].seek(message["offset"])
+            result["body"] += message["file"].read(message["count"])
+        elif message["type"] == "http.response.pathsend":
+            with open(message["path"], "rb") as fd:
+                result["body"] += fd.read()
+
+    asyncio.run(app(scope, receive, send))
+    return result["status"], result["headers"], result["body"], result["sends"]
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", [(0, 10)]),
+    ("bytes=-5", [(95, 100)]),
+    ("bytes=10-", [(10, 100)]),
+    ("bytes=0-1,1-3,9-9", [(0, 4), (9, 10)]),
+    ("bytes=90-200", [(90, 100)]),
+    ("items=0-1", None),
+    ("bytes=5-2", None),
+    ("bytes=a-b", None),
+    ("bytes=²-3", None),
+    ("bytes=-²", None),
+])
+def test_parse_ranges(header, expected):
+    assert parse_ranges(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=-0", "bytes=200-300,400-"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_ranges(header, 100)
+
+
+@pytest.mark.parametrize("path", ["/sync", "/async"])
+def test_whole_file(app, path):
+    status, headers, body, _ = fetch(app, path)
+    assert (status, body) == (200, DATA)
+    assert headers["accept-ranges"] == "bytes"
+    assert headers["content-length"] == str(len(DATA))
+    assert headers["content-type"] == "application/octet-stream"
+    status, headers, body, _ = fetch(app, path, method="HEAD")
+    assert (status, body, headers["content-length"]) == (200, b"", str(len(DATA)))
+
+
+def test_download_headers(app):
+    headers = fetch(app, "/download")[1]
+    assert headers["content-disposition"] == "attachment; filename*=utf-8''na%C3%AFve.bin"
+    assert fetch(app, "/sync")[1]["cache-control"] == "public, max-age=60"
+
+
+@pytest.mark.parametrize("path", ["/sync", "/async"])
+def test_ranges(app, path):
+    status, headers, body, _ = fetch(app, path, [("range", "bytes=10-19")])
+    assert (status, body) == (206, DATA[10:20])
+    assert (headers["content-range"], headers["content-length"]) == ("bytes 10-19/%d" % len(DATA), "10")
+
+    status, headers, body, _ = fetch(app, path, [("range", "bytes=0-1,-2")])
+    assert status == 206
+    boundary = re.match(r"multipart/byteranges; boundary=(\w+)$", headers["content-type"]).group(1)
+    assert int(headers["content-length"]) == len(body)
+    parts = body.split(b"--" + boundary.encode())
+    assert parts[1].endswith(b"content-range: bytes 0-1/%d\r\n\r\n" % len(DATA) + DATA[:2] + b"\r\n")
+    assert parts[2].endswith(b"\r\n\r\n" + DATA[-2:] + b"\r\n")
+    assert parts[3] == b"--\r\n"
+
+    status, headers, body, _ = fetch(app, path, [("range", "bytes=999999-")])
+    assert (status, headers["content-range"], body) == (416, "bytes */%d" % len(DATA), b"")
+    # a malformed header is ignored
+    status, _, body, _ = fetch(app, path, [("range", "bytes=²-3")])
+    assert (status, body) == (200, DATA)
+
+
+@pytest.mark.parametrize("path", ["/sync", "/async"])
+def test_if_range(app, path):
+    headers = fetch(app, path)[1]
+    etag, last_modified = headers["etag"], headers["last-modified"]
+    assert fetch(app, path, [("range", "bytes=0-3"), ("if-range", etag)])[0] == 206
+    assert fetch(app, path, [("range", "bytes=0-3"), ("if-range", last_modified)])[0] == 206
+    for stale in ('"nope"', "W/%s" % etag, "Sun, 01 Jan 2000 00:00:00 GMT"):
+        status, _, body, _ = fetch(app, path, [("range", "bytes=0-3"), ("if-range", stale)])
+        assert (status, body) == (200, DATA)
+
+
+@pytest.mark.parametrize("path", ["/sync", "/async"])
+def test_conditional(app, path):
+    headers = fetch(app, path)[1]
+    etag, last_modified = headers["etag"], headers["last-modified"]
+    for conditional in ([("if-none-match", etag)], [("if-none-match", "W/%s" % etag)],
+                        [("if-none-match", '"a", %s' % etag)], [("if-modified-since", last_modified)]):
+        status, headers, body, _ = fetch(app, path, conditional)
+        assert (status, body, headers["etag"]) == (304, b"", etag)
+        assert "content-length" not in headers
+    assert fetch(app, path, [("if-none-match", '"nope"')])[0] == 200
+    # If-None-Match wins over If-Modified-Since
+    assert fetch(app, path, [("if-none-match", '"nope"'), ("if-modified-since", last_modified)])[0] == 200
+
+
+def test_server_extensions(make_app, data_file):
+    app = make_app(sync_dispatch="native")
+    app.wsgi_app.add_url_rule("/sync", "sync", lambda request: send_file(request, data_file))
+    status, _, body, sends = fetch(app, "/sync", [("range", "bytes=0-1,5-6")], extensions=["http.response.zerocopysend"])
+    assert status == 206 and DATA[:2] in body and DATA[5:7] in body
+    assert sends.count("http.response.zerocopysend") == 2
+    status, _, body, sends = fetch(app, "/sync", extensions=["http.response.pathsend"])
+    assert (status, body, sends[1]) == (200, DATA, "http.response.pathsend")
+
+
+def test_async_file_response_head(data_file):
+    def app(method):
+        async def asgi(scope, receive, send):
+            await AsyncFileResponse(data_file, method=method)(scope, receive, send)
+
+        return asgi
+
+    status, headers, body, _ = fetch(app("HEAD"), "/")
+    assert (status, body, headers["content-length"]) == (200, b"", str(len(DATA)))
+    assert fetch(app(None), "/")[2] == DATA
+    assert fetch(app(None), "/", method="HEAD")[2] == b""
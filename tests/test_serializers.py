@@ -0,0 +1,129 @@
+import collections
+import dataclasses
+import datetime
+import decimal
+import enum
+import json
+import uuid
+
+import pytest
+from starlette.testclient import TestClient
+
+from nuxt.serializers import JSONSerializer, serializer, orjson, ujson
+
+BACKENDS = ["json"] + [name for name, module in (("orjson", orjson), ("ujson", ujson)) if module is not None]
+
+Point = collections.namedtuple("Point", "x y")
+
+
+class Color(enum.Enum):
+    red = "r"
+
+
+@dataclasses.dataclass
+class Event:
+    id: int
+    when: datetime.datetime
+
+
+class Money:
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Cents(Money):
+    pass
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    yield request.param
+    serializer.use("auto")
+
+
+def test_builtin_encoders(backend):
+    dumps = JSONSerializer(backend).dumps
+    value = {
+        "when": datetime.datetime(2024, 1, 2, 3, 4, 5), "day": datetime.date(2024, 1, 2),
+        "uuid": uuid.UUID(int=1), "price": decimal.Decimal("1.5"), "color": Color.red,
+        "tags": frozenset(["a"]), "event": Event(1, datetime.datetime(2024, 1, 1)), "text": "é/",
+    }
+    assert json.loads(dumps(value)) == {
+        "when": "2024-01-02T03:04:05", "day": "2024-01-02", "uuid": "00000000-0000-0000-0000-000000000001",
+        "price": "1.5", "color": "r", "tags": ["a"], "event": {"id": 1, "when": "2024-01-01T00:00:00"}, "text": "é/",
+    }
+
+
+def test_namedtuple_body_is_an_object(backend):
+    assert json.loads(JSONSerializer(backend).dumps(Point(1, 2))) == {"x": 1, "y": 2}
+
+
+def test_registered_encoder_follows_the_mro(backend):
+    registry = JSONSerializer(backend)
+    with pytest.raises(TypeError):
+        registry.dumps({"m": Money(3)})
+    assert not registry.is_body(Money(3))
+    registry.register_encoder(Money, lambda money: "%.2f EUR" % money.value)
+    assert json.loads(registry.dumps({"m": Money(3), "c": Cents(1)})) == {"m": "3.00 EUR", "c": "1.00 EUR"}
+    assert registry.is_body(Cents(1))
+
+
+def test_user_encoder_wins_over_native_types(backend):
+    registry = JSONSerializer(backend)
+    registry.register_encoder(datetime.datetime, lambda value: value.strftime("%d/%m/%Y"))
+    assert registry.dumps(datetime.datetime(2024, 1, 2)) == b'"02/01/2024"'
+
+
+def test_wide_integers(backend):
+    assert JSONSerializer(backend).dumps({"n": 2 ** 70}) == b'{"n":1180591620717411303424}'
+
+
+@pytest.mark.skipif(orjson is None, reason="orjson is not installed")
+def test_orjson_nan():
+    assert JSONSerializer("orjson").dumps([float("nan"), float("inf")]) == b"[null,null]"
+    with pytest.raises(ValueError):
+        JSONSerializer("json").dumps([float("nan")])
+
+
+def test_is_body():
+    assert serializer.is_body({}) and serializer.is_body([]) and serializer.is_body(Point(1, 2))
+    assert serializer.is_body(Event(1, datetime.datetime(2024, 1, 1)))
+    assert not serializer.is_body("text") and not serializer.is_body(b"bytes")
+
+
+def test_unknown_backend():
+    with pytest.raises(AssertionError):
+        JSONSerializer("pickle")
+
+
+def test_sync_and_async_responses(make_app, sync_dispatch, backend):
+    app = make_app(sync_dispatch=sync_dispatch, serializer={"backend": backend})
+    assert serializer.backend == backend
+    wsgi_app = app.wsgi_app
+    wsgi_app.add_url_rule("/list", "list", lambda request: [1, "é", {"k": uuid.UUID(int=2)}])
+    wsgi_app.add_url_rule("/point", "point", lambda request: (Point(1, 2), 201))
+    wsgi_app.add_url_rule("/event", "event", lambda request: (Event(1, datetime.datetime(2024, 1, 2)), {"X-A": "1"}))
+    wsgi_app.add_url_rule("/text", "text", lambda request: "plain")
+
+    async def async_event(request):
+        return [Event(2, datetime.datetime(2024, 1, 1))]
+
+    async def async_point(request):
+        return Point(3, 4), 201
+
+    app.asgi_app.add_route("/async/event", async_event, name="async.event")
+    app.asgi_app.add_route("/async/point", async_point, name="async.point")
+    client = TestClient(app)
+
+    response = client.get("/list")
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == [1, "é", {"k": "00000000-0000-0000-0000-000000000002"}]
+    response = client.get("/point")
+    assert (response.status_code, response.json()) == (201, {"x": 1, "y": 2})
+    response = client.get("/event")
+    assert (response.headers["x-a"], response.json()) == ("1", {"id": 1, "when": "2024-01-02T00:00:00"})
+    assert client.get("/text").headers["content-type"].startswith("text/plain")
+    assert client.get("/async/event").json() == [{"id": 2, "when": "2024-01-01T00:00:00"}]
+    response = client.get("/async/point")
+    assert (response.status_code, response.json()) == (201, {"x": 3, "y": 4})
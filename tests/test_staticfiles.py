@@ -0,0 +1,364 @@
+import gzip
+import json
+import os
+import re
+import time
+
+import pytest
+from click.testing import CliRunner
+from starlette.exceptions import HTTPException
+from starlette.routing import Router
+from starlette.testclient import TestClient
+
+from nuxt import templating
+from nuxt.commands import cli
+from nuxt.reloader import has_inotify
+from nuxt.routing import Mount
+from nuxt.staticfiles import (IMMUTABLE_CACHE_CONTROL, MANIFEST_NAME, StaticEntry, StaticFileCache, StaticFiles,
+                              accepted_encodings, build_manifest, fingerprint_digest, fingerprint_name)
+from nuxt.templating import static_url
+
+
+def wait_until(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "a.txt").write_text("hello\n")
+    (tmp_path / "big.bin").write_bytes(b"x" * 300 * 1024)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "index.html").write_text("<p>sub</p>\n")
+    (tmp_path / "404.html").write_text("missing\n")
+    return tmp_path
+
+
+def test_cache_is_opt_in(static_dir):
+    assert StaticFiles(directory=static_dir).cache is None
+    assert StaticFiles(directory=static_dir, cache=True).cache is not None
+
+
+def test_cached_responses(static_dir):
+    app = StaticFiles(directory=static_dir, html=True, cache={"revalidate": 60})
+    app.cache.watch = lambda directories: None
+    client = TestClient(app)
+    first = client.get("/a.txt")
+    second = client.get("/a.txt")
+    assert first.text == second.text == "hello\n"
+    assert first.headers["etag"] == second.headers["etag"]
+    assert "accept-ranges" not in second.headers
+    assert client.get("/a.txt", headers={"if-none-match": first.headers["etag"]}).status_code == 304
+    head = client.head("/a.txt")
+    assert (head.headers["content-length"], head.content) == ("6", b"")
+    assert client.get("/sub/").text == "<p>sub</p>\n"
+    assert client.get("/nope").status_code == client.get("/nope").status_code == 404
+    # over max_file_size, served from the file
+    assert client.get("/big.bin").headers["accept-ranges"] == "bytes"
+    stats = app.cache.stats()
+    assert stats["hits"] >= 4
+    assert stats["memory"] == len("hello\n") + len("<p>sub</p>\n") + len("missing\n")
+
+
+def test_revalidated_without_a_watch(static_dir):
+    app = StaticFiles(directory=static_dir, cache={"revalidate": 0.05})
+    app.cache.watch = lambda directories: None
+    client = TestClient(app)
+    assert client.get("/a.txt").text == "hello\n"
+    (static_dir / "a.txt").write_text("changed\n")
+    time.sleep(0.1)
+    assert client.get("/a.txt").text == "changed\n"
+    entry = app.cache.entries["a.txt"]
+    time.sleep(0.1)
+    # an unchanged file keeps its entry and body
+    assert client.get("/a.txt").text == "changed\n"
+    assert app.cache.entries["a.txt"] is entry
+    assert app.cache.stats()["revalidations"] >= 2
+
+
+def test_file_removed_after_its_lookup(static_dir, monkeypatch):
+    app = StaticFiles(directory=static_dir, html=True, cache=True)
+    app.cache.watch = lambda directories: None
+    lookup_path = app.lookup_path
+
+    def removing_lookup(path):
+        full_path, stat_result = lookup_path(path)
+        if path != "404.html":
+            os.unlink(full_path)
+        return full_path, stat_result
+
+    monkeypatch.setattr(app, "lookup_path", removing_lookup)
+    entry = app.load_entry("a.txt")
+    assert entry.stat_result is None and entry.full_path == str(static_dir / "a.txt")
+    response = TestClient(app).get("/sub/index.html")
+    assert (response.status_code, response.text) == (404, "missing\n")
+
+
+@pytest.mark.skipif(not has_inotify, reason="inotify is not available")
+def test_watched_directory(static_dir):
+    app = StaticFiles(directory=static_dir, html=True, cache={"revalidate": 3600})
+    client = TestClient(app)
+    assert client.get("/a.txt").text == "hello\n"
+    assert wait_until(lambda: app.cache.watched)
+    assert client.get("/a.txt").text == "hello\n"
+    (static_dir / "a.txt").write_text("changed\n")
+    assert wait_until(lambda: client.get("/a.txt").text == "changed\n")
+    assert client.get("/new.txt").status_code == 404
+    (static_dir / "new.txt").write_text("new\n")
+    assert wait_until(lambda: client.get("/new.txt").status_code == 200)
+
+
+def test_stale_load_is_not_stored():
+    cache = StaticFileCache()
+    generation = cache.generation
+    cache.invalidate("/static/a.txt")
+    # loaded before the invalidation of its path
+    cache.set("a.txt", StaticEntry("/static/a.txt", None), generation)
+    assert cache.get("a.txt") is None
+    # other paths are not affected
+    cache.set("b.txt", StaticEntry("/static/b.txt", None), generation)
+    assert cache.get("b.txt") is not None
+    cache.invalidate("/static/sub")
+    cache.set("sub/c.txt", StaticEntry("/static/sub/c.txt", None), generation)
+    assert cache.get("sub/c.txt") is None
+    cache.set("a.txt", StaticEntry("/static/a.txt", None), cache.generation)
+    assert cache.get("a.txt") is not None
+    generation = cache.generation
+    cache.invalidate()
+    cache.set("b.txt", StaticEntry("/static/b.txt", None), generation)
+    assert cache.get("b.txt") is None
+
+
+def test_cache_bounds():
+    cache = StaticFileCache(max_entries=2, max_memory=10)
+    cache.set("a", StaticEntry("/a", None, [], b"12345"))
+    cache.set("b", StaticEntry("/b", None, [], b"12345"))
+    cache.set("c", StaticEntry("/c", None, [], b"1"))
+    assert cache.get("a") is None and cache.memory == 6
+    cache.set("d", StaticEntry("/d", None, [], b"1234567890"))
+    assert list(cache.entries) == ["d"] and cache.memory == 10
+
+
+@pytest.fixture
+def assets_dir(tmp_path):
+    (tmp_path / "app.js").write_text("function hello() { return 'hello'; }\n" * 200)
+    (tmp_path / "style.css").write_text("body { color: red; }\n" * 200)
+    (tmp_path / "random.txt").write_bytes(os.urandom(4096).hex().encode()[:4096])
+    (tmp_path / "tiny.txt").write_text("tiny\n")
+    (tmp_path / "image.png").write_bytes(b"\x89PNG" + b"\x00" * 4096)
+    return tmp_path
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip;q=0, br;q=0.5, deflate") == {"br", "deflate"}
+    assert accepted_encodings("*") >= {"*", "gzip", "br"}
+    assert accepted_encodings("") == set()
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_compressed_on_the_fly(assets_dir, cache):
+    app = StaticFiles(directory=assets_dir, compress=True, cache=cache)
+    client = TestClient(app)
+    body = (assets_dir / "app.js").read_bytes()
+    response = client.get("/app.js", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["content-type"].startswith("text/javascript")
+    assert int(response.headers["content-length"]) < len(body)
+    # the client decodes the body
+    assert response.content == body
+    etag = response.headers["etag"]
+    assert etag != client.get("/app.js", headers={"accept-encoding": "identity"}).headers["etag"]
+    response = client.get("/app.js", headers={"accept-encoding": "gzip", "if-none-match": etag})
+    assert response.status_code == 304
+    assert client.get("/app.js", headers={"accept-encoding": "gzip"}).headers["etag"] == etag
+    assert app.compressor.stats()["hits"] >= 1
+
+    response = client.get("/app.js", headers={"accept-encoding": "identity"})
+    assert ("content-encoding" not in response.headers, response.headers["vary"]) == (True, "Accept-Encoding")
+    # too small and not a compressible type
+    for path in ("/tiny.txt", "/image.png"):
+        response = client.get(path, headers={"accept-encoding": "gzip"})
+        assert "content-encoding" not in response.headers and "vary" not in response.headers
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_precompressed_siblings(assets_dir, cache):
+    result = CliRunner().invoke(cli, ["precompress", str(assets_dir)])
+    assert result.exit_code == 0, result.output
+    assert (assets_dir / "app.js.gz").exists() and (assets_dir / "style.css.gz").exists()
+    assert not (assets_dir / "tiny.txt.gz").exists() and not (assets_dir / "image.png.gz").exists()
+    # up to date siblings are kept
+    assert "0 files written" in CliRunner().invoke(cli, ["precompress", str(assets_dir)]).output
+
+    (assets_dir / "style.css.gz").write_bytes(gzip.compress(b"from the sibling"))
+    # opt-in, the siblings are not looked up otherwise
+    response = TestClient(StaticFiles(directory=assets_dir)).get("/style.css", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in response.headers and "vary" not in response.headers
+    app = StaticFiles(directory=assets_dir, precompressed=True, cache=cache)
+    client = TestClient(app)
+    response = client.get("/style.css", headers={"accept-encoding": "br, gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == b"from the sibling"
+    etag = response.headers["etag"]
+    response = client.get("/style.css", headers={"accept-encoding": "gzip", "if-none-match": etag})
+    assert response.status_code == 304
+    response = client.get("/style.css", headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in response.headers and response.headers["vary"] == "Accept-Encoding"
+    assert response.content == (assets_dir / "style.css").read_bytes()
+    # ranges are served from the file itself
+    response = client.get("/style.css", headers={"accept-encoding": "gzip", "range": "bytes=0-3"})
+    assert (response.status_code, response.content) == (206, b"body")
+    if cache:
+        # the missing .br sibling is remembered
+        assert app.cache.entries["style.css.br"].stat_result is None
+        misses = app.cache.stats()["misses"]
+        client.get("/style.css", headers={"accept-encoding": "br, gzip"})
+        assert app.cache.stats()["misses"] == misses
+
+
+@pytest.fixture
+def listing_dir(tmp_path):
+    many = tmp_path / "many"
+    many.mkdir()
+    for i in range(25):
+        (many / ("f%02d.txt" % i)).write_text("")
+    (many / "Sub").mkdir()
+    (tmp_path / "a b.txt").write_text("")
+    (tmp_path / "<b>.txt").write_text("")
+    return tmp_path
+
+
+def test_directory_listing(listing_dir):
+    app = StaticFiles(directory=listing_dir, html=True, list_directory={"per_page": 10, "max_entries": 20})
+    client = TestClient(app)
+    response = client.get("/")
+    assert response.headers["content-type"].startswith("text/html")
+    assert '<li><a href="a%20b.txt">a b.txt</a></li>' in response.text
+    assert "<li><a href=\"%3Cb%3E.txt\">&lt;b&gt;.txt</a></li>" in response.text
+    assert '<li><a href="many/">many/</a></li>' in response.text
+
+    response = client.get("/many", follow_redirects=False)
+    assert (response.status_code, response.headers["location"]) == (307, "http://testserver/many/")
+    response = client.get("/many/?page=2")
+    assert response.text.count("<li>") == 10
+    assert '<a href="?page=1">previous</a> | page 2 of 2' in response.text
+    assert "Only the first 20 entries are listed." in response.text
+
+    data = client.get("/many/?format=json&page=2").json()
+    assert {key: value for key, value in data.items() if key != "entries"} == {
+        "path": "/many/", "page": 2, "pages": 2, "total": 20, "truncated": True}
+    assert len(data["entries"]) == 10
+    assert data["entries"][0].keys() == {"name", "type", "link"}
+    # the scanned entries are sorted case insensitively
+    names = [entry["name"] for page in (1, 2) for entry in client.get("/many/?format=json&page=%d" % page).json()["entries"]]
+    # sorted before the truncation
+    assert names == ["f%02d.txt" % i for i in range(20)]
+    assert client.get("/many/?page=x").text.count("<li>") == 10
+
+
+def test_listing_is_cached_by_mtime(listing_dir):
+    app = StaticFiles(directory=listing_dir, html=True, list_directory=True)
+    client = TestClient(app)
+    client.get("/")
+    client.get("/")
+    assert (len(app.listing.scans), len(app.listing.pages)) == (1, 1)
+    (listing_dir / "new.txt").write_text("")
+    os.utime(listing_dir, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    assert "new.txt" in client.get("/").text
+    assert len(app.listing.scans) == 2
+
+
+def test_listing_pages_are_cached_by_url(listing_dir):
+    app = StaticFiles(directory=listing_dir, html=True, list_directory=True)
+    client = TestClient(Router([Mount("/a", app=app), Mount("/b", app=app)]))
+    assert "Directory listing for /a/many/" in client.get("/a/many/").text
+    assert "Directory listing for /b/many/" in client.get("/b/many/").text
+    assert client.get("/b/many/?format=json").json()["path"] == "/b/many/"
+    assert len(app.listing.scans) == 1
+
+
+def test_listing_is_off_by_default(listing_dir):
+    app = StaticFiles(directory=listing_dir, html=True)
+    (listing_dir / "404.html").write_text("missing")
+    assert TestClient(app).get("/many/").status_code == 404
+
+
+@pytest.fixture
+def fingerprinted_dir(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "app.css").write_text("body { color: red; }\n")
+    (tmp_path / "css" / "app.css.gz").write_bytes(gzip.compress(b"body { color: red; }\n"))
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG")
+    return tmp_path
+
+
+def test_build_manifest(fingerprinted_dir):
+    assert fingerprint_name("css/app.css", "3f2a1b") == "css/app.3f2a1b.css"
+    manifest = build_manifest(str(fingerprinted_dir))
+    assert manifest["version"] == 1
+    # the .gz sibling is served through its file
+    assert sorted(manifest["files"]) == ["css/app.css", "logo.png"]
+    assert re.match(r"css/app\.[0-9a-f]{16}\.css$", manifest["files"]["css/app.css"])
+    assert build_manifest(str(fingerprinted_dir)) == manifest
+    (fingerprinted_dir / "logo.png").write_bytes(b"\x89PNG2")
+    assert build_manifest(str(fingerprinted_dir))["files"]["logo.png"] != manifest["files"]["logo.png"]
+
+
+def test_fingerprint_digest():
+    assert fingerprint_digest("css/app.css", "css/app.3f2a1b.css") == "3f2a1b"
+    assert fingerprint_digest("LICENSE", "LICENSE.3f2a1b") == "3f2a1b"
+    assert fingerprint_digest("a.b/c.tar.gz", "a.b/c.tar.3f2a1b.gz") == "3f2a1b"
+
+
+def test_fingerprinted_paths(fingerprinted_dir):
+    result = CliRunner().invoke(cli, ["fingerprint", str(fingerprinted_dir)])
+    assert result.exit_code == 0, result.output
+    manifest = json.loads((fingerprinted_dir / MANIFEST_NAME).read_text())
+    app = StaticFiles(directory=fingerprinted_dir, precompressed=True)
+    client = TestClient(app)
+    path = app.fingerprint("/css/app.css")
+    assert path == manifest["files"]["css/app.css"]
+    assert app.fingerprint("other.js") == "other.js"
+
+    response = client.get("/" + path, headers={"accept-encoding": "identity"})
+    assert response.text == "body { color: red; }\n"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    # the precompressed sibling of the original file
+    response = client.get("/" + path, headers={"accept-encoding": "gzip"})
+    assert (response.headers["content-encoding"], response.headers["cache-control"]) == ("gzip", IMMUTABLE_CACHE_CONTROL)
+    response = client.get("/" + path, headers={"accept-encoding": "gzip", "if-none-match": response.headers["etag"]})
+    assert (response.status_code, response.headers["cache-control"]) == (304, IMMUTABLE_CACHE_CONTROL)
+    # the original path stays revalidated
+    assert "cache-control" not in client.get("/css/app.css").headers
+    # the manifest is not a public asset
+    with pytest.raises(HTTPException) as error:
+        client.get("/" + MANIFEST_NAME)
+    assert error.value.status_code == 404
+    # a file changed since the manifest was written is not immutable under the old digest
+    (fingerprinted_dir / "css" / "app.css").write_text("body { color: blue; }\n")
+    response = client.get("/" + path, headers={"accept-encoding": "identity"})
+    assert response.text == "body { color: blue; }\n"
+    assert "cache-control" not in response.headers
+
+
+def test_static_url(fingerprinted_dir, template_app):
+    app = template_app()
+    app.routes.append(Mount("/static", app=StaticFiles(directory=fingerprinted_dir), name="async.nuxt.static"))
+    assert static_url("logo.png") == "/static/logo.png"
+    (fingerprinted_dir / MANIFEST_NAME).write_text(json.dumps(build_manifest(str(fingerprinted_dir))))
+    app.routes[-1] = Mount("/static", app=StaticFiles(directory=fingerprinted_dir), name="async.nuxt.static")
+    # the mounts are looked up once
+    vars(templating)["__static_mounts"].clear()
+    url = static_url("css/app.css")
+    assert re.match(r"/static/css/app\.[0-9a-f]{16}\.css$", url)
+    response = TestClient(app).get(url)
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    with pytest.raises(ValueError):
+        static_url("logo.png", name="async.other")
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from nuxt.streaming import StreamBuffer
+
+CHUNK = 1024
+
+
+def export_app(make_app, sync_dispatch, state: dict):
+    app = make_app(sync_dispatch=sync_dispatch, streaming={"buffer_size": 4 * CHUNK})
+
+    def export(request):
+        def generate():
+            try:
+                for _ in range(200):
+                    state["produced"] += CHUNK
+                    state["ahead"] = max(state["ahead"], state["produced"] - state["sent"])
+                    yield b"x" * CHUNK
+            finally:
+                state["closed"] = True
+
+        return generate(), {"content-type": "text/csv"}
+
+    app.wsgi_app.add_url_rule("/export", "export", export)
+    return app
+
+
+def stream(app, state: dict, disconnect_after=None) -> list:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": "/export", "raw_path": b"/export", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"testserver")], "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+    }
+    messages = []
+
+    async def main():
+        gone, started = asyncio.Event(), False
+
+        async def receive():
+            nonlocal started
+            if not started:
+                started = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await gone.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+            if message["type"] == "http.response.body":
+                # a slow client
+                await asyncio.sleep(0.001)
+                state["sent"] += len(message["body"])
+                if disconnect_after is not None and state["sent"] >= disconnect_after:
+                    gone.set()
+
+        try:
+            await asyncio.wait_for(app(scope, receive, send), 10)
+        finally:
+            gone.set()
+
+    asyncio.run(main())
+    return messages
+
+
+@pytest.fixture
+def state():
+    return {"produced": 0, "sent": 0, "ahead": 0, "closed": False}
+
+
+def test_stream_is_flow_controlled(make_app, sync_dispatch, state):
+    messages = stream(export_app(make_app, sync_dispatch, state), state)
+    assert messages[0]["status"] == 200
+    assert state["sent"] == state["produced"] == 200 * CHUNK
+    # the producer stays within the buffer of the client, plus the chunk in flight
+    assert state["ahead"] <= 6 * CHUNK
+    assert state["closed"]
+    assert not messages[-1].get("more_body", False)
+
+
+def test_stream_stops_on_disconnect(make_app, sync_dispatch, state):
+    stream(export_app(make_app, sync_dispatch, state), state, disconnect_after=20 * CHUNK)
+    assert state["sent"] < 200 * CHUNK
+    assert state["produced"] <= state["sent"] + 6 * CHUNK
+    assert state["closed"]
+
+
+def test_stream_buffer():
+    buffer = StreamBuffer(2)
+    assert buffer.reserve(1) and buffer.reserve(1)
+    buffer.release(1)
+    assert buffer.reserve(1)
+    buffer.stop()
+    # a stopped buffer never blocks the producer
+    assert not buffer.reserve(1)
@@ -0,0 +1,275 @@
+import asyncio
+import contextvars
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from click.testing import CliRunner
+from jinja2 import Environment
+from starlette.testclient import TestClient
+
+from nuxt.commands import cli
+from nuxt.templating import (
+    AsyncTemplateResponse, async_buffer_chunks, async_render_html, async_stream_html, buffer_chunks, create_template_env,
+    iterate_in_executor, lazy_render_html, render_html_async, render_template_async, stream_html, warm_templates,
+)
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    # the template path of the config is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "templates"
+    (path / "sub").mkdir(parents=True)
+    (path / "base.html").write_text("<title>{% block title %}{% endblock %}</title>")
+    (path / "sub" / "page.html").write_text('{% extends "base.html" %}{% block title %}{{ name }}{% endblock %}')
+    return path
+
+
+def cache_files(directory) -> list:
+    return sorted("async" if path.name.startswith("__jinja2_async_") else "sync" for path in directory.iterdir())
+
+
+def test_bytecode_cache(templates, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    options = {"path": "templates", "bytecode_cache": str(cache_dir)}
+    env = create_template_env(options)
+    assert env.get_template("sub/page.html").render(name="a") == "<title>a</title>"
+    assert cache_files(cache_dir) == ["sync", "sync"]
+    async_env = create_template_env(options, enable_async=True)
+    async_env.get_template("sub/page.html")
+    # async templates compile to other code
+    assert cache_files(cache_dir) == ["async", "sync", "sync"]
+
+    # another worker loads the bytecode
+    def compile(self, *args, **kwargs):
+        raise AssertionError("compiled again")
+
+    monkeypatch.setattr(Environment, "compile", compile)
+    assert create_template_env(options).get_template("sub/page.html").render(name="b") == "<title>b</title>"
+
+
+def test_no_bytecode_cache(templates):
+    env = create_template_env({"path": "templates", "cache_size": 10, "auto_reload": False})
+    assert env.bytecode_cache is None
+    assert (env.cache.capacity, env.auto_reload) == (10, False)
+
+
+def test_warm_templates(templates, tmp_path):
+    options = {"path": "templates", "bytecode_cache": str(templates)}
+    assert warm_templates(create_template_env(options)) == (2, {})
+    (templates / "broken.html").write_text("{% if %}")
+    # the bytecode files in the template directory are skipped
+    count, errors = warm_templates(create_template_env(options))
+    assert (count, list(errors)) == (2, ["broken.html"])
+
+
+def test_compile_command(templates, tmp_path):
+    runner = CliRunner()
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps({"template": {"path": "templates", "bytecode_cache": str(tmp_path / "cache")}}))
+    result = runner.invoke(cli, ["templates", "compile", "--config", str(config)])
+    assert (result.exit_code, result.output) == (0, "2 templates compiled\n")
+    assert cache_files(tmp_path / "cache") == ["sync", "sync"]
+
+    (templates / "broken.html").write_text("{% if %}")
+    result = runner.invoke(cli, ["templates", "compile", "--path", "templates", "--cache-dir", str(tmp_path / "other")])
+    assert result.exit_code == 1
+    assert result.stdout == "2 templates compiled\n"
+    assert result.stderr.startswith("broken.html: ")
+
+    result = runner.invoke(cli, ["templates", "compile", "--path", "templates"])
+    assert result.stderr.startswith("no bytecode cache configured, only checking the templates\n")
+
+
+class ThreadName:
+
+    def __str__(self) -> str:
+        return threading.current_thread().name
+
+
+@pytest.fixture
+def render_app(template_app, templates):
+    (templates / "thread.html").write_text("{{ name }}")
+    request_id = contextvars.ContextVar("request_id")
+    (templates / "request.html").write_text("{{ request_id.get() }}")
+
+    def init(**options):
+        app = template_app(template=dict({"path": "templates"}, **options))
+
+        async def render(request):
+            mode = request.query_params.get("mode")
+            request_id.set(request.query_params.get("id"))
+            if request.query_params.get("html"):
+                return await render_html_async(request, request.query_params["html"], mode, name=ThreadName(), request_id=request_id)
+            return await render_template_async(request, "thread.html", mode, name=ThreadName())
+
+        async def eager(request):
+            response = async_render_html(request, "sub/page.html", name=ThreadName())
+            assert response.body == ("<title>%s</title>" % threading.current_thread().name).encode()
+            return response
+
+        async def lazy(request):
+            response = lazy_render_html(request, "sub/page.html", name=ThreadName())
+            assert isinstance(response, AsyncTemplateResponse) and not hasattr(response, "body")
+            return response
+
+        async def etag(request):
+            return lazy_render_html(request, "sub/page.html", name="etag")
+
+        app.asgi_app.route("/render")(render)
+        app.asgi_app.route("/eager")(eager)
+        app.asgi_app.route("/lazy")(lazy)
+        app.asgi_app.route("/etag", etag=True)(etag)
+        return TestClient(app)
+
+    return init
+
+
+def test_render_modes(render_app):
+    # one event loop thread for all the requests
+    with render_app() as client:
+        loop_thread = client.get("/render?mode=sync").text
+        assert client.get("/render").text.startswith("Template")
+        assert client.get("/render?mode=thread").text.startswith("Template")
+        assert client.get("/render?mode=async").text == loop_thread
+        assert not loop_thread.startswith("Template")
+        # the context of the request is copied to the render thread
+        assert client.get("/render?html=request.html&id=42").text == "42"
+        response = client.get("/render?html=sub/page.html&mode=async")
+        assert response.headers["content-type"] == "text/html; charset=utf-8"
+        assert response.text == "<title>%s</title>" % loop_thread
+        with pytest.raises(ValueError, match="Unknown render mode bogus"):
+            client.get("/render?mode=bogus")
+
+
+def test_render_mode_of_the_config(render_app):
+    client = render_app(render_mode="async", render_workers=1)
+    assert not client.get("/render").text.startswith("Template")
+    assert client.get("/render?mode=thread").text == "Template_0"
+
+
+def test_render_html_is_eager(render_app):
+    response = render_app().get("/eager")
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+    assert not response.text.startswith("<title>Template")
+
+
+def test_lazy_render_html_is_rendered_when_sent(render_app):
+    client = render_app()
+    response = client.get("/lazy")
+    assert response.headers["content-type"] == "text/html; charset=utf-8"
+    assert response.text.startswith("<title>Template")
+    assert response.headers["content-length"] == str(len(response.content))
+    response = client.get("/etag")
+    etag = response.headers["etag"]
+    assert response.text == "<title>etag</title>"
+    response = client.get("/etag", headers={"if-none-match": etag})
+    assert (response.status_code, response.content) == (304, b"")
+
+
+def test_buffer_chunks():
+    chunks = ["ab", "c", "défg", "h"]
+    assert list(buffer_chunks(chunks, 3)) == [b"abc", "défg".encode(), b"h"]
+    assert list(buffer_chunks([], 3)) == []
+
+    async def agen():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [chunk async for chunk in async_buffer_chunks(agen(), 3)]
+
+    assert asyncio.run(collect()) == [b"abc", "défg".encode(), b"h"]
+
+
+@pytest.fixture
+def stream_app(template_app, templates, sync_dispatch):
+    (templates / "rows.html").write_text("{% for i in range(n) %}<li>{{ i }} {{ name }}</li>\n{% endfor %}")
+    app = template_app(template={"path": "templates", "stream_chunk_size": 1000}, sync_dispatch=sync_dispatch)
+
+    def sync_rows(request):
+        return stream_html(request, "rows.html", n=500, name="x")
+
+    async def async_rows(request, mode):
+        return async_stream_html(request, "rows.html", mode, n=500, name=ThreadName())
+
+    app.wsgi_app.add_url_rule("/sync", "sync", sync_rows)
+    app.asgi_app.route("/async/{mode}")(async_rows)
+    return app
+
+
+def test_stream_html(stream_app, asgi_request):
+    expected = "".join("<li>%d x</li>\n" % i for i in range(500)).encode()
+    status, headers, messages = asgi_request(stream_app, "/sync")
+    assert (status, dict(headers)[b"content-type"]) == (200, b"text/html; charset=utf-8")
+    assert b"content-length" not in dict(headers)
+    chunks = [message["body"] for message in messages if message.get("body")]
+    assert b"".join(chunks) == expected
+    assert len(chunks) > 5 and all(len(chunk) < 1100 for chunk in chunks)
+
+
+@pytest.mark.parametrize("mode", ["thread", "async", "sync"])
+def test_async_stream_html(stream_app, asgi_request, mode):
+    status, headers, messages = asgi_request(stream_app, "/async/%s" % mode)
+    assert (status, dict(headers)[b"content-type"]) == (200, b"text/html; charset=utf-8")
+    chunks = [message["body"] for message in messages if message.get("body")]
+    assert len(chunks) > 5
+    rows = b"".join(chunks).decode().splitlines()
+    assert len(rows) == 500
+    # rendered chunk by chunk in the template threads or on the loop
+    assert rows[0].startswith("<li>0 Template") == (mode == "thread")
+
+
+def test_stream_iterator_is_closed_in_its_thread():
+    closed = []
+
+    def rows():
+        try:
+            while True:
+                yield b"row"
+        finally:
+            closed.append(threading.current_thread().name)
+
+    async def first_rows():
+        with ThreadPoolExecutor(1, thread_name_prefix="Render") as executor:
+            iterator = iterate_in_executor(rows(), executor)
+            chunks = [await iterator.__anext__(), await iterator.__anext__()]
+            await iterator.aclose()
+        return chunks
+
+    assert asyncio.run(first_rows()) == [b"row", b"row"]
+    assert closed == ["Render_0"]
+
+
+def test_stream_cancelled_while_a_chunk_renders():
+    started, release, closed = threading.Event(), threading.Event(), []
+
+    def rows():
+        try:
+            yield b"first"
+            started.set()
+            release.wait(5)
+            yield b"second"
+        finally:
+            closed.append(threading.current_thread().name)
+
+    async def cancel_second_row():
+        loop = asyncio.get_running_loop()
+        # a free thread for the close
+        with ThreadPoolExecutor(2, thread_name_prefix="Render") as executor:
+            iterator = iterate_in_executor(rows(), executor)
+            assert await iterator.__anext__() == b"first"
+            task = asyncio.ensure_future(iterator.__anext__())
+            await loop.run_in_executor(None, started.wait, 5)
+            task.cancel()
+            await asyncio.sleep(0.05)
+            # not closed while next() runs
+            assert closed == []
+            release.set()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(cancel_second_row())
+    assert len(closed) == 1 and closed[0].startswith("Render_")
@@ -0,0 +1,117 @@
+import asyncio
+import enum
+import types
+
+import marshmallow as ma
+import pytest
+from marshmallow import validate
+from starlette.datastructures import QueryParams
+from werkzeug.datastructures import MultiDict
+
+from nuxt.asyncio.repositorys import validation as async_validation
+from nuxt.repositorys import validation
+from nuxt.validators import CompiledArgs, compile_argmap
+
+Color = enum.Enum("Color", "red green")
+
+
+def make_argmap() -> dict:
+    return {
+        "n": validation.fields.Int(required=True),
+        "s": validation.fields.Str(load_default="d"),
+        "b": validation.fields.Bool(),
+        "c": validation.fields.Enum(Color),
+        "r": validation.fields.Int(validate=validate.Range(1, 10)),
+        "z": validation.fields.Str(allow_none=True),
+        "l": validation.fields.Str(load_default=lambda: "callable"),
+    }
+
+
+def call_sync(location, data, compiled, **options):
+    # a validate function leaves the argmap to webargs
+    options.setdefault("validate", None if compiled else lambda args: True)
+    view = validation.use_args(make_argmap(), location=location, **options)(lambda request, args: args)
+    request = types.SimpleNamespace(view_args=data if location == "view_args" else None, args=MultiDict(data or {}))
+    try:
+        return view(request)
+    except validation.ValidateException as error:
+        return error.args[0].messages
+
+
+def call_async(location, data, compiled, **options):
+    options.setdefault("validate", None if compiled else lambda args: True)
+
+    async def view(request, args):
+        return args
+
+    view = async_validation.use_args(make_argmap(), location=location, **options)(view)
+    request = types.SimpleNamespace(path_params=data if location == "view_args" else {}, query_params=QueryParams(data or {}))
+    try:
+        return asyncio.run(view(request))
+    except async_validation.ValidateException as error:
+        return error.args[0].messages
+
+
+@pytest.mark.parametrize("call", [call_sync, call_async])
+@pytest.mark.parametrize("location, data", [
+    ("querystring", {"n": "3"}),
+    ("querystring", {"n": "x", "b": "maybe", "c": "blue", "r": "11"}),
+    ("querystring", {}),
+    ("querystring", {"n": "1", "extra": "y", "b": "on", "c": "red", "r": "5"}),
+    ("querystring", {"n": "99999999999999999999999999"}),
+    ("querystring", {"n": ""}),
+    ("query", {"n": "2", "b": "false"}),
+    ("view_args", {"n": 3, "extra": 1}),
+    ("view_args", {"n": "4", "b": True}),
+    ("view_args", {"n": True}),
+    ("view_args", None),
+])
+def test_compiled_matches_webargs(call, location, data):
+    assert call(location, data, compiled=True) == call(location, data, compiled=False)
+
+
+@pytest.mark.parametrize("call", [call_sync, call_async])
+@pytest.mark.parametrize("unknown", [ma.INCLUDE, ma.EXCLUDE, ma.RAISE])
+def test_unknown(call, unknown):
+    data = {"n": "1", "extra": "y"}
+    result = call("querystring", data, compiled=True, unknown=unknown)
+    assert result == call("querystring", data, compiled=False, unknown=unknown)
+
+
+def test_values_and_errors():
+    assert call_sync("querystring", {"n": "3", "c": "red"}, compiled=True) == {"n": 3, "s": "d", "c": Color.red, "l": "callable"}
+    assert call_sync("querystring", {"n": "x", "r": "11"}, compiled=True) == {"querystring": {
+        "n": ["Not a valid integer."],
+        "r": ["Must be greater than or equal to 1 and less than or equal to 10."],
+    }}
+
+
+def test_as_kwargs():
+    view = validation.use_kwargs({"q": validation.fields.Str(required=True)}, location="query")(lambda request, q: q)
+    assert view(types.SimpleNamespace(args=MultiDict({"q": "abc"}))) == "abc"
+
+
+def test_compiled_argmaps():
+    compiled = compile_argmap(ma.Schema, make_argmap(), "querystring", ma.RAISE)
+    assert isinstance(compiled, CompiledArgs)
+    assert compiled.names == frozenset(make_argmap())
+    # anything else is left to marshmallow
+    for argmap, location in [
+        (make_argmap(), "json"),
+        (ma.Schema.from_dict(make_argmap()), "querystring"),
+        ({"d": validation.fields.Date()}, "querystring"),
+        ({"n": validation.fields.Int(strict=True)}, "querystring"),
+        ({"n": validation.fields.Int(data_key="m")}, "querystring"),
+        ({"l": validation.fields.List(validation.fields.Int())}, "querystring"),
+    ]:
+        assert compile_argmap(ma.Schema, argmap, location, ma.RAISE) is None
+
+
+def test_compiled_argmap_skips_the_schema_load(monkeypatch):
+    view = validation.use_args(make_argmap(), location="querystring")(lambda request, args: args)
+
+    def load(self, *args, **kwargs):
+        raise AssertionError("schema load")
+
+    monkeypatch.setattr(ma.Schema, "load", load)
+    assert view(types.SimpleNamespace(args=MultiDict({"n": "1"})))["n"] == 1